@@ -0,0 +1,141 @@
+"""
+Micro-benchmarks: upload decoding, post-processing and model loading.
+
+Usage (from the repo root):
+    python benchmarks/bench_micro.py
+    python benchmarks/bench_micro.py --sections decode load --output micro.json
+    python benchmarks/bench_micro.py --standin   # ignore real weights
+
+Without the real weights in MODEL_DIR, randomly initialised stand-in
+models are built under benchmarks/.standin_models and used instead.
+"""
+
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+import timeit
+
+import numpy as np
+
+from common import ROOT, ensure_models, peak_rss_mb, run_metadata, write_report
+
+SECTIONS = ("decode", "postprocess", "load")
+
+
+def _best_us(func, repeat: int, number: int) -> float:
+    return round(min(timeit.repeat(func, repeat=repeat, number=number)) / number * 1e6, 1)
+
+
+def bench_decode(folder: str, repeat: int) -> list[dict]:
+    """
+    Header-only validation, then full and reduced-resolution decode, per
+    sample image.
+    """
+    from image_io import DECODE_TARGET_SIZE, check_header, decode_image, HEADER_BYTES
+
+    rows = []
+    for path in sorted(glob.glob(os.path.join(folder, "*"))):
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            image_format = check_header(data[:HEADER_BYTES])
+            full, _ = decode_image(data, 0)
+        except ValueError:
+            continue
+
+        number = 20
+        rows.append({
+            "image": os.path.basename(path),
+            "format": image_format,
+            "bytes": len(data),
+            "shape": list(full.shape),
+            "header_check_us": _best_us(lambda: check_header(data[:HEADER_BYTES]), repeat, number * 50),
+            "decode_full_us": _best_us(lambda: decode_image(data, 0), repeat, number),
+            "decode_reduced_us": _best_us(lambda: decode_image(data, DECODE_TARGET_SIZE), repeat, number),
+        })
+    return rows
+
+
+def bench_postprocess(repeat: int) -> list[dict]:
+    from bench_postprocess import run
+
+    return run([10, 100, 1000], 0.5, repeat)
+
+
+def bench_load(crops: list[str], runs: int) -> list[dict]:
+    """
+    Cold load (registry miss), first forward pass (predictor setup),
+    warm lookup (registry hit) and steady-state forward pass, per crop.
+    """
+    from model_core import get_model, model_key, model_registry, resolve_backend
+
+    frame = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    backend = resolve_backend()
+
+    rows = []
+    for crop in crops:
+        model_registry.evict(model_key(crop, backend))
+
+        start = time.perf_counter()
+        model = get_model(crop)
+        cold_ms = (time.perf_counter() - start) * 1000.0
+
+        start = time.perf_counter()
+        model(frame, verbose=False)
+        first_ms = (time.perf_counter() - start) * 1000.0
+
+        warm_get_us = _best_us(lambda: get_model(crop), 3, 1000)
+
+        latencies = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            model(frame, verbose=False)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+
+        rows.append({
+            "crop": crop,
+            "backend": backend,
+            "cold_load_ms": round(cold_ms, 1),
+            "first_predict_ms": round(first_ms, 1),
+            "warm_get_us": warm_get_us,
+            "warm_predict_ms_p50": round(statistics.median(latencies), 2),
+        })
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sections", nargs="*", default=list(SECTIONS), choices=SECTIONS)
+    parser.add_argument("--images", default=os.path.join(ROOT, "test"), help="Folder of sample images")
+    parser.add_argument("--crops", nargs="*", default=None, help="Crops for the load section (default: all)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=10, help="Warm forward passes per crop")
+    parser.add_argument("--standin", action="store_true", help="Use stand-in models even if weights exist")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = {"benchmark": "micro", "meta": run_metadata()}
+
+    if "decode" in args.sections:
+        report["decode"] = bench_decode(args.images, args.repeat)
+
+    if "postprocess" in args.sections:
+        report["postprocess"] = bench_postprocess(args.repeat)
+
+    if "load" in args.sections:
+        report["models"] = ensure_models(force_standin=args.standin)
+
+        from model_core import SUPPORTED_CROPS
+
+        report["load"] = bench_load(args.crops or sorted(SUPPORTED_CROPS), args.runs)
+
+    report["peak_rss_mb"] = peak_rss_mb()
+    write_report(report, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
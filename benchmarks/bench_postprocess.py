@@ -0,0 +1,144 @@
+"""
+Benchmarks run_inference post-processing: the original per-box loop vs
+the vectorized raw_detections + filter_detections path.
+
+Usage (from the repo root):
+    python benchmarks/bench_postprocess.py
+    python benchmarks/bench_postprocess.py --boxes 10 100 1000 --json
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_core import extract_output  # noqa: E402
+
+NAMES = {i: f"disease_{i}" for i in range(12)}
+
+
+def legacy_extract_output(crop: str, result, threshold: float) -> dict:
+    """
+    The per-box loop run_inference used before vectorization.
+    """
+    output = {
+        "crop": crop,
+        "boxes": [],
+        "classification": [],
+    }
+
+    if hasattr(result, "boxes") and result.boxes is not None:
+        for box in result.boxes:
+            conf = float(box.conf[0])
+            if conf < threshold:
+                continue
+
+            cls_id = int(box.cls[0])
+            x1, y1, x2, y2 = map(float, box.xyxy[0])
+
+            output["boxes"].append({
+                "class": result.names[cls_id],
+                "confidence": conf,
+                "bbox": [x1, y1, x2, y2],
+            })
+
+    if hasattr(result, "probs") and result.probs is not None:
+        probs = result.probs.data.tolist()
+        for i, p in enumerate(probs):
+            if p < threshold:
+                continue
+
+            output["classification"].append({
+                "class": result.names[i],
+                "confidence": float(p),
+            })
+
+    return output
+
+
+def make_detection_result(n: int, seed: int = 0) -> Results:
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, 600, size=(n, 2))
+    wh = rng.uniform(5, 40, size=(n, 2))
+    conf = rng.uniform(0, 1, size=(n, 1))
+    cls = rng.integers(0, len(NAMES), size=(n, 1))
+    data = np.hstack([xy, xy + wh, conf, cls]).astype(np.float32)
+
+    image = np.zeros((640, 640, 3), dtype=np.uint8)
+    return Results(image, path="bench", names=NAMES, boxes=torch.from_numpy(data))
+
+
+def make_classification_result(n_classes: int, seed: int = 0) -> Results:
+    rng = np.random.default_rng(seed)
+    probs = torch.from_numpy(rng.dirichlet(np.ones(n_classes)).astype(np.float32))
+    names = {i: f"class_{i}" for i in range(n_classes)}
+
+    image = np.zeros((224, 224, 3), dtype=np.uint8)
+    return Results(image, path="bench", names=names, probs=probs)
+
+
+def time_call(func, repeat: int, number: int) -> float:
+    """
+    Best-of-`repeat` time per call in microseconds.
+    """
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number * 1e6
+
+
+def run(box_counts: list[int], threshold: float, repeat: int) -> list[dict]:
+    rows = []
+
+    cases = [("detect", n, make_detection_result(n)) for n in box_counts]
+    cases += [("classify", n, make_classification_result(n)) for n in box_counts]
+
+    for kind, n, result in cases:
+        legacy = legacy_extract_output("bench", result, threshold)
+        vectorized = extract_output("bench", result, threshold)
+        assert legacy == vectorized, f"Output mismatch for {kind} n={n}"
+
+        number = max(1, 2000 // n)
+        before = time_call(lambda: legacy_extract_output("bench", result, threshold), repeat, number)
+        after = time_call(lambda: extract_output("bench", result, threshold), repeat, number)
+
+        rows.append({
+            "kind": kind,
+            "n": n,
+            "before_us": round(before, 1),
+            "after_us": round(after, 1),
+            "speedup": round(before / after, 1),
+        })
+
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--boxes", nargs="*", type=int, default=[10, 100, 1000])
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    rows = run(args.boxes, args.threshold, args.repeat)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+
+    print(f"{'kind':<10}{'n':>6}{'before (us)':>14}{'after (us)':>13}{'speedup':>10}")
+    for row in rows:
+        print(
+            f"{row['kind']:<10}{row['n']:>6}{row['before_us']:>14}"
+            f"{row['after_us']:>13}{row['speedup']:>9}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
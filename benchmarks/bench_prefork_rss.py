@@ -0,0 +1,160 @@
+"""
+Measures memory per worker: pre-forked serve.py vs `uvicorn --workers N`.
+
+Usage (from the repo root):
+    python benchmarks/bench_prefork_rss.py --workers 4
+    python benchmarks/bench_prefork_rss.py --workers 16 --modes prefork --json
+
+Each server is started, every crop is requested enough times to reach
+every worker, and RSS / PSS / USS are read for the whole process tree.
+PSS splits shared pages between the processes that map them, so its sum
+is the real memory cost; USS is what each worker holds privately.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import psutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from model_core import SUPPORTED_CROPS  # noqa: E402
+
+
+def server_command(mode: str, workers: int, port: int) -> list[str]:
+    if mode == "prefork":
+        return [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port), "--log-level", "warning"]
+    return [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--workers", str(workers), "--port", str(port), "--log-level", "warning",
+    ]
+
+
+def wait_ready(port: int, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2):
+                return
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            time.sleep(0.5)
+    raise TimeoutError(f"Server on port {port} not ready after {timeout}s")
+
+
+def post_image(url: str, path: str) -> int:
+    boundary = uuid.uuid4().hex
+    with open(path, "rb") as f:
+        payload = f.read()
+
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{os.path.basename(path)}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + payload + f"\r\n--{boundary}--\r\n".encode()
+
+    request = urllib.request.Request(
+        url,
+        data=body,
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+    with urllib.request.urlopen(request, timeout=300) as response:
+        return response.status
+
+
+def warm_up(port: int, workers: int, image: str, rounds: int):
+    """
+    Sends each crop enough concurrent requests that every worker is
+    likely to have loaded and run it.
+    """
+    urls = [
+        f"http://127.0.0.1:{port}/predict/{crop}"
+        for crop in sorted(SUPPORTED_CROPS)
+        for _ in range(workers * rounds)
+    ]
+    with ThreadPoolExecutor(max_workers=workers * 2) as pool:
+        list(pool.map(lambda url: post_image(url, image), urls))
+
+
+def tree_memory(pid: int) -> list[dict]:
+    root = psutil.Process(pid)
+    rows = []
+    for proc in [root] + root.children(recursive=True):
+        try:
+            info = proc.memory_full_info()
+        except psutil.NoSuchProcess:
+            continue
+        rows.append({
+            "pid": proc.pid,
+            "role": "parent" if proc.pid == pid else "worker",
+            "rss_mb": round(info.rss / 1e6, 1),
+            "pss_mb": round(getattr(info, "pss", 0) / 1e6, 1),
+            "uss_mb": round(info.uss / 1e6, 1),
+        })
+    return rows
+
+
+def measure(mode: str, workers: int, port: int, image: str, rounds: int, timeout: float) -> dict:
+    process = subprocess.Popen(server_command(mode, workers, port), cwd=ROOT)
+    try:
+        wait_ready(port, timeout)
+        warm_up(port, workers, image, rounds)
+        time.sleep(1)
+        rows = tree_memory(process.pid)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    worker_rows = [row for row in rows if row["role"] == "worker"]
+    return {
+        "mode": mode,
+        "workers": workers,
+        "processes": rows,
+        "worker_rss_mb_mean": round(sum(r["rss_mb"] for r in worker_rows) / max(1, len(worker_rows)), 1),
+        "worker_uss_mb_mean": round(sum(r["uss_mb"] for r in worker_rows) / max(1, len(worker_rows)), 1),
+        "total_pss_mb": round(sum(r["pss_mb"] for r in rows), 1),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", nargs="*", default=["prefork", "uvicorn"], choices=["prefork", "uvicorn"])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--image", default=os.path.join(ROOT, "test", "a.jpg"))
+    parser.add_argument("--rounds", type=int, default=2, help="Requests per crop per worker")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Seconds to wait for startup")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    reports = [
+        measure(mode, args.workers, args.port, args.image, args.rounds, args.timeout)
+        for mode in args.modes
+    ]
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return 0
+
+    print(f"{'mode':<10}{'workers':>8}{'worker RSS':>12}{'worker USS':>12}{'total PSS':>12}  (MB)")
+    for report in reports:
+        print(
+            f"{report['mode']:<10}{report['workers']:>8}{report['worker_rss_mb_mean']:>12}"
+            f"{report['worker_uss_mb_mean']:>12}{report['total_pss_mb']:>12}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
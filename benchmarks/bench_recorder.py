@@ -0,0 +1,102 @@
+"""
+Offline benchmark of the headless field recorder (recorder.py).
+
+Usage (from the repo root):
+    python benchmarks/bench_recorder.py --output recorder.json
+    python benchmarks/bench_recorder.py --video field.mp4 --crop chilli --gates off diff --target-fps 15
+
+Each gate mode replays the same video through RecorderEngine, paced like
+a live camera, with the display and detection log disabled. Without
+--video, a clip is synthesised from a test image: a still shot followed by
+a slow pan, so gated modes have something to skip and something to catch.
+The report gives inference rate, dropped and skipped frames, and the
+process CPU time per video second (a proxy for battery drain).
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+
+from common import ROOT, ensure_models, run_metadata, write_report
+
+
+def synth_clip(image_path: str, path: str, seconds: float = 10.0, fps: int = 30, still: float = 0.5):
+    """
+    640x480 clip of `image_path`: the first `still` fraction holds still,
+    the rest pans sideways.
+    """
+    image = cv2.resize(cv2.imread(image_path), (960, 720))
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (640, 480))
+    frames = int(seconds * fps)
+    still_frames = int(frames * still)
+    for i in range(frames):
+        x = 0 if i < still_frames else min(320, int((i - still_frames) * 320 / max(1, frames - still_frames)))
+        writer.write(image[120:600, x:x + 640])
+    writer.release()
+
+
+def run_mode(args, gate_mode: str) -> dict:
+    from recorder import RecorderEngine, make_gate
+
+    engine = RecorderEngine(
+        args.crop,
+        source=args.video,
+        threshold=args.threshold,
+        gate=make_gate(gate_mode != "off", gate_mode),
+        target_fps=args.target_fps,
+    )
+    engine.load()
+
+    cpu_start = time.process_time()
+    engine.start()
+    engine.wait()
+    stages = engine.stats()
+    engine.stop()
+    cpu = time.process_time() - cpu_start
+
+    summary = engine.summary()
+    summary["cpu_s"] = round(cpu, 3)
+    summary["cpu_s_per_video_s"] = round(cpu / summary["seconds"], 3) if summary["seconds"] else None
+    summary["stages"] = stages
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--video", help="Recorded video; default: a synthetic clip")
+    parser.add_argument("--image", default=os.path.join(ROOT, "test", "a.jpg"), help="Image for the synthetic clip")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Length of the synthetic clip")
+    parser.add_argument("--crop", default="tomato")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--target-fps", type=float, default=0, help="0 = the video's own rate")
+    parser.add_argument("--gates", nargs="*", default=["off", "diff", "hash"])
+    parser.add_argument("--standin", action="store_true", help="Use stand-in models even if weights exist")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    models = ensure_models(force_standin=args.standin)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if not args.video:
+            args.video = os.path.join(tmp, "clip.mp4")
+            synth_clip(args.image, args.video, args.seconds)
+
+        report = {
+            "benchmark": "recorder",
+            "meta": run_metadata(),
+            "video": args.video,
+            "crop": args.crop,
+            "models": models,
+            "modes": {gate: run_mode(args, gate) for gate in args.gates},
+        }
+
+    write_report(report, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
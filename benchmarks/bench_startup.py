@@ -0,0 +1,137 @@
+"""
+Cold-start benchmark: import time, time to first liveness answer and time
+to first prediction, each run in a fresh interpreter.
+
+Usage (from the repo root):
+    python benchmarks/bench_startup.py --runs 5 --output startup.json
+    python benchmarks/bench_startup.py --app-dir /tmp/old-checkout --live-path /health
+
+--app-dir imports the app from another checkout (e.g. a `git worktree`
+of an older commit), so before / after numbers come from the same
+script; compare the reports with compare_reports.py. Run
+`python export_models.py --backend torch` first to measure with the
+prepared model artifacts.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from common import ROOT, ensure_models, percentiles, run_metadata, write_report
+
+HEAVY_MODULES = ("torch", "ultralytics", "torchvision", "cv2")
+
+
+async def measure(args, start: float) -> dict:
+    """
+    Child side: import the app, run its startup, then probe and predict.
+    All times are seconds since `start`, taken before the app import.
+    """
+    sys.path.insert(0, args.app_dir)
+    import_start = time.perf_counter()
+    from main import app
+    import_s = time.perf_counter() - import_start
+    preloaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    import httpx
+
+    with open(args.image, "rb") as f:
+        image = f.read()
+
+    async def predict(client, nonce: bytes):
+        response = await client.post(
+            f"/predict/{args.crop}",
+            files={"file": ("image.jpg", image + nonce, "application/octet-stream")},
+        )
+        response.raise_for_status()
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        startup_done = time.perf_counter()
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            (await client.get(args.live_path)).raise_for_status()
+            live = time.perf_counter()
+
+            await predict(client, b"first")
+            first = time.perf_counter()
+
+            second_start = time.perf_counter()
+            await predict(client, b"second")
+            second = time.perf_counter()
+
+    return {
+        "import_s": round(import_s, 3),
+        "heavy_modules_at_import": preloaded,
+        "startup_s": round(startup_done - start, 3),
+        "time_to_live_s": round(live - start, 3),
+        "time_to_first_prediction_s": round(first - start, 3),
+        "first_prediction_s": round(first - live, 3),
+        "warm_prediction_s": round(second - second_start, 3),
+    }
+
+
+def run_child(args) -> dict:
+    command = [
+        sys.executable, os.path.abspath(__file__), "--child",
+        "--app-dir", args.app_dir,
+        "--crop", args.crop,
+        "--image", args.image,
+        "--live-path", args.live_path,
+    ]
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=args.app_dir, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup run failed:\n{completed.stderr[-2000:]}")
+
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process_wall_s"] = round(wall, 3)
+    return result
+
+
+def main(argv=None) -> int:
+    start = time.perf_counter()
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to start")
+    parser.add_argument("--crop", default="tomato")
+    parser.add_argument("--image", default=os.path.join(ROOT, "test", "a.jpg"))
+    parser.add_argument("--app-dir", default=ROOT, help="Checkout to import main.py from")
+    parser.add_argument("--live-path", default="/livez", help="Probe timed as the first answer")
+    parser.add_argument("--standin", action="store_true", help="Use stand-in models even if weights exist")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    args.app_dir = os.path.abspath(args.app_dir)
+    args.image = os.path.abspath(args.image)
+
+    if args.child:
+        print(json.dumps(asyncio.run(measure(args, start))))
+        return 0
+
+    models = ensure_models(force_standin=args.standin)
+    os.environ["MODEL_DIR"] = os.path.abspath(models["model_dir"])
+
+    runs = [run_child(args) for _ in range(args.runs)]
+    keys = [key for key, value in runs[0].items() if isinstance(value, float)]
+
+    report = {
+        "benchmark": "startup",
+        "meta": run_metadata(),
+        "app_dir": args.app_dir,
+        "crop": args.crop,
+        "models": models,
+        "heavy_modules_at_import": runs[0]["heavy_modules_at_import"],
+        "seconds": {key: percentiles([run[key] for run in runs]) for key in keys},
+        "runs": runs,
+    }
+    write_report(report, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Load test for out-of-process inference: throughput vs worker count.
+
+Usage (from the repo root):
+    python benchmarks/bench_workers.py
+    python benchmarks/bench_workers.py --crop chilli --workers 1 2 4 8 --images 256 --json
+
+Frames are submitted from several client threads at once, as the API
+would. The in-process batching scheduler is measured as the baseline.
+Worker processes split the cores evenly (torch threads = cores // N),
+so speedup reflects the GIL and scheduling, not extra CPU.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_io import decode_image  # noqa: E402
+from inference_workers import InferencePool  # noqa: E402
+from model_core import as_raw, get_scheduler  # noqa: E402
+
+
+def load_frames(folder: str, count: int) -> list[np.ndarray]:
+    frames = []
+    for path in sorted(glob.glob(os.path.join(folder, "*"))):
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            frames.append(decode_image(data)[0])
+        except ValueError:
+            continue
+
+    if not frames:
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)]
+
+    return [cv2.resize(f, (640, 480)) for f in (frames * count)[:count]]
+
+
+def drive(submit, frames: list, clients: int) -> float:
+    """
+    Submits all frames from `clients` threads and waits for every result.
+    Returns elapsed seconds.
+    """
+    chunks = [frames[i::clients] for i in range(clients)]
+
+    def client(chunk):
+        for future in [submit(frame) for frame in chunk]:
+            as_raw(future.result())
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, chunks))
+    return time.perf_counter() - start
+
+
+def run(crop: str, worker_counts: list[int], images: int, clients: int, frames_dir: str) -> list[dict]:
+    frames = load_frames(frames_dir, images)
+    rows = []
+
+    scheduler = get_scheduler(crop, local=True)
+    drive(scheduler.submit, frames[:clients], clients)  # load + warm up
+    elapsed = drive(scheduler.submit, frames, clients)
+    rows.append({"mode": "in-process", "workers": 0, "seconds": round(elapsed, 2), "images_per_s": round(images / elapsed, 1)})
+
+    for workers in worker_counts:
+        with InferencePool([crop], processes=workers) as pool:
+            channel = pool.submitter(crop)
+            drive(channel.submit, frames[:clients], clients)
+            elapsed = drive(channel.submit, frames, clients)
+            inline = pool.stats()["crops"][crop]["inline"]
+
+        rows.append({
+            "mode": "processes",
+            "workers": workers,
+            "seconds": round(elapsed, 2),
+            "images_per_s": round(images / elapsed, 1),
+            "inline_frames": inline,
+        })
+
+    baseline = rows[0]["images_per_s"]
+    for row in rows:
+        row["speedup"] = round(row["images_per_s"] / baseline, 2)
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--crop", default="tomato")
+    parser.add_argument("--workers", nargs="*", type=int, default=[1, 2, 4])
+    parser.add_argument("--images", type=int, default=128)
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent submitting threads")
+    parser.add_argument("--frames", default="test", help="Folder of sample images")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    rows = run(args.crop, args.workers, args.images, args.clients, args.frames)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+
+    print(f"{'mode':<12}{'workers':>8}{'seconds':>10}{'img/s':>9}{'speedup':>9}")
+    for row in rows:
+        print(
+            f"{row['mode']:<12}{row['workers']:>8}{row['seconds']:>10}"
+            f"{row['images_per_s']:>9}{row['speedup']:>8}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
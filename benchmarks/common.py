@@ -0,0 +1,151 @@
+"""
+Shared helpers for the benchmark scripts: stand-in models, percentiles,
+memory readings and JSON reports.
+"""
+
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+STANDIN_DIR = os.path.join(ROOT, "benchmarks", ".standin_models")
+
+
+# -------------------------------------------------
+# STAND-IN MODELS
+# -------------------------------------------------
+
+def _crop_class_names(crop: str) -> list[str]:
+    from crop_dicts import medicine_map
+
+    regions = medicine_map.get(crop, {})
+    names = next(iter(regions.values()), None) if regions else None
+    return sorted(names) if names else ["healthy", "diseased"]
+
+
+def build_standin_model(crop: str, path: str, task: str = "detect"):
+    """
+    Writes a randomly initialised YOLO11n checkpoint with the crop's class
+    names. Outputs are meaningless, but tensor shapes, latency and memory
+    match a real nano model.
+    """
+    import torch
+    from ultralytics.nn.tasks import ClassificationModel, DetectionModel
+
+    names = dict(enumerate(_crop_class_names(crop)))
+    if task == "classify":
+        model = ClassificationModel("yolo11n-cls.yaml", nc=len(names), verbose=False)
+        imgsz = 224
+    else:
+        model = DetectionModel("yolo11n.yaml", nc=len(names), verbose=False)
+        imgsz = 640
+
+    model.names = names
+    model.args = {"task": task, "imgsz": imgsz}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    torch.save({"model": model, "train_args": {"task": task, "imgsz": imgsz}}, path)
+
+
+def ensure_models(
+    model_dir: str | None = None,
+    standin_dir: str = STANDIN_DIR,
+    classify: tuple[str, ...] = (),
+    force_standin: bool = False,
+) -> dict:
+    """
+    Points model_core at real weights when all are present, otherwise at a
+    directory of stand-in models (built once, then reused).
+    """
+    import model_core
+
+    model_dir = model_dir or model_core.MODEL_DIR
+    crops = sorted(model_core.SUPPORTED_CROPS)
+    missing = [
+        crop for crop in crops
+        if not os.path.exists(os.path.join(model_dir, f"{crop}.pt"))
+    ]
+
+    if not missing and not force_standin:
+        model_core.MODEL_DIR = model_dir
+        return {"model_dir": model_dir, "standin": False}
+
+    for crop in crops:
+        path = os.path.join(standin_dir, f"{crop}.pt")
+        if not os.path.exists(path):
+            build_standin_model(crop, path, "classify" if crop in classify else "detect")
+
+    model_core.MODEL_DIR = standin_dir
+    os.environ["MODEL_DIR"] = standin_dir
+    return {"model_dir": standin_dir, "standin": True, "missing_weights": missing}
+
+
+# -------------------------------------------------
+# MEASUREMENTS
+# -------------------------------------------------
+
+def percentiles(values: list[float]) -> dict:
+    """
+    p50 / p95 / p99 / mean / max of a list of latencies (same unit).
+    """
+    import numpy as np
+
+    if not values:
+        return {"count": 0}
+
+    data = np.asarray(values, dtype=np.float64)
+    p50, p95, p99 = np.percentile(data, [50, 95, 99])
+    return {
+        "count": len(values),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "mean": round(float(data.mean()), 3),
+        "max": round(float(data.max()), 3),
+    }
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process so far.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1e6 if sys.platform == "darwin" else 1e3), 1)
+
+
+def run_metadata() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.TimeoutExpired):
+        commit = None
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_report(report: dict, path: str | None):
+    """
+    Prints the report as JSON, or writes it to `path`.
+    """
+    text = json.dumps(report, indent=2)
+    if path:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+        print(f"Report written to {path}", file=sys.stderr)
+    else:
+        print(text)
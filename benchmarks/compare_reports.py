@@ -0,0 +1,72 @@
+"""
+Compares two benchmark JSON reports (bench_micro / loadgen) metric by metric.
+
+Usage (from the repo root):
+    python benchmarks/compare_reports.py baseline.json candidate.json
+    python benchmarks/compare_reports.py baseline.json candidate.json --filter latency_ms
+"""
+
+import argparse
+import json
+import sys
+
+SKIP = {"meta"}
+
+
+def flatten(value, prefix: str = "") -> dict:
+    """
+    Numeric leaves of a report as {"path.to.metric": value}. Lists of
+    rows are keyed by their first string field (crop, image, kind, ...).
+    """
+    if isinstance(value, bool):
+        return {}
+    if isinstance(value, (int, float)):
+        return {prefix: float(value)}
+
+    items = {}
+    if isinstance(value, dict):
+        for key, child in value.items():
+            if key in SKIP:
+                continue
+            items.update(flatten(child, f"{prefix}.{key}" if prefix else key))
+
+    elif isinstance(value, list):
+        for index, child in enumerate(value):
+            label = str(index)
+            if isinstance(child, dict):
+                labels = [str(v) for v in child.values() if isinstance(v, str)]
+                numbers = [str(child[k]) for k in ("n",) if k in child]
+                label = "/".join(labels + numbers) or label
+            items.update(flatten(child, f"{prefix}[{label}]"))
+
+    return items
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--filter", default="", help="Only metrics whose path contains this")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = flatten(json.load(f))
+    with open(args.candidate) as f:
+        candidate = flatten(json.load(f))
+
+    keys = [k for k in baseline if k in candidate and args.filter in k]
+    if not keys:
+        print("No common metrics", file=sys.stderr)
+        return 1
+
+    width = max(len(k) for k in keys)
+    print(f"{'metric':<{width}}{'baseline':>14}{'candidate':>14}{'change':>10}")
+    for key in keys:
+        old, new = baseline[key], candidate[key]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else ""
+        print(f"{key:<{width}}{old:>14.3f}{new:>14.3f}{change:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
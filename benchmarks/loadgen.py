@@ -0,0 +1,259 @@
+"""
+Replays a request trace against the prediction API and reports latency
+percentiles, throughput and peak memory.
+
+Usage (from the repo root):
+    python benchmarks/loadgen.py benchmarks/traces/sample_trace.jsonl
+    python benchmarks/loadgen.py trace.jsonl --speed 4 --loops 3 --output run.json
+    python benchmarks/loadgen.py trace.jsonl --url http://127.0.0.1:8000 --server-pid 1234
+
+Each trace line is a JSON object:
+    {"t": 0.25, "crop": "tomato", "threshold": 0.5, "image": "test/a.jpg"}
+with optional "endpoint" (predict | annotated | batch | auto, default
+predict) and "params" (extra query parameters). `t` is the arrival time
+in seconds from the start of the trace.
+
+Requests are sent open-loop, at their arrival time, whether or not
+earlier ones have finished. Latency is measured from the scheduled
+arrival, so a backed-up client or server shows up in the tail instead
+of stretching the schedule.
+
+Without --url the app runs in this process through httpx's ASGI
+transport, with stand-in models if the real weights are missing.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+
+from common import ROOT, ensure_models, peak_rss_mb, percentiles, run_metadata, write_report
+
+ENDPOINTS = {
+    "predict": "/predict/{crop}",
+    "annotated": "/predict/{crop}/annotated",
+    "batch": "/predict/{crop}/batch",
+    "auto": "/predict",
+}
+
+
+def load_trace(path: str) -> list[dict]:
+    entries = []
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            entry = json.loads(line)
+            endpoint = entry.get("endpoint", "predict")
+            if endpoint not in ENDPOINTS:
+                raise ValueError(f"{path}:{line_no}: unknown endpoint {endpoint!r}")
+            entries.append({
+                "t": float(entry.get("t", 0.0)),
+                "crop": entry.get("crop", "tomato"),
+                "threshold": float(entry.get("threshold", 0.5)),
+                "image": entry["image"],
+                "endpoint": endpoint,
+                "params": entry.get("params", {}),
+            })
+    return sorted(entries, key=lambda e: e["t"])
+
+
+def expand(trace: list[dict], loops: int, speed: float) -> list[dict]:
+    """
+    Repeats the trace `loops` times back to back and compresses time by `speed`.
+    """
+    span = (trace[-1]["t"] + 1e-3) if trace else 0.0
+    return [
+        {**entry, "t": (entry["t"] + loop * span) / speed}
+        for loop in range(loops)
+        for entry in trace
+    ]
+
+
+def read_images(trace: list[dict]) -> dict:
+    images = {}
+    for entry in trace:
+        path = entry["image"]
+        if path not in images:
+            with open(path if os.path.isabs(path) else os.path.join(ROOT, path), "rb") as f:
+                images[path] = f.read()
+    return images
+
+
+class RssSampler:
+    """
+    Samples another process's RSS (and its children's) in the background.
+    """
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        import psutil
+
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        import psutil
+
+        while not self._stop.is_set():
+            try:
+                processes = [self.process] + self.process.children(recursive=True)
+                rss = sum(p.memory_info().rss for p in processes)
+                self.peak = max(self.peak, rss)
+            except psutil.Error:
+                pass
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+async def send(client, entry: dict, payload: bytes, unique: bool) -> int:
+    # A nonce after the image data defeats the content-addressed result
+    # cache; decoders ignore trailing bytes.
+    if unique:
+        payload = payload + uuid.uuid4().bytes
+
+    filename = os.path.basename(entry["image"])
+    field = "files" if entry["endpoint"] == "batch" else "file"
+    params = {"threshold": entry["threshold"], **entry["params"]}
+    if entry["endpoint"] == "auto":
+        params.setdefault("crops", entry["crop"])
+
+    url = ENDPOINTS[entry["endpoint"]].format(crop=entry["crop"])
+    response = await client.post(
+        url,
+        params=params,
+        files=[(field, (filename, payload, "application/octet-stream"))],
+    )
+    return response.status_code
+
+
+async def replay(client, trace: list[dict], images: dict, unique: bool, max_concurrency: int) -> dict:
+    limiter = asyncio.Semaphore(max_concurrency)
+    latencies = defaultdict(list)
+    statuses = Counter()
+    start = time.perf_counter()
+
+    async def one(entry):
+        delay = start + entry["t"] - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        scheduled = start + entry["t"]
+        async with limiter:
+            try:
+                status = await send(client, entry, images[entry["image"]], unique)
+            except Exception as e:
+                status = type(e).__name__
+
+        key = f"{entry['endpoint']}:{entry['crop']}"
+        latencies[key].append((time.perf_counter() - scheduled) * 1000.0)
+        statuses[str(status)] += 1
+
+    await asyncio.gather(*(one(entry) for entry in trace))
+    duration = time.perf_counter() - start
+
+    all_latencies = [ms for values in latencies.values() for ms in values]
+    ok = statuses.get("200", 0)
+    return {
+        "requests": len(trace),
+        "ok": ok,
+        "errors": len(trace) - ok,
+        "status_codes": dict(statuses),
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(trace) / duration, 2) if duration else None,
+        "latency_ms": percentiles(all_latencies),
+        "by_endpoint": {key: percentiles(values) for key, values in sorted(latencies.items())},
+    }
+
+
+async def run_in_process(trace, images, args) -> dict:
+    import httpx
+
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            if args.warmup:
+                await replay(client, trace[:args.warmup], images, args.unique, args.max_concurrency)
+            result = await replay(client, trace, images, args.unique, args.max_concurrency)
+
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+async def run_remote(trace, images, args) -> dict:
+    import httpx
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+        if args.warmup:
+            await replay(client, trace[:args.warmup], images, args.unique, args.max_concurrency)
+
+        if args.server_pid:
+            with RssSampler(args.server_pid) as sampler:
+                result = await replay(client, trace, images, args.unique, args.max_concurrency)
+            result["peak_rss_mb"] = round(sampler.peak / 1e6, 1)
+        else:
+            result = await replay(client, trace, images, args.unique, args.max_concurrency)
+
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("trace", nargs="?", default=os.path.join(ROOT, "benchmarks", "traces", "sample_trace.jsonl"))
+    parser.add_argument("--url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--server-pid", type=int, help="Sample this server's peak RSS (with --url)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier")
+    parser.add_argument("--loops", type=int, default=1, help="Replay the trace this many times")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed requests sent first")
+    parser.add_argument("--max-concurrency", type=int, default=64)
+    parser.add_argument("--allow-cache-hits", dest="unique", action="store_false", help="Send identical bytes for repeated images")
+    parser.add_argument("--standin", action="store_true", help="Use stand-in models even if weights exist")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    trace = expand(load_trace(args.trace), args.loops, args.speed)
+    if not trace:
+        print(f"No requests in {args.trace}", file=sys.stderr)
+        return 1
+    images = read_images(trace)
+
+    report = {
+        "benchmark": "loadgen",
+        "meta": run_metadata(),
+        "trace": os.path.relpath(args.trace, ROOT),
+        "target": args.url or "in-process",
+        "speed": args.speed,
+        "loops": args.loops,
+        "unique_uploads": args.unique,
+    }
+
+    if args.url:
+        result = asyncio.run(run_remote(trace, images, args))
+    else:
+        report["models"] = ensure_models(force_standin=args.standin)
+        result = asyncio.run(run_in_process(trace, images, args))
+
+    report.update(result)
+    write_report(report, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+"""
+Buffered detection log for the field recorder.
+
+The recorder's inference stage only appends rows to an in-memory queue.
+A writer thread takes them off in batches. It writes a batch when
+`batch_size` rows have built up or when the oldest buffered row is
+`flush_interval` seconds old. Every `fsync_interval` seconds it makes the
+written rows durable, so a crash or power cut loses at most that much of
+the log.
+
+A log writes to one or more sinks, picked by file name:
+
+    detection_log.csv       CSV with a header row (the original format)
+    detection_log.db        SQLite in WAL mode, indexed by timestamp,
+                            crop and disease (also .sqlite / .sqlite3)
+    detection_log.parquet   directory of Parquet part files, one per
+                            fsync period (needs pyarrow)
+
+    DETECTION_LOG=detection_log.csv,detection_log.db
+"""
+
+import csv
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+DETECTION_LOG = os.getenv("DETECTION_LOG", "detection_log.csv")
+DETECTION_LOG_BATCH = int(os.getenv("DETECTION_LOG_BATCH", "50"))
+DETECTION_LOG_FLUSH_S = float(os.getenv("DETECTION_LOG_FLUSH_S", "1.0"))
+DETECTION_LOG_FSYNC_S = float(os.getenv("DETECTION_LOG_FSYNC_S", "5.0"))
+DETECTION_LOG_QUEUE = int(os.getenv("DETECTION_LOG_QUEUE", "10000"))
+
+# Column order of every sink; "long" is kept from the original CSV
+FIELDS = ("timestamp", "crop", "disease", "satellites", "lat", "long")
+
+_STOP = object()
+
+
+# -------------------------------------------------
+# SINKS
+# -------------------------------------------------
+
+class CsvSink:
+    def __init__(self, path: str):
+        self.path = path
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", newline="")
+        self._writer = csv.writer(self._file)
+        if new:
+            self._writer.writerow(FIELDS)
+
+    def write(self, rows: list[dict]):
+        self._writer.writerows([row[field] for field in FIELDS] for row in rows)
+        self._file.flush()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self.sync()
+        self._file.close()
+
+
+class SqliteSink:
+    """
+    One `detections` table. Each batch is one transaction. With WAL and
+    synchronous=NORMAL a commit does not wait for the disk; sync() runs a
+    checkpoint, which fsyncs the WAL and copies it into the database.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Created on the recorder's thread, used only on the writer thread
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS detections (
+                id INTEGER PRIMARY KEY,
+                timestamp TEXT NOT NULL,
+                crop TEXT NOT NULL,
+                disease TEXT NOT NULL,
+                satellites INTEGER,
+                lat REAL,
+                long REAL
+            );
+            CREATE INDEX IF NOT EXISTS detections_timestamp ON detections (timestamp);
+            CREATE INDEX IF NOT EXISTS detections_crop ON detections (crop, timestamp);
+            CREATE INDEX IF NOT EXISTS detections_disease ON detections (disease, timestamp);
+            """
+        )
+        self._insert = (
+            f"INSERT INTO detections ({', '.join(FIELDS)}) "
+            f"VALUES ({', '.join('?' for _ in FIELDS)})"
+        )
+
+    def write(self, rows: list[dict]):
+        with self._conn:
+            self._conn.executemany(self._insert, [tuple(row[field] for field in FIELDS) for row in rows])
+
+    def sync(self):
+        self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def close(self):
+        self.sync()
+        self._conn.close()
+
+
+class ParquetSink:
+    """
+    Parquet files cannot be appended to, and one left open is unreadable
+    after a crash (its footer is written last). Rows are therefore held
+    until sync() and then written as a new, complete part file:
+
+        <path>/part-<time>-<n>.parquet
+
+    Read the directory as one dataset, e.g. pyarrow.dataset or DuckDB's
+    read_parquet('<path>/*.parquet').
+    """
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet detection logs need the optional pyarrow package")
+
+        self.path = path
+        self._pa = pa
+        self._pq = pq
+        self._schema = pa.schema([
+            ("timestamp", pa.string()),
+            ("crop", pa.string()),
+            ("disease", pa.string()),
+            ("satellites", pa.int32()),
+            ("lat", pa.float64()),
+            ("long", pa.float64()),
+        ])
+        self._rows = []
+        self._parts = 0
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, rows: list[dict]):
+        self._rows.extend(rows)
+
+    def sync(self):
+        if not self._rows:
+            return
+
+        table = self._pa.Table.from_pylist(self._rows, schema=self._schema)
+        self._parts += 1
+        name = f"part-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._parts}.parquet"
+        final = os.path.join(self.path, name)
+        tmp = os.path.join(self.path, f".{name}.tmp")
+
+        self._pq.write_table(table, tmp)
+        with open(tmp, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, final)
+        self._rows = []
+
+    def close(self):
+        self.sync()
+
+
+def open_sink(path: str):
+    """
+    Sink for `path`, chosen by its extension.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return CsvSink(path)
+    if extension in {".db", ".sqlite", ".sqlite3"}:
+        return SqliteSink(path)
+    if extension == ".parquet":
+        return ParquetSink(path)
+    raise ValueError(f"Unsupported detection log {path!r}; use .csv, .db or .parquet")
+
+
+def open_sinks(spec: str = DETECTION_LOG) -> list:
+    """
+    "a.csv,b.db" -> one sink per path.
+    """
+    paths = [path.strip() for path in spec.split(",") if path.strip()]
+    if not paths:
+        raise ValueError("No detection log path given")
+    return [open_sink(path) for path in paths]
+
+
+# -------------------------------------------------
+# WRITER
+# -------------------------------------------------
+
+class DetectionLog:
+    """
+    Queue in front of the sinks, drained by a writer thread. append()
+    never touches the disk; if the writer falls so far behind that the
+    queue fills up, the row is dropped and counted.
+
+    `written` counts rows every sink accepted; rows of a batch that any
+    sink failed to write count as `failed` instead.
+    """
+
+    def __init__(
+        self,
+        sinks: list,
+        batch_size: int = DETECTION_LOG_BATCH,
+        flush_interval: float = DETECTION_LOG_FLUSH_S,
+        fsync_interval: float = DETECTION_LOG_FSYNC_S,
+        maxsize: int = DETECTION_LOG_QUEUE,
+    ):
+        self.sinks = sinks
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+
+        self.appended = 0
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
+        self.syncs = 0
+        self.errors = 0
+
+        self._queue = queue.Queue(maxsize)
+        self._thread = threading.Thread(target=self._run, name="detection-log", daemon=True)
+        self._thread.start()
+
+    def append(self, row: dict):
+        try:
+            self._queue.put_nowait(row)
+            self.appended += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def log(self, crop: str, disease: str, satellites: int, lat: float, lon: float, timestamp: str | None = None):
+        self.append({
+            "timestamp": timestamp or time.strftime("%Y-%m-%d %H:%M:%S"),
+            "crop": crop,
+            "disease": disease,
+            "satellites": satellites,
+            "lat": lat,
+            "long": lon,
+        })
+
+    def close(self, timeout: float | None = None):
+        """
+        Writes and syncs everything appended so far, then closes the sinks.
+        """
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _each_sink(self, method: str, *args) -> bool:
+        """
+        Calls `method` on every sink; True if none of them raised.
+        """
+        ok = True
+        for sink in self.sinks:
+            try:
+                getattr(sink, method)(*args)
+            except Exception as e:
+                ok = False
+                self.errors += 1
+                print(f"Detection log {getattr(sink, 'path', sink)} {method} failed: {e}")
+        return ok
+
+    def _flush(self, batch: list[dict]):
+        if self._each_sink("write", batch):
+            self.written += len(batch)
+        else:
+            self.failed += len(batch)
+        self.batches += 1
+
+    def _sync(self):
+        self._each_sink("sync")
+        self.syncs += 1
+
+    def _run(self):
+        batch = []
+        batch_started = None
+        last_sync = time.monotonic()
+        dirty = False
+        stopping = False
+
+        while not stopping:
+            now = time.monotonic()
+            deadlines = [last_sync + self.fsync_interval] if dirty else []
+            if batch:
+                deadlines.append(batch_started + self.flush_interval)
+            timeout = max(0.0, min(deadlines) - now) if deadlines else None
+
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            # Take whatever else is already waiting, up to a full batch
+            while item is not None:
+                if item is _STOP:
+                    stopping = True
+                    break
+                if not batch:
+                    batch_started = time.monotonic()
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+
+            now = time.monotonic()
+            if batch and (stopping or len(batch) >= self.batch_size or now - batch_started >= self.flush_interval):
+                self._flush(batch)
+                batch = []
+                dirty = True
+
+            if dirty and (stopping or now - last_sync >= self.fsync_interval):
+                self._sync()
+                last_sync = now
+                dirty = False
+
+        self._each_sink("close")
+
+    def stats(self) -> dict:
+        return {
+            "appended": self.appended,
+            "written": self.written,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "pending": self._queue.qsize(),
+            "batches": self.batches,
+            "syncs": self.syncs,
+            "errors": self.errors,
+        }
@@ -0,0 +1,63 @@
+"""
+Exports crop models to a CPU inference backend and checks parity.
+
+Usage:
+    python export_models.py --backend onnx
+    python export_models.py --backend openvino --crops tomato chilli --images test
+    python export_models.py --backend torch   # fused {crop}.prepared.pt
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from model_core import (
+    SUPPORTED_CROPS,
+    SUPPORTED_BACKENDS,
+    export_model,
+    prepare_model,
+    check_parity,
+    load_image,
+)
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def list_images(folder: str) -> list[str]:
+    return sorted(
+        os.path.join(folder, name)
+        for name in os.listdir(folder)
+        if name.lower().endswith(IMAGE_SUFFIXES)
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", required=True, choices=sorted(SUPPORTED_BACKENDS))
+    parser.add_argument("--crops", nargs="*", default=sorted(SUPPORTED_CROPS))
+    parser.add_argument("--images", default="test", help="Folder of images for the parity check")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--skip-parity", action="store_true")
+    args = parser.parse_args(argv)
+
+    # Both sides of the parity check would load the prepared torch model
+    skip_parity = args.skip_parity or args.backend == "torch"
+    images = [] if skip_parity else list_images(args.images)
+    failed = False
+
+    for crop in args.crops:
+        path = prepare_model(crop) if args.backend == "torch" else export_model(crop, args.backend)
+        print(f"{crop}: {path}")
+
+        for image_path in images:
+            report = check_parity(crop, load_image(image_path), args.backend, args.threshold)
+            report["image"] = image_path
+            print(json.dumps(report))
+            failed |= not report["ok"]
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
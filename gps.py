@@ -0,0 +1,410 @@
+"""
+GPS ingestion for the field recorder.
+
+A GpsReceiver thread reads from a source and feeds the bytes to an
+incremental parser. Each new fix is published by swapping in a fresh dict,
+so readers such as the inference and render stages just call fix() and
+never take a lock. Sources:
+
+    SerialSource   a receiver on a serial port. Reads block with a
+                   timeout, so an idle port costs no CPU.
+    ReplaySource   a recorded NMEA log, paced by its own timestamps, for
+                   testing without hardware.
+    MockSource     random fixes around a base point (the old mock).
+
+The parser understands NMEA 0183 GGA and RMC sentences from any talker
+(GP, GN, GL, ...) and the legacy "LAT:16.49,LON:80.49,SAT:7" lines of
+the Arduino sketch.
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+
+GPS_BAUD = int(os.getenv("GPS_BAUD", "9600"))
+GPS_REPLAY = os.getenv("GPS_REPLAY", "")
+GPS_REPLAY_SPEED = float(os.getenv("GPS_REPLAY_SPEED", "1.0"))
+
+# Longest line kept while waiting for its newline; anything longer is noise
+MAX_LINE = 1024
+
+NO_FIX = {
+    "lat": 0.0,
+    "lon": 0.0,
+    "satellites": 0,
+    "valid": False,
+    "time": None,
+    "updated_at": None,
+}
+
+
+def get_default_port():
+    """Detects OS and finds the most likely Arduino port."""
+    import serial.tools.list_ports
+
+    if sys.platform.startswith('win'):
+        # Windows
+        ports = list(serial.tools.list_ports.comports())
+        for p in ports:
+            if 'Arduino' in p.description:
+                return p.device
+        return ports[0].device if ports else "COM3"
+    else:
+        # Linux/macOS
+        if os.path.exists('/dev/ttyACM0'):
+            return '/dev/ttyACM0'
+        elif os.path.exists('/dev/ttyUSB0'):
+            return '/dev/ttyUSB0'
+        return '/dev/ttyACM0'
+
+
+# -------------------------------------------------
+# PARSER
+# -------------------------------------------------
+
+def nmea_checksum_ok(sentence: str) -> bool:
+    """
+    True if `sentence` ("$...*hh") has no checksum or a matching one.
+    """
+    body, star, checksum = sentence[1:].partition("*")
+    if not star:
+        return True
+
+    value = 0
+    for char in body:
+        value ^= ord(char)
+    try:
+        return value == int(checksum[:2], 16)
+    except ValueError:
+        return False
+
+
+def nmea_coordinate(value: str, hemisphere: str) -> float | None:
+    """
+    NMEA "ddmm.mmmm" / "dddmm.mmmm" plus N/S/E/W -> signed degrees.
+    """
+    if not value:
+        return None
+    try:
+        dot = value.index(".") if "." in value else len(value)
+        degrees = float(value[:dot - 2])
+        minutes = float(value[dot - 2:])
+    except ValueError:
+        return None
+
+    coordinate = degrees + minutes / 60.0
+    return -coordinate if hemisphere in ("S", "W") else coordinate
+
+
+def nmea_time(value: str) -> str | None:
+    """
+    "hhmmss.ss" -> "hh:mm:ss" (UTC).
+    """
+    if len(value) < 6:
+        return None
+    return f"{value[0:2]}:{value[2:4]}:{value[4:6]}"
+
+
+def _parse_gga(fields: list[str]) -> dict:
+    # $--GGA,time,lat,N,lon,E,quality,satellites,hdop,altitude,M,...
+    update = {"time": nmea_time(fields[1])}
+    if fields[7].isdigit():
+        update["satellites"] = int(fields[7])
+
+    quality = int(fields[6]) if fields[6].isdigit() else 0
+    lat = nmea_coordinate(fields[2], fields[3])
+    lon = nmea_coordinate(fields[4], fields[5])
+    update["valid"] = quality > 0 and lat is not None and lon is not None
+    if update["valid"]:
+        update["lat"] = lat
+        update["lon"] = lon
+    return update
+
+
+def _parse_rmc(fields: list[str]) -> dict:
+    # $--RMC,time,status,lat,N,lon,E,speed,course,date,...
+    update = {"time": nmea_time(fields[1])}
+    lat = nmea_coordinate(fields[3], fields[4])
+    lon = nmea_coordinate(fields[5], fields[6])
+    update["valid"] = fields[2] == "A" and lat is not None and lon is not None
+    if update["valid"]:
+        update["lat"] = lat
+        update["lon"] = lon
+    return update
+
+
+# Sentence type -> (parser, minimum field count)
+_NMEA_PARSERS = {
+    "GGA": (_parse_gga, 8),
+    "RMC": (_parse_rmc, 7),
+}
+
+_LEGACY_KEYS = {"LAT": ("lat", float), "LON": ("lon", float), "SAT": ("satellites", lambda v: int(float(v)))}
+
+
+def _legacy_key(key: str):
+    # Like the original reader, match "LAT:" anywhere in the field, so
+    # prefixed output such as "GPS LAT:16.49" still parses
+    for suffix, target in _LEGACY_KEYS.items():
+        if key.endswith(suffix):
+            return target
+    return None
+
+
+def _parse_legacy(line: str) -> dict | None:
+    update = {}
+    for part in line.split(","):
+        key, colon, value = part.partition(":")
+        target = _legacy_key(key.strip())
+        if not colon or target is None:
+            continue
+        name, parse = target
+        try:
+            update[name] = parse(value.strip())
+        except ValueError:
+            pass
+
+    if "lat" not in update or "lon" not in update:
+        return None
+    update["valid"] = True
+    return update
+
+
+def parse_line(line: str) -> dict | None:
+    """
+    One GGA / RMC sentence or legacy line -> the fix fields it carries,
+    or None if the line is not one of those (or is corrupt).
+    """
+    line = line.strip()
+    if line.startswith("$"):
+        if not nmea_checksum_ok(line):
+            return None
+        fields = line.partition("*")[0].split(",")
+        parser = _NMEA_PARSERS.get(fields[0][-3:])
+        if parser is None or len(fields) < parser[1] + 1:
+            return None
+        return parser[0](fields)
+
+    if "LAT:" in line and "LON:" in line:
+        return _parse_legacy(line)
+    return None
+
+
+class NmeaParser:
+    """
+    Incremental parser: feed() takes raw bytes as they arrive, keeps any
+    unfinished line for the next call, and returns the updates of the
+    lines it completed.
+    """
+
+    def __init__(self):
+        self.lines = 0
+        self.rejected = 0
+        self._buffer = b""
+
+    def feed(self, data: bytes) -> list[dict]:
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b"\n")
+        if len(self._buffer) > MAX_LINE:
+            self._buffer = b""
+
+        updates = []
+        for raw in lines:
+            line = raw.decode("ascii", errors="ignore").strip()
+            if not line:
+                continue
+            self.lines += 1
+            update = parse_line(line)
+            if update is None:
+                self.rejected += 1
+            else:
+                updates.append(update)
+        return updates
+
+
+# -------------------------------------------------
+# SOURCES
+# -------------------------------------------------
+
+class SerialSource:
+    def __init__(self, port: str, baud: int = GPS_BAUD, timeout: float = 1.0):
+        import serial
+
+        self.name = port
+        self._serial = serial.Serial(port, baud, timeout=timeout)
+        self._serial.reset_input_buffer()
+
+    def read(self) -> bytes:
+        """
+        Whatever has arrived, blocking up to the timeout for the first
+        byte; b"" if nothing came.
+        """
+        return self._serial.read(max(1, self._serial.in_waiting))
+
+    def close(self):
+        if self._serial.is_open:
+            self._serial.close()
+
+
+class ReplaySource:
+    """
+    Plays back a recorded NMEA log (one sentence per line, e.g. captured
+    with `cat /dev/ttyACM0 > drive.nmea`). Sentences are released at the
+    pace of their UTC times divided by `speed`; `loop` starts over at the
+    end instead of ending the stream.
+    """
+
+    def __init__(self, path: str, speed: float = GPS_REPLAY_SPEED, loop: bool = True, max_gap: float = 5.0):
+        self.name = path
+        self.speed = speed
+        self.loop = loop
+        self.max_gap = max_gap
+
+        with open(path, "rb") as f:
+            self._lines = [line.rstrip(b"\r\n") + b"\n" for line in f if line.strip()]
+        self._index = 0
+        self._last_time = None
+        self._closed = threading.Event()
+
+    @staticmethod
+    def _seconds(line: bytes) -> float | None:
+        fields = line.split(b",", 2)
+        if not line.startswith(b"$") or len(fields) < 2 or len(fields[1]) < 6:
+            return None
+        try:
+            t = fields[1]
+            return int(t[0:2]) * 3600 + int(t[2:4]) * 60 + float(t[4:])
+        except ValueError:
+            return None
+
+    def read(self) -> bytes:
+        if self._index >= len(self._lines):
+            if not self.loop or not self._lines:
+                return None
+            self._index = 0
+            self._last_time = None
+
+        line = self._lines[self._index]
+        self._index += 1
+
+        seconds = self._seconds(line)
+        if seconds is not None:
+            if self._last_time is not None and seconds > self._last_time and self.speed > 0:
+                gap = min(seconds - self._last_time, self.max_gap)
+                if self._closed.wait(gap / self.speed):
+                    return None
+            self._last_time = seconds
+        return line
+
+    def close(self):
+        self._closed.set()
+
+
+class MockSource:
+    """
+    Legacy-format fixes scattered around a base point, once per
+    `interval` seconds.
+    """
+
+    def __init__(self, base_lat: float = 16.495906, base_lon: float = 80.496290, interval: float = 1.0):
+        self.name = "mock"
+        self.base_lat = base_lat
+        self.base_lon = base_lon
+        self.interval = interval
+        self._first = True
+        self._closed = threading.Event()
+
+    def read(self) -> bytes:
+        if not self._first and self._closed.wait(self.interval):
+            return None
+        self._first = False
+
+        lat = self.base_lat + random.uniform(-0.0005, 0.0005)
+        lon = self.base_lon + random.uniform(-0.0005, 0.0005)
+        return f"LAT:{lat:.6f},LON:{lon:.6f},SAT:{random.randint(5, 12)}\n".encode()
+
+    def close(self):
+        self._closed.set()
+
+
+def open_source(mock: bool, port: str, replay: str = GPS_REPLAY):
+    """
+    Mock mode replays GPS_REPLAY when it is set, otherwise generates
+    random fixes; real mode opens the serial port.
+    """
+    if mock:
+        return ReplaySource(replay) if replay else MockSource()
+    return SerialSource(port)
+
+
+# -------------------------------------------------
+# RECEIVER
+# -------------------------------------------------
+
+class GpsReceiver:
+    """
+    Background reader that keeps the latest fix. The fix dict is never
+    modified once published; each update builds a new one and swaps the
+    reference, which readers pick up without locking.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.parser = NmeaParser()
+        self.error = None
+
+        self._fix = dict(NO_FIX)
+        self._running = False
+        self._thread = None
+
+    def fix(self) -> dict:
+        """
+        Latest fix snapshot; treat as read-only.
+        """
+        return self._fix
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="gps", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 2.0):
+        self._running = False
+        self.source.close()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _apply(self, update: dict):
+        fix = dict(self._fix)
+        fix.update(update)
+        fix["updated_at"] = time.time()
+        self._fix = fix
+
+    def _run(self):
+        print(f"GPS reading from {self.source.name}")
+        try:
+            while self._running:
+                data = self.source.read()
+                if data is None:
+                    break
+                for update in self.parser.feed(data):
+                    self._apply(update)
+        except Exception as e:
+            # e.g. the receiver was unplugged; keep the last fix
+            if self._running:
+                self.error = e
+                print(f"GPS read error: {e}")
+        finally:
+            self.source.close()
+
+    def stats(self) -> dict:
+        fix = self._fix
+        return {
+            "source": self.source.name,
+            "lines": self.parser.lines,
+            "rejected": self.parser.rejected,
+            "age_s": round(time.time() - fix["updated_at"], 1) if fix["updated_at"] else None,
+            "error": str(self.error) if self.error else None,
+        }
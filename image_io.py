@@ -0,0 +1,262 @@
+import io
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+# -------------------------------------------------
+# FORMAT SNIFFING
+# -------------------------------------------------
+
+# Decoding keeps the longest side at or above this size, matching the
+# model input so no detail YOLO would see is thrown away. 0 disables
+# reduced-resolution decoding.
+DECODE_TARGET_SIZE = int(os.getenv("DECODE_TARGET_SIZE", "640"))
+
+SUPPORTED_FORMATS = {"jpeg", "png", "webp", "heic"}
+
+_HEIC_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"mif1", b"msf1", b"heim", b"heis"}
+
+_REDUCED_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def sniff_format(data) -> str | None:
+    """
+    Identifies the image format from its magic bytes.
+    """
+    head = bytes(data[:16])
+
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[4:8] == b"ftyp" and head[8:12] in _HEIC_BRANDS:
+        return "heic"
+    return None
+
+
+# -------------------------------------------------
+# HEADER DIMENSIONS
+# -------------------------------------------------
+
+def _jpeg_size(data) -> tuple[int, int] | None:
+    i = 2
+    n = len(data)
+
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+
+        # Fill bytes and markers without a length field
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+
+        length = struct.unpack(">H", bytes(data[i + 2:i + 4]))[0]
+
+        # SOF0..SOF15, excluding DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            h, w = struct.unpack(">HH", bytes(data[i + 5:i + 9]))
+            return w, h
+
+        i += 2 + length
+
+    return None
+
+
+def _png_size(data) -> tuple[int, int] | None:
+    if len(data) < 24:
+        return None
+    w, h = struct.unpack(">II", bytes(data[16:24]))
+    return w, h
+
+
+def _webp_size(data) -> tuple[int, int] | None:
+    chunk = bytes(data[12:16])
+    body = bytes(data[20:30])
+
+    if chunk == b"VP8 " and len(body) >= 10:
+        w, h = struct.unpack("<HH", body[6:10])
+        return w & 0x3FFF, h & 0x3FFF
+    if chunk == b"VP8L" and len(body) >= 5:
+        bits = int.from_bytes(body[1:5], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(body) >= 10:
+        w = int.from_bytes(body[4:7], "little") + 1
+        h = int.from_bytes(body[7:10], "little") + 1
+        return w, h
+    return None
+
+
+def image_size(data, image_format: str) -> tuple[int, int] | None:
+    """
+    Reads (width, height) from the encoded header without decoding pixels.
+    Returns None when the header cannot be parsed.
+    """
+    try:
+        if image_format == "jpeg":
+            return _jpeg_size(data)
+        if image_format == "png":
+            return _png_size(data)
+        if image_format == "webp":
+            return _webp_size(data)
+    except struct.error:
+        return None
+    return None
+
+
+# -------------------------------------------------
+# DECODING
+# -------------------------------------------------
+
+def choose_reduction(width: int, height: int, target_size: int) -> int:
+    """
+    Largest JPEG scale-down factor (1, 2, 4 or 8) that keeps the longest
+    side at or above `target_size`.
+    """
+    if not target_size:
+        return 1
+
+    longest = max(width, height)
+    for factor in (8, 4, 2):
+        if longest / factor >= target_size:
+            return factor
+    return 1
+
+
+def _decode_heic(data) -> np.ndarray:
+    try:
+        import pillow_heif
+    except ImportError:
+        raise ValueError("HEIC images need the optional pillow-heif package")
+
+    heif = pillow_heif.open_heif(bytes(data), convert_hdr_to_8bit=True)
+    rgb = np.asarray(heif.to_pillow().convert("RGB"))
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+
+def decode_image(data, target_size: int | None = DECODE_TARGET_SIZE):
+    """
+    Decodes encoded image bytes into a BGR array.
+
+    The format is taken from the magic bytes, not the declared content
+    type. Large JPEGs are decoded at 1/2, 1/4 or 1/8 scale directly by
+    libjpeg when that still leaves the longest side >= `target_size`.
+
+    Returns (image, scale) where `scale` = (sx, sy) maps coordinates in
+    the decoded image back to the original one.
+    """
+    image_format = sniff_format(data)
+    if image_format is None:
+        raise ValueError("Unsupported image format")
+
+    if image_format == "heic":
+        return _decode_heic(data), (1.0, 1.0)
+
+    flags = cv2.IMREAD_COLOR
+    size = image_size(data, image_format) if image_format == "jpeg" else None
+    if size is not None:
+        flags = _REDUCED_FLAGS.get(choose_reduction(*size, target_size or 0), flags)
+
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), flags)
+    if image is None:
+        raise ValueError("Invalid or corrupted image")
+
+    if size is None or flags == cv2.IMREAD_COLOR:
+        return image, (1.0, 1.0)
+
+    # EXIF rotation swaps the axes of the decoded image
+    h, w = image.shape[:2]
+    orig_w, orig_h = size if (w >= h) == (size[0] >= size[1]) else size[::-1]
+    return image, (orig_w / w, orig_h / h)
+
+
+# -------------------------------------------------
+# UPLOAD INGESTION
+# -------------------------------------------------
+
+# Enough for the SOF marker after a maximum-size EXIF segment
+HEADER_BYTES = 70 * 1024
+
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(80_000_000)))
+
+
+class ImageTooLargeError(ValueError):
+    """
+    Raised when an image's encoded dimensions exceed MAX_IMAGE_PIXELS.
+    """
+
+
+def read_header(fileobj, size: int = HEADER_BYTES) -> bytes:
+    """
+    Reads the first bytes of a file object without moving its position.
+    """
+    position = fileobj.tell()
+    fileobj.seek(0)
+    head = fileobj.read(size)
+    fileobj.seek(position)
+    return head
+
+
+def check_header(head, max_pixels: int = MAX_IMAGE_PIXELS) -> str:
+    """
+    Validates an upload from its header bytes alone and returns its format.
+    Rejects non-images and decompression bombs before any pixel is decoded.
+    """
+    image_format = sniff_format(head)
+    if image_format is None:
+        raise ValueError("Unsupported image format")
+
+    size = image_size(head, image_format)
+    if size is not None and max_pixels and size[0] * size[1] > max_pixels:
+        raise ImageTooLargeError(
+            f"Image too large: {size[0]}x{size[1]} "
+            f"(max {max_pixels} pixels)"
+        )
+
+    return image_format
+
+
+@contextmanager
+def upload_view(spooled):
+    """
+    Yields a zero-copy buffer over an uploaded file.
+
+    Multipart uploads are SpooledTemporaryFiles: small ones live in a
+    BytesIO, whose buffer is exposed directly; larger ones have rolled to
+    disk and are memory-mapped instead of read into a bytes object.
+    """
+    inner = getattr(spooled, "_file", spooled)
+
+    if isinstance(inner, io.BytesIO):
+        view = inner.getbuffer()
+        try:
+            yield view
+        finally:
+            view.release()
+        return
+
+    inner.flush()
+    if os.fstat(inner.fileno()).st_size == 0:
+        yield memoryview(b"")
+        return
+
+    with mmap.mmap(inner.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            yield view
+        finally:
+            view.release()
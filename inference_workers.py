@@ -0,0 +1,645 @@
+"""
+Out-of-process inference: crop-pinned worker processes fed through
+shared-memory ring buffers.
+
+Each crop gets a multiprocessing.shared_memory block split into fixed-size
+slots. A decoded frame is copied once into a free slot and only
+(request id, slot, shape, dtype) goes over the queue, so pixel arrays are
+never pickled. Workers send back raw_detections arrays, which are small,
+on one shared result queue. Everything runs locally with no broker.
+
+Every worker has its own request queue, and the parent keeps what it
+queued there until the answer comes back. A worker bumps a `taken` count
+in shared memory for each request it reads, so when it dies the parent
+knows which requests it had started: only those are failed. The rest are
+queued again, on a fresh queue, for its replacement (a process killed
+inside Queue.get() leaves that queue's read lock held).
+
+Enable it in the API with INFERENCE_PROCESSES=<worker processes per crop>.
+"""
+
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from model_core import (
+    BATCH_MAX_SIZE,
+    BATCH_QUEUE_DEPTH,
+    SUPPORTED_CROPS,
+    QueueFullError,
+    resolve_backend,
+)
+
+INFERENCE_PROCESSES = int(os.getenv("INFERENCE_PROCESSES", "0"))
+INFERENCE_PROCESS_CROPS = os.getenv("INFERENCE_PROCESS_CROPS", "all")
+
+# A slot holds one decoded frame; 4 MB fits the 640 px decodes and
+# tiles. Larger frames, or any frame while the ring is full, are sent
+# inline instead.
+SHM_SLOTS = int(os.getenv("SHM_SLOTS", "16"))
+SHM_SLOT_BYTES = int(float(os.getenv("SHM_SLOT_MB", "4")) * 1024 * 1024)
+
+WORKER_START_TIMEOUT = float(os.getenv("WORKER_START_TIMEOUT", "300"))
+
+# How often the result reader checks for dead workers, busy or not
+WORKER_CHECK_INTERVAL = float(os.getenv("WORKER_CHECK_INTERVAL", "1.0"))
+
+
+def parse_crops(value: str) -> list[str]:
+    if value.strip().lower() == "all":
+        return sorted(SUPPORTED_CROPS)
+    return [c.strip().lower() for c in value.split(",") if c.strip()]
+
+
+# -------------------------------------------------
+# SHARED-MEMORY RING
+# -------------------------------------------------
+
+class SharedRing:
+    """
+    Fixed-size frame slots in one shared-memory block.
+
+    The parent creates the ring and hands out free slots; a slot returns
+    to the free list when its result comes back. Workers attach by name
+    and only read.
+    """
+
+    def __init__(self, slots: int, slot_bytes: int, name: str | None = None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(
+            name=name,
+            create=self.owner,
+            size=slots * slot_bytes if self.owner else 0,
+        )
+        self._free = queue.SimpleQueue()
+        if self.owner:
+            for slot in range(slots):
+                self._free.put(slot)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def acquire(self) -> int | None:
+        """
+        Returns a free slot, or None when every slot is in flight.
+        """
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            return None
+
+    def release(self, slot: int):
+        self._free.put(slot)
+
+    def in_use(self) -> int:
+        return self.slots - self._free.qsize()
+
+    def view(self, slot: int, shape: tuple, dtype) -> np.ndarray:
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def write(self, slot: int, image: np.ndarray):
+        # One copy, which also makes strided views (tiles) contiguous
+        np.copyto(self.view(slot, image.shape, image.dtype), image)
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+# -------------------------------------------------
+# WORKER PROCESS
+# -------------------------------------------------
+
+def _read_frames(ring: SharedRing, batch: list) -> list:
+    return [
+        frame if slot is None else ring.view(slot, shape, np.dtype(dtype))
+        for _, slot, shape, dtype, frame in batch
+    ]
+
+
+def worker_main(
+    crop: str,
+    backend: str,
+    ring_name: str,
+    slots: int,
+    slot_bytes: int,
+    requests,
+    results,
+    torch_threads: int,
+    max_batch: int,
+    taken,
+):
+    """
+    Worker loop: loads one crop's model, then drains its request queue
+    in batches of up to `max_batch` frames per forward pass. If the model
+    cannot be loaded, the worker reports "failed" and exits.
+    """
+    import torch
+
+    from model_core import describe_model, get_model, raw_detections
+
+    torch.set_num_threads(torch_threads)
+    ring = SharedRing(slots, slot_bytes, name=ring_name)
+
+    try:
+        model = get_model(crop, backend, pin=True)
+        model(np.zeros((64, 64, 3), dtype=np.uint8), verbose=False)
+    except Exception as e:
+        results.put(("failed", crop, os.getpid(), f"{type(e).__name__}: {e}"))
+        ring.close()
+        return
+
+    names = [model.names[i] for i in range(len(model.names))]
+    results.put(("ready", crop, os.getpid(), names, describe_model(model)))
+
+    stopping = False
+    while not stopping:
+        message = requests.get()
+        if message is None:
+            break
+        taken.value += 1
+
+        batch = [message]
+        while len(batch) < max_batch:
+            try:
+                message = requests.get_nowait()
+            except queue.Empty:
+                break
+            if message is None:
+                stopping = True
+                break
+            taken.value += 1
+            batch.append(message)
+
+        try:
+            outputs = model(_read_frames(ring, batch), verbose=False)
+            for (request_id, *_), output in zip(batch, outputs):
+                raw = raw_detections(output)
+                results.put(("result", request_id, raw["boxes"], raw["probs"], output.speed))
+        except Exception as e:
+            for request_id, *_ in batch:
+                results.put(("error", request_id, f"{type(e).__name__}: {e}"))
+
+    try:
+        ring.close()
+    except BufferError:
+        pass
+
+
+# -------------------------------------------------
+# POOL (API PROCESS SIDE)
+# -------------------------------------------------
+
+class _Worker:
+    """
+    One worker process and its request queue. `sent` holds the (id,
+    message) pairs queued to it, oldest first, until they are answered;
+    `acknowledged` counts those answered since the current process started.
+    """
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.requests = channel.pool.context.Queue()
+        self.sent = deque()
+        self.acknowledged = 0
+        self.process = None
+        self.taken = None
+
+    def start(self):
+        pool = self.channel.pool
+        self.taken = pool.context.Value("q", 0, lock=False)
+        self.acknowledged = 0
+        self.process = pool.context.Process(
+            target=worker_main,
+            args=(
+                self.channel.crop,
+                pool.backend,
+                self.channel.ring.name,
+                self.channel.ring.slots,
+                self.channel.ring.slot_bytes,
+                self.requests,
+                pool.results,
+                pool.torch_threads,
+                pool.max_batch,
+                self.taken,
+            ),
+            name=f"inference-{self.channel.crop}",
+            daemon=True,
+        )
+        self.process.start()
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def send(self, request_id: int, message: tuple):
+        self.sent.append((request_id, message))
+        self.requests.put(message)
+
+    def acknowledge(self, request_id: int):
+        """
+        A result came back. The worker serves its queue in order, so every
+        request queued before this one has been answered too.
+        """
+        if not any(rid == request_id for rid, _ in self.sent):
+            return
+        while self.sent:
+            self.acknowledged += 1
+            if self.sent.popleft()[0] == request_id:
+                break
+
+    def lost(self) -> list[int]:
+        """
+        After the process died: the ids it had taken without answering.
+        What it never read is moved to a new queue, in order.
+        """
+        count = min(len(self.sent), max(0, self.taken.value - self.acknowledged))
+        lost = [self.sent.popleft()[0] for _ in range(count)]
+
+        self.requests.cancel_join_thread()
+        self.requests.close()
+        self.requests = self.channel.pool.context.Queue()
+        for _, message in self.sent:
+            self.requests.put(message)
+        return lost
+
+
+class _CropChannel:
+    """
+    One crop's ring and workers. Exposes the scheduler interface,
+    submit(image) -> Future, used by model_core.
+    """
+
+    def __init__(self, pool, crop: str, processes: int):
+        self.pool = pool
+        self.crop = crop
+        self.ring = SharedRing(pool.slots, pool.slot_bytes)
+        self.workers = [_Worker(self) for _ in range(processes)]
+        self.names = None
+        self.info = None  # describe_model() of the crop's model, from its workers
+        self.ready = 0
+        # Set when a worker could not load the model; the crop's workers
+        # are then not respawned
+        self.error = None
+
+        self.submitted = 0
+        self.inline = 0
+        self.errors = 0
+        self.restarts = 0
+
+    @property
+    def processes(self) -> list:
+        return [worker.process for worker in self.workers if worker.process is not None]
+
+    def pick(self) -> _Worker:
+        """
+        The running worker with the fewest unanswered requests.
+        """
+        workers = [worker for worker in self.workers if worker.process is not None] or self.workers
+        return min(workers, key=lambda worker: len(worker.sent))
+
+    def submit(self, image) -> Future:
+        if self.error is not None and not self.processes:
+            raise RuntimeError(f"Inference workers for {self.crop} failed: {self.error}")
+        image = np.asarray(image)
+        return self.pool.submit(self, image)
+
+
+class InferencePool:
+    """
+    Crop-pinned inference worker processes.
+
+    Every crop in `crops` gets `processes` workers, which keep that
+    crop's model loaded. Requests for a crop go to its own ring and
+    queue; results for all crops come back on one queue, read by a
+    single thread that resolves the callers' Futures.
+    """
+
+    def __init__(
+        self,
+        crops: list[str],
+        processes: int = max(1, INFERENCE_PROCESSES),
+        backend: str | None = None,
+        slots: int = SHM_SLOTS,
+        slot_bytes: int = SHM_SLOT_BYTES,
+        torch_threads: int | None = None,
+        max_batch: int = BATCH_MAX_SIZE,
+        max_pending: int = BATCH_QUEUE_DEPTH,
+    ):
+        self.backend = resolve_backend(backend)
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.max_batch = max(1, max_batch)
+        self.max_pending = max_pending
+
+        total = max(1, processes * len(crops))
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // total)
+
+        self.context = mp.get_context("spawn")
+        self.results = self.context.Queue()
+
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._pending = {}
+        self._closing = False
+        self._reader = None
+
+        self.channels = {
+            crop: _CropChannel(self, crop, max(1, processes))
+            for crop in dict.fromkeys(c.lower() for c in crops)
+        }
+
+    # ----------- LIFECYCLE -----------
+
+    def start(self, timeout: float = WORKER_START_TIMEOUT):
+        """
+        Starts every worker and waits until all have loaded their model.
+        Raises as soon as one reports that it cannot load it.
+        """
+        self._reader = threading.Thread(target=self._read_results, name="inference-results", daemon=True)
+        self._reader.start()
+
+        for channel in self.channels.values():
+            for worker in channel.workers:
+                worker.start()
+
+        expected = sum(len(channel.workers) for channel in self.channels.values())
+        deadline = time.monotonic() + timeout
+        with self._ready:
+            ready = self._ready.wait_for(
+                lambda: (
+                    sum(channel.ready for channel in self.channels.values()) >= expected
+                    or any(channel.error for channel in self.channels.values())
+                ),
+                max(0.0, deadline - time.monotonic()),
+            )
+        failed = [channel for channel in self.channels.values() if channel.error]
+
+        # close() takes self._lock, which the condition holds
+        if failed:
+            self.close()
+            raise RuntimeError(f"Inference worker for {failed[0].crop} failed to start: {failed[0].error}")
+        if not ready:
+            self.close()
+            raise TimeoutError(f"Inference workers not ready after {timeout}s")
+        return self
+
+    def close(self, timeout: float = 10.0):
+        with self._lock:
+            if self._closing:
+                return
+            self._closing = True
+
+        for channel in self.channels.values():
+            for worker in channel.workers:
+                worker.requests.put(None)
+
+        deadline = time.monotonic() + timeout
+        for channel in self.channels.values():
+            for process in channel.processes:
+                process.join(max(0.0, deadline - time.monotonic()))
+                if process.is_alive():
+                    process.terminate()
+                    process.join(1.0)
+
+        self.results.put(("stop",))
+        if self._reader is not None:
+            self._reader.join(timeout)
+
+        self._fail_pending(lambda channel: True, RuntimeError("Inference pool closed"))
+        for channel in self.channels.values():
+            channel.ring.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ----------- REQUESTS -----------
+
+    def serves(self, crop: str, backend: str) -> bool:
+        return crop in self.channels and backend == self.backend and not self._closing
+
+    def submitter(self, crop: str) -> _CropChannel:
+        return self.channels[crop.lower()]
+
+    def model_info(self, crop: str) -> dict:
+        """
+        Task and input size of a crop's model, as its workers reported them.
+        """
+        return self.channels[crop.lower()].info
+
+    def submit(self, channel: _CropChannel, image: np.ndarray) -> Future:
+        if self._closing:
+            raise RuntimeError("Inference pool closed")
+
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                raise QueueFullError(
+                    f"Inference workers have {self.max_pending} pending requests"
+                )
+            request_id = next(self._ids)
+
+        slot = channel.ring.acquire() if image.nbytes <= channel.ring.slot_bytes else None
+        if slot is None:
+            message = (request_id, None, image.shape, image.dtype.str, np.ascontiguousarray(image))
+            channel.inline += 1
+        else:
+            channel.ring.write(slot, image)
+            message = (request_id, slot, image.shape, image.dtype.str, None)
+
+        future = Future()
+        with self._lock:
+            worker = channel.pick()
+            self._pending[request_id] = (channel, future, slot, worker)
+            worker.send(request_id, message)
+            channel.submitted += 1
+
+        return future
+
+    def _complete(self, request_id: int, answered: bool = False):
+        """
+        Forgets a request and frees its slot; returns (channel, future), or
+        (None, None) if it was already resolved. `answered` is set when its
+        worker sent back a result or error.
+        """
+        with self._lock:
+            entry = self._pending.pop(request_id, None)
+            if entry is not None and answered:
+                entry[3].acknowledge(request_id)
+        if entry is None:
+            return None, None
+
+        channel, future, slot, _ = entry
+        if slot is not None:
+            channel.ring.release(slot)
+
+        # Cancelled by the caller (e.g. early exit) while queued
+        if not future.set_running_or_notify_cancel():
+            return channel, None
+        return channel, future
+
+    def _fail_pending(self, match, error: Exception):
+        with self._lock:
+            failed = [rid for rid, (channel, *_) in self._pending.items() if match(channel)]
+        self._fail(failed, error)
+
+    def _fail(self, request_ids: list[int], error: Exception):
+        for request_id in request_ids:
+            channel, future = self._complete(request_id)
+            if future is not None:
+                future.set_exception(error)
+
+    # ----------- RESULTS -----------
+
+    def _read_results(self):
+        # Dead workers are looked for on a deadline, so a steady stream
+        # of results (from any crop) cannot postpone the check
+        next_check = time.monotonic() + WORKER_CHECK_INTERVAL
+        while True:
+            try:
+                message = self.results.get(timeout=max(0.0, next_check - time.monotonic()))
+            except queue.Empty:
+                message = None
+
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + WORKER_CHECK_INTERVAL
+
+            if message is not None and not self._handle(message):
+                return
+
+    def _handle(self, message: tuple) -> bool:
+        """
+        Applies one message from the result queue; False on "stop".
+        """
+        kind = message[0]
+        if kind == "stop":
+            return False
+
+        if kind == "ready":
+            _, crop, _, names, info = message
+            with self._ready:
+                channel = self.channels[crop]
+                channel.names = channel.names or names
+                channel.info = channel.info or info
+                channel.ready += 1
+                self._ready.notify_all()
+
+        elif kind == "failed":
+            _, crop, pid, error = message
+            print(f"Inference worker {pid} for {crop} failed to load its model: {error}")
+            with self._ready:
+                self.channels[crop].error = error
+                self._ready.notify_all()
+
+        elif kind == "result":
+            _, request_id, boxes, probs, speed = message
+            channel, future = self._complete(request_id, answered=True)
+            if future is not None:
+                future.set_result({"names": channel.names, "boxes": boxes, "probs": probs, "speed": speed})
+
+        elif kind == "error":
+            _, request_id, error = message
+            channel, future = self._complete(request_id, answered=True)
+            if channel is not None:
+                channel.errors += 1
+            if future is not None:
+                future.set_exception(RuntimeError(error))
+
+        return True
+
+    def _drain(self):
+        while True:
+            try:
+                message = self.results.get_nowait()
+            except queue.Empty:
+                return
+            if not self._handle(message):
+                # "stop": leave it for the read loop
+                self.results.put(message)
+                return
+
+    def _check_workers(self):
+        """
+        Replaces dead workers. Only the requests a dead worker had taken
+        off its queue are failed; the rest are queued for its replacement.
+        """
+        if self._closing:
+            return
+
+        workers = [worker for channel in self.channels.values() for worker in channel.workers]
+        if all(worker.process is None or worker.alive for worker in workers):
+            return
+        # Results a worker sent just before it died may still be queued;
+        # apply them first so those requests are not counted as lost
+        self._drain()
+
+        for channel in self.channels.values():
+            for worker in channel.workers:
+                if worker.process is None or worker.alive:
+                    continue
+                process = worker.process
+                with self._lock:
+                    lost = worker.lost()
+                    # Respawning a worker that cannot load its model would
+                    # only fail again
+                    if channel.error is None:
+                        channel.restarts += 1
+                        worker.start()
+                    else:
+                        worker.process = None
+                        worker.sent.clear()
+                self._fail(
+                    lost,
+                    RuntimeError(f"Inference worker {process.pid} for {channel.crop} exited"),
+                )
+
+            if channel.error is not None and not channel.processes:
+                self._fail_pending(
+                    lambda c, channel=channel: c is channel,
+                    RuntimeError(f"Inference workers for {channel.crop} failed: {channel.error}"),
+                )
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = {}
+            for channel, *_ in self._pending.values():
+                pending[channel.crop] = pending.get(channel.crop, 0) + 1
+
+        return {
+            "backend": self.backend,
+            "torch_threads": self.torch_threads,
+            "max_batch_size": self.max_batch,
+            "crops": {
+                crop: {
+                    "processes": len(channel.processes),
+                    "alive": sum(p.is_alive() for p in channel.processes),
+                    "pids": [p.pid for p in channel.processes],
+                    "slots": channel.ring.slots,
+                    "slot_bytes": channel.ring.slot_bytes,
+                    "slots_in_use": channel.ring.in_use(),
+                    "pending": pending.get(crop, 0),
+                    "submitted": channel.submitted,
+                    "inline": channel.inline,
+                    "errors": channel.errors,
+                    "restarts": channel.restarts,
+                    "error": channel.error,
+                }
+                for crop, channel in self.channels.items()
+            },
+        }
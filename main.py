@@ -1,12 +1,111 @@
-from fastapi import FastAPI, UploadFile, File, Query, HTTPException
-from fastapi.responses import JSONResponse, RedirectResponse
-import numpy as np
+from fastapi import FastAPI, UploadFile, File, Query, Header, HTTPException
+from fastapi.responses import JSONResponse, RedirectResponse, Response
+from starlette.concurrency import run_in_threadpool
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+import asyncio
+import contextvars
+import base64
+import importlib.metadata
+import os
+import secrets
+import tarfile
+import zipfile
 import cv2
 import sys
-import torch
-import ultralytics
 
-from model_core import run_inference, SUPPORTED_CROPS, _loaded_models, get_model
+from image_io import (
+    decode_image,
+    check_header,
+    DECODE_TARGET_SIZE,
+    read_header,
+    upload_view,
+    ImageTooLargeError,
+    HEADER_BYTES,
+)
+from model_core import (
+    run_inference_async,
+    run_inference_batch_async,
+    run_inference_with_plot_async,
+    run_inference_tiled_async,
+    run_inference_multi_async,
+    top_confidence,
+    SUPPORTED_CROPS,
+    model_registry,
+    batching_stats,
+    model_states,
+    QueueFullError,
+    INFERENCE_WORKERS,
+    TORCH_THREADS,
+    MODEL_BACKEND,
+    MODEL_PRECISION,
+    image_cache_key,
+    image_cache_keys,
+    cached_output,
+    result_cache,
+    TILE_SIZE,
+    TILE_OVERLAP,
+    TILE_MAX_TILES,
+    set_remote_pool,
+)
+from inference_workers import (
+    InferencePool,
+    INFERENCE_PROCESSES,
+    INFERENCE_PROCESS_CROPS,
+    parse_crops,
+)
+from metrics import (
+    MetricsMiddleware,
+    ServiceCollector,
+    mark_upload_parsed,
+    metrics_payload,
+    register_collector,
+    timed_stage,
+)
+from preload import Preloader, load_policy, warm_model
+from profiling import (
+    ProfilingMiddleware,
+    profiler,
+    start_from_env,
+    PROFILE_ADMIN_TOKEN,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Starts the optional out-of-process inference workers
+    (INFERENCE_PROCESSES > 0), the background model preload and any
+    profiling session configured in the environment, and stops them on
+    shutdown.
+    """
+    # Built first: a bad preload policy fails startup before any worker
+    # process exists
+    preloader = Preloader(load_policy())
+
+    pool = None
+    if INFERENCE_PROCESSES > 0:
+        pool = InferencePool(parse_crops(INFERENCE_PROCESS_CROPS), INFERENCE_PROCESSES)
+    app.state.inference_pool = pool
+
+    try:
+        if pool is not None:
+            await run_in_threadpool(pool.start)
+            set_remote_pool(pool)
+
+        preloader.start()
+        app.state.preloader = preloader
+
+        start_from_env()
+        app.state.started = True
+
+        yield
+    finally:
+        await run_in_threadpool(profiler.stop)
+        if pool is not None:
+            set_remote_pool(None)
+            await run_in_threadpool(pool.close)
+
 
 app = FastAPI(
     title="Crop Disease Detection API",
@@ -24,7 +123,8 @@ YOLO-based inference API for crop disease detection.
 ### Output Types
 - **boxes** → Bounding box detection
 - **classify** → Classification probabilities
-"""
+""",
+    lifespan=lifespan,
 )
 
 # --------------------------------------------------
@@ -46,7 +146,13 @@ def root():
             "docs": "/docs",
             "redoc": "/redoc",
             "predict": "/predict/{crop}",
+            "predict_auto": "/predict",
+            "predict_batch": "/predict/{crop}/batch",
+            "predict_annotated": "/predict/{crop}/annotated",
             "health": "/health",
+            "livez": "/livez",
+            "readyz": "/readyz",
+            "metrics": "/metrics",
         }
     }
 
@@ -54,17 +160,385 @@ def root():
 # UTILS
 # --------------------------------------------------
 
-def read_image_from_upload(file: UploadFile):
-    if file.content_type not in ("image/jpeg", "image/png", "image/jpg"):
-        raise HTTPException(status_code=400, detail="Unsupported image format")
+ARCHIVE_CONTENT_TYPES = (
+    "application/zip",
+    "application/x-zip-compressed",
+    "application/x-tar",
+    "application/gzip",
+    "application/x-gzip",
+)
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+ARCHIVE_IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp", ".heic", ".heif")
+
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "64"))
+DECODE_WORKERS = int(os.getenv("DECODE_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(256 * 1024 * 1024)))
+
+# MAX_REQUEST_BYTES only bounds the compressed body. These bound what the
+# archives of one request may expand to, checked from their metadata
+# before anything is extracted.
+MAX_ARCHIVE_BYTES = int(os.getenv("MAX_ARCHIVE_BYTES", str(MAX_REQUEST_BYTES)))
+MAX_ARCHIVE_MEMBERS = int(os.getenv("MAX_ARCHIVE_MEMBERS", "10000"))
+
+MAX_INFLIGHT_REQUESTS = int(os.getenv("MAX_INFLIGHT_REQUESTS", "64"))
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "1"))
+
+_decode_executor = ThreadPoolExecutor(
+    max_workers=DECODE_WORKERS,
+    thread_name_prefix="decode",
+)
+
+
+class AdmissionLimiter:
+    """
+    Caps the number of prediction requests in flight at once.
+
+    Only touched from the event loop, so a plain counter is enough.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+
+    @contextmanager
+    def slot(self):
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many requests in flight (max {self.limit})",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+
+_admission = AdmissionLimiter(MAX_INFLIGHT_REQUESTS)
+register_collector(ServiceCollector(
+    _admission,
+    lambda: getattr(app.state, "inference_pool", None),
+))
+
+
+def service_unavailable(e: QueueFullError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
+
+INFERENCE_MODES = {"full", "tiled"}
+
+
+ANNOTATED_FORMATS = {
+    "jpeg": (".jpg", "image/jpeg"),
+    "png": (".png", "image/png"),
+}
+
+
+def encode_image(image, image_format: str) -> bytes:
+    ok, encoded = cv2.imencode(ANNOTATED_FORMATS[image_format][0], image)
+    if not ok:
+        raise HTTPException(status_code=500, detail="Failed to encode annotated image")
+    return encoded.tobytes()
+
+
+async def run_decode(func, *args):
+    # run_in_executor does not carry contextvars over; copy them so
+    # stage timings recorded in the thread reach this request.
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_decode_executor, context.run, func, *args)
+
+
+class BodyTooLargeError(Exception):
+    pass
+
+
+class BodySizeLimitMiddleware:
+    """
+    Rejects request bodies over `max_bytes` with 413 while they stream in,
+    before the multipart parser has spooled all of them. A Content-Length
+    that is not a byte count is rejected with 400.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.max_bytes:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None:
+            try:
+                length = int(content_length)
+            except ValueError:
+                length = -1
+            if length < 0:
+                await self._error(send, 400, "Invalid Content-Length header")
+                return
+            if length > self.max_bytes:
+                await self._reject(send)
+                return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    raise BodyTooLargeError()
+            return message
+
+        # The form parser turns errors from receive() into a 400, so once
+        # the limit is hit the app's own response is dropped for a 413.
+        async def limited_send(message):
+            nonlocal response_started
+            if exceeded:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except BodyTooLargeError:
+            pass
+
+        if exceeded and not response_started:
+            await self._reject(send)
+
+    async def _reject(self, send):
+        await self._error(send, 413, f"Request body too large (max {self.max_bytes} bytes)")
+
+    async def _error(self, send, status_code: int, detail: str):
+        response = JSONResponse({"detail": detail}, status_code=status_code)
+        await response({"type": "http"}, None, send)
+
+
+app.add_middleware(BodySizeLimitMiddleware, max_bytes=MAX_REQUEST_BYTES)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+
+def image_error(e: ValueError) -> HTTPException:
+    status_code = 413 if isinstance(e, ImageTooLargeError) else 400
+    return HTTPException(status_code=status_code, detail=str(e))
+
+
+def decode_image_bytes(data, target_size: int = DECODE_TARGET_SIZE):
+    """
+    Returns (image, scale); see image_io.decode_image.
+    """
+    try:
+        with timed_stage("decode"):
+            check_header(data[:HEADER_BYTES])
+            return decode_image(data, target_size)
+    except ValueError as e:
+        raise image_error(e)
+
+
+def upload_size(file: UploadFile) -> int:
+    if file.size is not None:
+        return file.size
+
+    position = file.file.tell()
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(position)
+    return size
+
+
+def inspect_upload(file: UploadFile):
+    """
+    Rejects oversized or non-image uploads after reading only the header.
+    The format is sniffed from the bytes; content_type from phones and
+    WhatsApp re-shares is often wrong or generic.
+    """
+    size = upload_size(file)
+    if size > MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image too large: {size} bytes (max {MAX_UPLOAD_BYTES})",
+        )
+
+    try:
+        check_header(read_header(file.file))
+    except ValueError as e:
+        raise image_error(e)
+
 
-    data = np.frombuffer(file.file.read(), np.uint8)
-    image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+def is_archive_upload(file: UploadFile) -> bool:
+    filename = (file.filename or "").lower()
+    return (
+        file.content_type in ARCHIVE_CONTENT_TYPES
+        or filename.endswith(ARCHIVE_SUFFIXES)
+    )
+
+
+def _too_many_images(count: int):
+    raise HTTPException(
+        status_code=413,
+        detail=f"Too many images: {count} or more (max {BATCH_MAX_IMAGES})",
+    )
+
+
+def _list_archive(archive, is_zip: bool) -> list:
+    """
+    Member metadata of an open archive, without extracting anything.
+    Stops with 413 as soon as the member count passes MAX_ARCHIVE_MEMBERS.
+    """
+    members = archive.infolist() if is_zip else archive
+    listed = []
+    for info in members:
+        listed.append(info)
+        if len(listed) > MAX_ARCHIVE_MEMBERS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Archive has more than {MAX_ARCHIVE_MEMBERS} members",
+            )
+    return listed
+
+
+def read_archive_members(file: UploadFile, budget: dict) -> list[tuple[str, bytes]]:
+    """
+    Returns (name, bytes) for every image inside a zip or tar upload,
+    sorted by member name. Members over MAX_UPLOAD_BYTES are returned
+    with None instead of being extracted.
+
+    `budget` holds the images ("items") and uncompressed bytes ("bytes")
+    the request may still add; both are charged from the archive's
+    metadata, and the request is rejected with 413 before any member is
+    read if either runs out.
+    """
+    file.file.seek(0)
+    is_zip = zipfile.is_zipfile(file.file)
+    file.file.seek(0)
+
+    try:
+        archive = zipfile.ZipFile(file.file) if is_zip else tarfile.open(fileobj=file.file, mode="r:*")
+    except (zipfile.BadZipFile, tarfile.TarError):
+        raise HTTPException(status_code=400, detail=f"Invalid archive: {file.filename}")
+
+    with archive:
+        try:
+            infos = _list_archive(archive, is_zip)
+        except tarfile.TarError:
+            raise HTTPException(status_code=400, detail=f"Invalid archive: {file.filename}")
+
+        planned = []
+        for info in infos:
+            if is_zip:
+                name, size, regular = info.filename, info.file_size, not info.is_dir()
+            else:
+                name, size, regular = info.name, info.size, info.isfile()
+            if not regular or not name.lower().endswith(ARCHIVE_IMAGE_SUFFIXES):
+                continue
+
+            budget["items"] -= 1
+            if budget["items"] < 0:
+                _too_many_images(BATCH_MAX_IMAGES + 1)
+
+            oversized = size > MAX_UPLOAD_BYTES
+            if not oversized:
+                budget["bytes"] -= size
+                if budget["bytes"] < 0:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Archives expand to more than {MAX_ARCHIVE_BYTES} bytes",
+                    )
+            planned.append((name, info, oversized))
+
+        members = []
+        for name, info, oversized in planned:
+            if oversized:
+                members.append((name, None))
+            elif is_zip:
+                members.append((name, archive.read(info)))
+            else:
+                members.append((name, archive.extractfile(info).read()))
 
-    if image is None:
-        raise HTTPException(status_code=400, detail="Invalid or corrupted image")
+    return sorted(members, key=lambda m: m[0])
+
+
+def collect_batch_items(files: list[UploadFile]) -> list[dict]:
+    """
+    Flattens uploads (and archive contents) into an ordered list of items.
+    Each item holds either raw image bytes or a per-image error.
+    """
+    items = []
+    budget = {"items": BATCH_MAX_IMAGES, "bytes": MAX_ARCHIVE_BYTES}
+
+    too_large = f"Image too large (max {MAX_UPLOAD_BYTES} bytes)"
+
+    for file in files:
+        if is_archive_upload(file):
+            for name, data in read_archive_members(file, budget):
+                if data is None:
+                    items.append({"filename": name, "error": too_large})
+                else:
+                    items.append({"filename": name, "data": data})
+            continue
+
+        budget["items"] -= 1
+        if budget["items"] < 0:
+            _too_many_images(BATCH_MAX_IMAGES + 1)
+
+        if upload_size(file) > MAX_UPLOAD_BYTES:
+            items.append({"filename": file.filename, "error": too_large})
+        else:
+            items.append({"filename": file.filename, "data": file.file.read()})
+
+    return items
+
+
+async def lookup_batch_items(crop: str, items: list[dict], threshold: float):
+    """
+    Hashes every item and answers the ones already in the result cache.
+    """
+    pending = [item for item in items if "data" in item]
+    keys = await asyncio.gather(*(
+        run_decode(image_cache_key, crop, item["data"]) for item in pending
+    ))
+
+    for item, key in zip(pending, keys):
+        item["cache_key"] = key
+        output = cached_output(crop, key, threshold)
+        if output is not None:
+            item["output"] = output
+            del item["data"]
+
+
+async def decode_batch_items(items: list[dict]):
+    """
+    Decodes all items in parallel, recording failures on the item itself.
+    """
+    def decode(item):
+        if "data" not in item:
+            return
+        try:
+            item["image"], item["scale"] = decode_image_bytes(item.pop("data"))
+        except HTTPException as e:
+            item["error"] = e.detail
 
-    return image
+    await asyncio.gather(*(run_decode(decode, item) for item in items))
 
 
 # --------------------------------------------------
@@ -75,7 +549,7 @@ def read_image_from_upload(file: UploadFile):
     "/predict/{crop}",
     summary="Crop disease inference",
 )
-def predict(
+async def predict(
     crop: str,
     file: UploadFile = File(..., description="Input image"),
     output_type: str = Query(
@@ -88,15 +562,41 @@ def predict(
         le=1.0,
         description="Confidence threshold (0–1)",
     ),
+    mode: str = Query(
+        "full",
+        description="Inference mode: full | tiled",
+    ),
+    tile_size: int = Query(
+        TILE_SIZE,
+        ge=64,
+        description="Tile side in pixels (tiled mode)",
+    ),
+    tile_overlap: float = Query(
+        TILE_OVERLAP,
+        ge=0.0,
+        lt=1.0,
+        description="Fractional overlap between tiles (tiled mode)",
+    ),
+    max_tiles: int = Query(
+        TILE_MAX_TILES,
+        ge=1,
+        le=TILE_MAX_TILES,
+        description="Tile budget, full frame included; tiles grow to fit it (tiled mode)",
+    ),
 ):
     """
     ### Request Parameters
     - **crop**: Crop name
-    - **file**: Image file (jpg / png)
+    - **file**: Image file (jpg / png / webp / heic)
     - **output_type**:
         - `boxes` → object detection
         - `classify` → classification
     - **threshold**: Confidence threshold
+    - **mode**:
+        - `full` → the whole image as one model input
+        - `tiled` → overlapping full-resolution tiles, for large drone /
+          DSLR images where small lesions vanish in the downscale
+    - **tile_size**, **tile_overlap**, **max_tiles**: Tiling settings
 
     ### Response
     JSON result with detection or classification output.
@@ -109,8 +609,47 @@ def predict(
             detail=f"Unsupported crop. Choose from {sorted(SUPPORTED_CROPS)}",
         )
 
-    image = read_image_from_upload(file)
-    result = run_inference(crop, image, threshold)
+    mode = mode.lower()
+    if mode not in INFERENCE_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported mode. Choose from {sorted(INFERENCE_MODES)}",
+        )
+
+    mark_upload_parsed(crop)
+    tiled = mode == "tiled"
+    variant = f"tiled-{tile_size}-{tile_overlap}-{max_tiles}" if tiled else ""
+
+    with _admission.slot():
+        await run_decode(inspect_upload, file)
+
+        # Hash and decode straight from the spooled upload, without
+        # copying it into a bytes object first. Tiles are cut from the
+        # full-resolution image.
+        with upload_view(file.file) as data:
+            cache_key = await run_decode(image_cache_key, crop, data, None, variant)
+            result = cached_output(crop, cache_key, threshold)
+            if result is None:
+                image, scale = await run_decode(
+                    decode_image_bytes, data, 0 if tiled else DECODE_TARGET_SIZE,
+                )
+
+        if result is None:
+            try:
+                if tiled:
+                    result = await run_inference_tiled_async(
+                        crop, image, threshold,
+                        cache_key=cache_key,
+                        tile_size=tile_size,
+                        overlap=tile_overlap,
+                        max_tiles=max_tiles,
+                    )
+                else:
+                    result = await run_inference_async(
+                        crop, image, threshold, cache_key=cache_key, scale=scale,
+                    )
+            except QueueFullError as e:
+                raise service_unavailable(e)
 
     return JSONResponse({
         "crop": crop,
@@ -120,6 +659,264 @@ def predict(
 
 
 
+@app.post(
+    "/predict",
+    summary="Multi-crop inference from one upload",
+)
+async def predict_auto(
+    file: UploadFile = File(..., description="Input image"),
+    crops: str | None = Query(
+        None,
+        description="Comma-separated crops to run (default: all)",
+    ),
+    threshold: float = Query(
+        0.5,
+        ge=0.0,
+        le=1.0,
+        description="Confidence threshold (0–1)",
+    ),
+    early_exit: float | None = Query(
+        None,
+        ge=0.0,
+        le=1.0,
+        description="Stop starting crops once one reaches this confidence",
+    ),
+):
+    """
+    ### Request Parameters
+    - **file**: Image file (jpg / png / webp / heic)
+    - **crops**: Crops to run, e.g. `tomato,chilli` (default: all)
+    - **threshold**: Confidence threshold
+    - **early_exit**: Optional confidence cut-off; crops then run in
+      order and the rest are skipped once one of them reaches it
+
+    ### Response
+    Per-crop detection and classification output from a single upload
+    and decode, the crop with the highest confidence, and any crops
+    skipped by `early_exit`.
+    """
+
+    if crops:
+        selected = list(dict.fromkeys(c.strip().lower() for c in crops.split(",") if c.strip()))
+    else:
+        selected = sorted(SUPPORTED_CROPS)
+
+    unknown = [crop for crop in selected if crop not in SUPPORTED_CROPS]
+    if unknown or not selected:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unsupported crop. Choose from {sorted(SUPPORTED_CROPS)}",
+        )
+
+    mark_upload_parsed("multi")
+
+    with _admission.slot():
+        await run_decode(inspect_upload, file)
+
+        with upload_view(file.file) as data:
+            cache_keys = await run_decode(image_cache_keys, selected, data)
+            image, scale = await run_decode(decode_image_bytes, data)
+
+        try:
+            outcome = await run_inference_multi_async(
+                selected,
+                image,
+                threshold,
+                cache_keys=cache_keys,
+                scale=scale,
+                early_exit=early_exit,
+            )
+        except QueueFullError as e:
+            raise service_unavailable(e)
+
+    results = outcome["results"]
+    scores = {crop: top_confidence(output) for crop, output in results.items()}
+    best = max((crop for crop in scores if scores[crop] > 0), key=scores.get, default=None)
+
+    return JSONResponse({
+        "crops": list(results),
+        "results": {
+            crop: {
+                "boxes": output["boxes"],
+                "classification": output["classification"],
+            }
+            for crop, output in results.items()
+        },
+        "best": None if best is None else {
+            "crop": best,
+            "confidence": scores[best],
+        },
+        "skipped": outcome["skipped"],
+    })
+
+
+@app.post(
+    "/predict/{crop}/annotated",
+    summary="Crop disease inference with annotated image",
+)
+async def predict_annotated(
+    crop: str,
+    file: UploadFile = File(..., description="Input image"),
+    threshold: float = Query(
+        0.5,
+        ge=0.0,
+        le=1.0,
+        description="Confidence threshold (0–1)",
+    ),
+    image_format: str = Query(
+        "jpeg",
+        alias="format",
+        description="Annotated image format: jpeg | png",
+    ),
+    include_json: bool = Query(
+        False,
+        description="Return JSON with the inference result and a base64 image",
+    ),
+):
+    """
+    ### Request Parameters
+    - **crop**: Crop name
+    - **file**: Image file (jpg / png / webp / heic)
+    - **threshold**: Confidence threshold
+    - **format**: `jpeg` or `png`
+    - **include_json**: Also return the inference result
+
+    ### Response
+    The annotated image, or JSON with `boxes`, `classification` and
+    `image_base64` when `include_json` is set. Both come from the same
+    forward pass.
+    """
+
+    crop = crop.lower()
+    if crop not in SUPPORTED_CROPS:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unsupported crop. Choose from {sorted(SUPPORTED_CROPS)}",
+        )
+
+    image_format = image_format.lower()
+    if image_format not in ANNOTATED_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format. Choose from {sorted(ANNOTATED_FORMATS)}",
+        )
+
+    mark_upload_parsed(crop)
+
+    with _admission.slot():
+        await run_decode(inspect_upload, file)
+
+        with upload_view(file.file) as data:
+            cache_key = await run_decode(image_cache_key, crop, data)
+            image, scale = await run_decode(decode_image_bytes, data)
+
+        try:
+            annotated, result = await run_inference_with_plot_async(
+                crop, image, threshold, cache_key=cache_key, scale=scale,
+            )
+        except QueueFullError as e:
+            raise service_unavailable(e)
+
+        encoded = await run_decode(encode_image, annotated, image_format)
+
+    media_type = ANNOTATED_FORMATS[image_format][1]
+
+    if not include_json:
+        return Response(content=encoded, media_type=media_type)
+
+    return JSONResponse({
+        "crop": crop,
+        "boxes": result["boxes"],
+        "classification": result["classification"],
+        "image_format": image_format,
+        "media_type": media_type,
+        "image_base64": base64.b64encode(encoded).decode("ascii"),
+    })
+
+
+@app.post(
+    "/predict/{crop}/batch",
+    summary="Batch crop disease inference",
+)
+async def predict_batch(
+    crop: str,
+    files: list[UploadFile] = File(
+        ...,
+        description="Input images, or a zip / tar archive of images",
+    ),
+    output_type: str = Query(
+        "boxes",
+        description="Inference type: boxes | classify",
+    ),
+    threshold: float = Query(
+        0.5,
+        ge=0.0,
+        le=1.0,
+        description="Confidence threshold (0–1)",
+    ),
+):
+    """
+    ### Request Parameters
+    - **crop**: Crop name
+    - **files**: Image files (jpg / png / webp / heic) and/or zip / tar archives of images
+    - **output_type**:
+        - `boxes` → object detection
+        - `classify` → classification
+    - **threshold**: Confidence threshold
+
+    ### Response
+    One entry per image, in upload order (archive members sorted by name).
+    Images that fail to decode carry an `error` instead of failing the request.
+    """
+
+    crop = crop.lower()
+    if crop not in SUPPORTED_CROPS:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unsupported crop. Choose from {sorted(SUPPORTED_CROPS)}",
+        )
+
+    mark_upload_parsed(crop)
+
+    with _admission.slot():
+        items = await run_in_threadpool(collect_batch_items, files)
+        await lookup_batch_items(crop, items, threshold)
+        await decode_batch_items(items)
+
+        valid = [item for item in items if "image" in item]
+        try:
+            outputs = await run_inference_batch_async(
+                crop,
+                [item["image"] for item in valid],
+                threshold,
+                cache_keys=[item["cache_key"] for item in valid],
+                scales=[item["scale"] for item in valid],
+            )
+        except QueueFullError as e:
+            raise service_unavailable(e)
+
+    for item, output in zip(valid, outputs):
+        item["output"] = output
+
+    results = []
+    for index, item in enumerate(items):
+        entry = {"index": index, "filename": item["filename"]}
+        if "output" in item:
+            output = item["output"]
+            entry["boxes"] = output["boxes"]
+            entry["classification"] = output["classification"] if output_type == "classify" else []
+        else:
+            entry["error"] = item["error"]
+        results.append(entry)
+
+    return JSONResponse({
+        "crop": crop,
+        "count": len(results),
+        "failed": sum(1 for entry in results if "error" in entry),
+        "results": results,
+    })
+
+
 # --------------------------------------------------
 # WARMUP
 # --------------------------------------------------
@@ -128,59 +925,243 @@ def predict(
     "/warmup",
     summary="Load models into memory",
 )
-def warmup(
+async def warmup(
     crops: list[str] = Query(
         None,
         description="List of crops to warm up. If empty, loads all.",
-    )
+    ),
+    pin: bool = Query(
+        False,
+        description="Keep the warmed models resident (never evicted)",
+    ),
+    runs: int = Query(
+        2,
+        ge=0,
+        le=10,
+        description="Dummy forward passes per model after loading",
+    ),
 ):
     """
-    Forces loading of models into memory to avoid cold starts.
+    Forces loading of models into memory to avoid cold starts, then runs
+    dummy forward passes so the first real request is not slow either.
+    Crops are warmed in parallel. Crops served by inference workers are
+    listed under worker_models; the workers warm their own models.
     """
     if not crops:
         crops = sorted(SUPPORTED_CROPS)
 
     loaded = []
+    workers = []
     errors = []
 
+    selected = []
     for crop in crops:
         crop = crop.lower()
         if crop not in SUPPORTED_CROPS:
             errors.append(f"Skipped unsupported: {crop}")
             continue
-        
-        try:
-            get_model(crop)
+        selected.append(crop)
+
+    outcomes = await asyncio.gather(
+        *(run_in_threadpool(warm_model, crop, runs, pin) for crop in selected),
+        return_exceptions=True,
+    )
+    for crop, outcome in zip(selected, outcomes):
+        if isinstance(outcome, Exception):
+            errors.append(f"Failed {crop}: {str(outcome)}")
+        elif outcome.get("worker"):
+            workers.append(crop)
+        else:
             loaded.append(crop)
-        except Exception as e:
-            errors.append(f"Failed {crop}: {str(e)}")
 
     return {
         "message": "Warmup complete",
         "loaded_models": loaded,
+        "worker_models": workers,
         "errors": errors,
         "total_loaded": len(loaded),
-        "cache_size": len(_loaded_models),
+        "cache_size": len(model_registry),
+        "pinned": pin,
     }
 
 
+# --------------------------------------------------
+# PROBES
+# --------------------------------------------------
+
+@app.get(
+    "/livez",
+    summary="Liveness probe",
+    include_in_schema=False,
+)
+def livez():
+    """
+    Answers as soon as the server is up; loads nothing.
+    """
+    return {"status": "alive"}
+
+
+@app.get(
+    "/readyz",
+    summary="Readiness probe",
+    include_in_schema=False,
+)
+def readyz():
+    """
+    503 until startup, and by default the background preload, have
+    finished; reports the load state of every crop and preload progress.
+    """
+    preloader = getattr(app.state, "preloader", None)
+    ready = getattr(app.state, "started", False) and preloader.ready()
+    return JSONResponse(
+        {
+            "status": "ready" if ready else "starting",
+            "model_backend": MODEL_BACKEND,
+            "models": model_states(),
+            "preload": preloader.stats() if preloader is not None else None,
+        },
+        status_code=200 if ready else 503,
+    )
+
+
 # --------------------------------------------------
 # HEALTH CHECK (DETAILED)
 # --------------------------------------------------
 
+def package_version(name: str) -> str | None:
+    # Read from the installed metadata, without importing the package
+    try:
+        return importlib.metadata.version(name)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def inference_device() -> str | None:
+    # None until the first model load has imported torch
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return None
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
 @app.get(
     "/health",
     summary="Detailed health check",
 )
 def health():
+    pool = getattr(app.state, "inference_pool", None)
+    preloader = getattr(app.state, "preloader", None)
     return {
         "status": "ok",
         "api_version": app.version,
         "python_version": sys.version.split()[0],
-        "torch_version": torch.__version__,
-        "ultralytics_version": ultralytics.__version__,
-        "device": "cuda" if torch.cuda.is_available() else "cpu",
+        "torch_version": package_version("torch"),
+        "ultralytics_version": package_version("ultralytics"),
+        "device": inference_device(),
+        "model_backend": MODEL_BACKEND,
+        "model_precision": MODEL_PRECISION,
         "supported_crops": sorted(SUPPORTED_CROPS),
-        "models_loaded_in_cache": sorted(list(_loaded_models.keys())),
-        "model_cache_size": len(_loaded_models),
+        "models_loaded_in_cache": sorted(model_registry.keys()),
+        "model_cache_size": len(model_registry),
+        "model_registry": model_registry.stats(),
+        "batching": batching_stats(),
+        "inference_processes": pool.stats() if pool is not None else None,
+        "preload": preloader.stats() if preloader is not None else None,
+        "result_cache": result_cache.stats(),
+        "concurrency": {
+            "inference_workers": INFERENCE_WORKERS,
+            "torch_threads": TORCH_THREADS,
+            "decode_workers": DECODE_WORKERS,
+            "max_inflight_requests": _admission.limit,
+            "inflight_requests": _admission.in_flight,
+            "rejected_requests": _admission.rejected,
+        },
     }
+
+
+# --------------------------------------------------
+# METRICS (PROMETHEUS)
+# --------------------------------------------------
+
+@app.get(
+    "/metrics",
+    summary="Prometheus metrics",
+    include_in_schema=False,
+)
+def metrics():
+    """
+    Per-stage latency histograms plus model registry, batching, cache and
+    admission state, in the Prometheus text format.
+    """
+    payload, content_type = metrics_payload()
+    return Response(content=payload, media_type=content_type)
+
+
+# --------------------------------------------------
+# PROFILING (ADMIN)
+# --------------------------------------------------
+
+def require_admin(token: str | None):
+    # Without PROFILE_ADMIN_TOKEN the admin endpoints do not exist
+    if not PROFILE_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if token is None or not secrets.compare_digest(token, PROFILE_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.post(
+    "/admin/profile",
+    summary="Start a profiling session",
+    include_in_schema=False,
+)
+def start_profile(
+    seconds: float = Query(
+        30.0,
+        ge=0,
+        le=3600,
+        description="Session length; 0 runs until /admin/profile/stop",
+    ),
+    fraction: float = Query(
+        1.0,
+        gt=0.0,
+        le=1.0,
+        description="Fraction of /predict requests to sample",
+    ),
+    torch_trace: bool = Query(
+        False,
+        description="Also record forward passes with torch.profiler",
+    ),
+    x_admin_token: str | None = Header(None),
+):
+    """
+    Samples stacks for `seconds`, or for a `fraction` of /predict
+    requests, and writes folded stacks (and torch traces) to PROFILE_DIR.
+    """
+    require_admin(x_admin_token)
+    try:
+        return profiler.start(seconds or None, fraction, torch_trace)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.post(
+    "/admin/profile/stop",
+    summary="Stop the profiling session",
+    include_in_schema=False,
+)
+def stop_profile(x_admin_token: str | None = Header(None)):
+    require_admin(x_admin_token)
+    session = profiler.stop()
+    if session is None:
+        raise HTTPException(status_code=409, detail="No profiling session is running")
+    return session
+
+
+@app.get(
+    "/admin/profile",
+    summary="Profiling session status",
+    include_in_schema=False,
+)
+def profile_status(x_admin_token: str | None = Header(None)):
+    require_admin(x_admin_token)
+    return profiler.status()
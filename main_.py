@@ -1,14 +1,11 @@
 import sys
-import os
 import cv2
-import csv
 import time
-import threading
-import serial
-import serial.tools.list_ports
-import random
-from datetime import datetime
-from ultralytics import YOLO
+
+from detection_log import DetectionLog, open_sinks
+from gps import GpsReceiver, get_default_port, open_source
+from recorder import GATE_EVERY_N, GATE_MAX_STALENESS, GATE_MODE, RECORDER_SOURCE, RecorderEngine, make_gate
+from recorder_pipeline import format_stats
 
 # PyQt6 Imports
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
@@ -17,164 +14,66 @@ from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
 from PyQt6.QtCore import Qt, QThread, pyqtSignal, pyqtSlot
 from PyQt6.QtGui import QImage, QPixmap, QFont
 
-# --- Port Selector Function ---
-def get_default_port():
-    """Detects OS and finds the most likely Arduino port."""
-    if sys.platform.startswith('win'):
-        # Windows
-        ports = list(serial.tools.list_ports.comports())
-        for p in ports:
-            if 'Arduino' in p.description:
-                return p.device
-        return ports[0].device if ports else "COM3"
-    else:
-        # Linux/macOS
-        if os.path.exists('/dev/ttyACM0'):
-            return '/dev/ttyACM0'
-        elif os.path.exists('/dev/ttyUSB0'):
-            return '/dev/ttyUSB0'
-        return '/dev/ttyACM0'
-
 # --- Global Logic Variables ---
-stop_threads = False
-current_lat = 0.0
-current_lon = 0.0
-current_sats = 0
-gps_lock = threading.Lock()
-csv_file = 'detection_log.csv'
 DEFAULT_PORT = get_default_port()
-
-# --- Backend Logic (GPS & Model) ---
-
-def read_gps(use_mock, serial_port):
-    global current_lat, current_lon, current_sats, stop_threads
-    
-    # Mock GPS
-    if use_mock:
-        print("Using Mock GPS Data...")
-        base_lat = 16.495906
-        base_lon = 80.496290
-        while not stop_threads:
-            with gps_lock:
-                current_lat = base_lat + (random.uniform(-0.0005, 0.0005))
-                current_lon = base_lon + (random.uniform(-0.0005, 0.0005))
-                current_sats = random.randint(5, 12)
-            time.sleep(1.0)
-        return
-
-    # Real GPS
-    try:
-        ser = serial.Serial(serial_port, 9600, timeout=1)
-        print(f"Connected to GPS at {serial_port}")
-        ser.reset_input_buffer()
-    except Exception as e:
-        print(f"GPS Connection Error: {e}")
-        return
-
-    while not stop_threads:
-        try:
-            if ser.in_waiting > 0:
-                line = ser.readline().decode('utf-8', errors='ignore').strip()
-                if "LAT:" in line and "LON:" in line:
-                    parts = line.split(',')
-                    with gps_lock:
-                        for part in parts:
-                            part = part.strip()
-                            if "LAT:" in part:
-                                try: current_lat = float(part.split(':')[1])
-                                except: pass
-                            elif "LON:" in part:
-                                try: current_lon = float(part.split(':')[1])
-                                except: pass
-                            elif "SAT:" in part:
-                                try: current_sats = int(float(part.split(':')[1]))
-                                except: pass
-        except Exception:
-            continue
-    if ser.is_open: ser.close()
-
-def select_model(crop):
-    crop = crop.lower()
-    models = {
-        'tomato': './TomatoE10.pt', 'cotton': './cotton.pt',
-        'chilli': './chilli.pt', 'turmeric': './turmeric.pt', 'rose': './rose.pt'
-    }
-    path = models.get(crop)
-    if path: return YOLO(path)
-    return None
+STATS_INTERVAL = 1.0
 
 # --- Worker Thread ---
 
 class VideoThread(QThread):
+    """
+    Display client of a RecorderEngine (recorder.py). The engine captures,
+    gates, infers and logs on its own threads; this thread renders every
+    camera frame with the latest detections drawn on it, so the preview
+    keeps camera rate while inference runs at whatever rate the CPU
+    sustains.
+    """
     change_pixmap_signal = pyqtSignal(object) 
     update_stats_signal = pyqtSignal(float, float, int)
+    update_pipeline_signal = pyqtSignal(object)
 
-    def __init__(self, crop, model, threshold):
+    def __init__(self, engine):
         super().__init__()
-        self.crop = crop
-        self.model = model
-        self.threshold = threshold
+        self.engine = engine
         self.running = True
-        self.save_cooldown = 2.0
-        self.last_save_time = 0
+
+    def render(self, packet):
+        annotated_frame = self.engine.annotate(packet)
+        rgb_image = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
+        h, w, ch = rgb_image.shape
+        bytes_per_line = ch * w
+        qt_img = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
+        return qt_img.scaled(640, 480, Qt.AspectRatioMode.KeepAspectRatio)
 
     def run(self):
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
+        try:
+            self.engine.start()
+        except ValueError as e:
+            print(e)
             self.running = False
             return
 
-        healthy_defs = {'tomato': ['healthy'], 'cotton': ['Healthy Leaf'], 
-                        'rose': ['Healthy', 'rose'], 'chilli': ['Healthy Chilies', 'Healthy Leaves'], 
-                        'turmeric': ['healthy_leaf']}
-        healthy_keys = healthy_defs.get(self.crop, ['healthy'])
-
+        display_queue = self.engine.display_queue
+        last_stats = time.perf_counter()
         while self.running:
-            ret, frame = cap.read()
-            if ret:
-                # Inference
-                results = self.model(frame, verbose=False)
-                result = results[0]
-                names = result.names
-                
-                detected_diseases = []
-                if hasattr(result, 'probs') and result.probs is not None:
-                    probs = result.probs
-                    detected_diseases = [names[i] for i, prob in enumerate(probs.data) if prob >= self.threshold]
-                elif hasattr(result, 'boxes') and result.boxes is not None:
-                    for box in result.boxes:
-                        if float(box.conf[0]) >= self.threshold:
-                            cls_id = int(box.cls[0])
-                            detected_diseases.append(names[cls_id])
-                    detected_diseases = list(set(detected_diseases))
-
-                # Log to CSV
-                current_time = time.time()
-                if detected_diseases and (current_time - self.last_save_time > self.save_cooldown):
-                    for disease in detected_diseases:
-                        if disease not in healthy_keys:
-                            with gps_lock:
-                                lat, lon, sats = current_lat, current_lon, current_sats
-                            
-                            ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                            with open(csv_file, 'a', newline='') as f:
-                                writer = csv.writer(f)
-                                writer.writerow([ts, self.crop, disease, sats, lat, lon])
-                            self.last_save_time = current_time
-                            print(f"Logged: {disease}")
-
-                # Prepare Image
-                annotated_frame = result.plot()
-                rgb_image = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
-                h, w, ch = rgb_image.shape
-                bytes_per_line = ch * w
-                qt_img = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
-                p = qt_img.scaled(640, 480, Qt.AspectRatioMode.KeepAspectRatio)
-                
-                self.change_pixmap_signal.emit(p)
-                self.update_stats_signal.emit(current_lat, current_lon, current_sats)
-
-        cap.release()
+            packet = display_queue.get(0.1)
+            if packet is None:
+                if display_queue.closed:
+                    break
+                continue
+
+            start = time.perf_counter()
+            p = self.render(packet)
+            self.change_pixmap_signal.emit(p)
+            fix = self.engine.gps_fix()
+            self.update_stats_signal.emit(fix["lat"], fix["lon"], fix["satellites"])
+            self.engine.render_stats.record(time.perf_counter() - start)
+
+            if start - last_stats >= STATS_INTERVAL:
+                last_stats = start
+                self.update_pipeline_signal.emit(self.engine.stats())
+
+        self.engine.stop()
 
     def stop(self):
         self.running = False
@@ -241,6 +140,13 @@ class RecorderWindow(QMainWindow):
         """)
         controls_layout.addWidget(self.crop_combo)
 
+        # Video Source
+        controls_layout.addWidget(QLabel("Video Source:"))
+        self.source_entry = QLineEdit(RECORDER_SOURCE)
+        self.source_entry.setToolTip("Camera index, video file or stream URL")
+        self.source_entry.setStyleSheet("background-color: #222; color: #fff; border: 1px solid #555; padding: 5px; border-radius: 4px;")
+        controls_layout.addWidget(self.source_entry)
+
         # GPS Settings
         gps_group = QFrame()
         gps_group.setStyleSheet("background-color: #333; border-radius: 6px; padding: 5px;")
@@ -260,6 +166,16 @@ class RecorderWindow(QMainWindow):
         
         controls_layout.addWidget(gps_group)
 
+        # Adaptive Inference
+        self.adaptive_check = QCheckBox("Skip unchanged frames")
+        self.adaptive_check.setChecked(GATE_MODE != "off")
+        self.adaptive_check.setToolTip(
+            f"Reuse the last detections until the view changes, at least every "
+            f"{GATE_MAX_STALENESS:g} s or {GATE_EVERY_N} frames"
+        )
+        self.adaptive_check.setStyleSheet("QCheckBox { color: #ccc; }")
+        controls_layout.addWidget(self.adaptive_check)
+
         # Threshold
         controls_layout.addWidget(QLabel("Confidence Threshold:"))
         
@@ -303,6 +219,15 @@ class RecorderWindow(QMainWindow):
         controls_layout.addWidget(self.lbl_lon)
         controls_layout.addWidget(self.lbl_sats)
 
+        pipeline_title = QLabel("PIPELINE")
+        pipeline_title.setFont(QFont("Segoe UI", 10, QFont.Weight.Bold))
+        pipeline_title.setStyleSheet("color: #888; letter-spacing: 1px;")
+        controls_layout.addWidget(pipeline_title)
+
+        self.lbl_pipeline = QLabel("-")
+        self.lbl_pipeline.setStyleSheet("font-family: Consolas; font-size: 12px; color: #aaa;")
+        controls_layout.addWidget(self.lbl_pipeline)
+
         controls_layout.addStretch()
 
         # Status Label
@@ -322,7 +247,8 @@ class RecorderWindow(QMainWindow):
 
         # Threads
         self.video_thread = None
-        self.gps_thread = None
+        self.gps = None
+        self.detection_log = None
 
     def apply_dark_theme(self):
         # Set window background
@@ -364,30 +290,48 @@ class RecorderWindow(QMainWindow):
             self.stop_recording()
 
     def start_recording(self):
-        global stop_threads
-        
         self.lbl_status.setText("Loading Model...")
         QApplication.processEvents()
 
         crop = self.crop_combo.currentText()
-        model = select_model(crop)
-        
-        if not model:
-            QMessageBox.critical(self, "Error", "Could not load model file!")
+        threshold = self.thresh_slider.value() / 100.0
+        engine = RecorderEngine(
+            crop,
+            source=self.source_entry.text().strip() or "0",
+            threshold=threshold,
+            gate=make_gate(self.adaptive_check.isChecked()),
+            display=True,
+        )
+
+        try:
+            engine.load()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Could not load model file!\n{e}")
             self.lbl_status.setText("Error")
             return
 
-        # Start GPS
-        stop_threads = False
-        self.gps_thread = threading.Thread(target=read_gps, args=(self.mock_gps_check.isChecked(), self.port_entry.text()))
-        self.gps_thread.daemon = True
-        self.gps_thread.start()
+        try:
+            self.detection_log = DetectionLog(open_sinks())
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Could not open detection log: {e}")
+            self.lbl_status.setText("Error")
+            return
+
+        # Start GPS; without it, detections are logged with an empty fix
+        try:
+            self.gps = GpsReceiver(open_source(self.mock_gps_check.isChecked(), self.port_entry.text()))
+            self.gps.start()
+        except Exception as e:
+            print(f"GPS Connection Error: {e}")
+            self.gps = None
 
         # Start Video
-        threshold = self.thresh_slider.value() / 100.0
-        self.video_thread = VideoThread(crop, model, threshold)
+        engine.detection_log = self.detection_log
+        engine.gps = self.gps
+        self.video_thread = VideoThread(engine)
         self.video_thread.change_pixmap_signal.connect(self.update_image)
         self.video_thread.update_stats_signal.connect(self.update_stats)
+        self.video_thread.update_pipeline_signal.connect(self.update_pipeline)
         self.video_thread.start()
 
         # UI Update
@@ -395,20 +339,16 @@ class RecorderWindow(QMainWindow):
         self.set_button_style("stop")
         self.lbl_status.setText("● Recording Active")
         self.lbl_status.setStyleSheet("color: #4CAF50; font-weight: bold;")
-        
-        # CSV Init
-        try:
-            with open(csv_file, 'x', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(['timestamp', 'crop', 'disease', 'satellites', 'lat', 'long'])
-        except FileExistsError: pass
 
     def stop_recording(self):
-        global stop_threads
-        
-        stop_threads = True
         if self.video_thread:
             self.video_thread.stop()
+        if self.gps:
+            self.gps.stop()
+            self.gps = None
+        if self.detection_log:
+            self.detection_log.close()
+            self.detection_log = None
         
         # UI Update
         self.is_recording = False
@@ -417,6 +357,7 @@ class RecorderWindow(QMainWindow):
         self.lbl_status.setStyleSheet("color: #888; font-style: italic;")
         self.video_label.clear()
         self.video_label.setText("Camera Off")
+        self.lbl_pipeline.setText("-")
 
     @pyqtSlot(object)
     def update_image(self, qt_img):
@@ -428,6 +369,10 @@ class RecorderWindow(QMainWindow):
         self.lbl_lon.setText(f"Lon:  {lon:.6f}")
         self.lbl_sats.setText(f"Sats: {sats}")
 
+    @pyqtSlot(object)
+    def update_pipeline(self, stats):
+        self.lbl_pipeline.setText(format_stats(stats))
+
     def closeEvent(self, event):
         if self.is_recording:
             self.stop_recording()
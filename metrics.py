@@ -0,0 +1,293 @@
+"""
+Prometheus metrics and per-request stage timings.
+
+Each request is split into stages, each observed into
+crop_api_stage_seconds{stage, crop, backend}:
+
+    upload       receiving and parsing the multipart body
+    decode       header check + image decode
+    preprocess   ultralytics letterbox / normalisation  (result.speed)
+    inference    model forward pass                     (result.speed)
+    nms          ultralytics postprocess / NMS          (result.speed)
+    postprocess  raw_detections + filtering + JSON shaping
+
+With SERVER_TIMING=1 the same stages are returned in a Server-Timing
+response header, for single-request debugging in browser dev tools or curl.
+Registry, batching, cache and admission state is read at scrape time.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0").lower() in {"1", "true", "yes"}
+
+STAGE_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+STAGE_SECONDS = Histogram(
+    "crop_api_stage_seconds",
+    "Time spent per request stage",
+    ["stage", "crop", "backend"],
+    buckets=STAGE_BUCKETS,
+)
+
+REQUEST_SECONDS = Histogram(
+    "crop_api_request_seconds",
+    "End-to-end HTTP request latency",
+    ["method", "route", "status"],
+    buckets=STAGE_BUCKETS,
+)
+
+REQUESTS_IN_FLIGHT = Gauge(
+    "crop_api_http_requests_in_flight",
+    "HTTP requests currently being served",
+    multiprocess_mode="livesum",
+)
+
+# ultralytics result.speed keys (milliseconds per image) -> stage names
+_SPEED_STAGES = {
+    "preprocess": "preprocess",
+    "inference": "inference",
+    "postprocess": "nms",
+}
+
+
+# -------------------------------------------------
+# REQUEST TIMINGS
+# -------------------------------------------------
+
+class RequestTimings:
+    """
+    Stage durations for one request, summed per stage.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.crop = ""
+        self.stages = {}
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        entries = [f"{stage};dur={seconds * 1000.0:.2f}" for stage, seconds in self.stages.items()]
+        entries.append(f"total;dur={(time.perf_counter() - self.start) * 1000.0:.2f}")
+        return ", ".join(entries)
+
+
+_current = ContextVar("request_timings", default=None)
+
+
+def observe_stage(stage: str, seconds: float, crop: str | None = None, backend: str | None = None):
+    """
+    Records one stage duration in the histogram and, inside a request,
+    in its Server-Timing entries.
+    """
+    from model_core import resolve_backend
+
+    timings = _current.get()
+    if crop is None:
+        crop = timings.crop if timings is not None else ""
+
+    STAGE_SECONDS.labels(stage, crop, resolve_backend(backend)).observe(seconds)
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def timed_stage(stage: str, crop: str | None = None, backend: str | None = None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, crop, backend)
+
+
+def observe_result_speed(result, crop: str, backend: str | None = None):
+    """
+    Records ultralytics' per-image preprocess / inference / NMS times.
+    Out-of-process workers pass them along as raw["speed"].
+    """
+    speed = result.get("speed") if isinstance(result, dict) else getattr(result, "speed", None)
+    if not speed:
+        return
+
+    for key, stage in _SPEED_STAGES.items():
+        ms = speed.get(key)
+        if ms is not None:
+            observe_stage(stage, ms / 1000.0, crop, backend)
+
+
+def mark_upload_parsed(crop: str):
+    """
+    Called first thing in a handler: FastAPI has parsed the multipart body
+    by then, so the time since the request arrived is the upload stage.
+    """
+    timings = _current.get()
+    if timings is None:
+        return
+
+    timings.crop = crop
+    observe_stage("upload", time.perf_counter() - timings.start, crop)
+
+
+# -------------------------------------------------
+# MIDDLEWARE
+# -------------------------------------------------
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request, tracks in-flight requests and, with
+    SERVER_TIMING, adds the Server-Timing header.
+    """
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = 500
+
+        async def timed_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", timings.server_timing().encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            _current.reset(token)
+
+            route = scope.get("route")
+            REQUEST_SECONDS.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status),
+            ).observe(time.perf_counter() - timings.start)
+
+
+# -------------------------------------------------
+# SCRAPE-TIME STATE
+# -------------------------------------------------
+
+class ServiceCollector:
+    """
+    Exports model registry, batching, result cache, admission and worker
+    pool state as gauges / counters each time /metrics is scraped.
+    """
+
+    def __init__(self, admission=None, pool=None):
+        self.admission = admission
+        self.pool = pool or (lambda: None)
+
+    def collect(self):
+        from model_core import batching_stats, model_registry, result_cache
+
+        registry = model_registry.stats()
+        yield GaugeMetricFamily("crop_api_models_resident", "Models held by the registry", value=registry["resident_models"])
+        yield GaugeMetricFamily("crop_api_models_resident_bytes", "Estimated memory of resident models", value=registry["resident_mb"] * 1e6)
+        yield CounterMetricFamily("crop_api_model_loads", "Model loads", value=registry["loads"])
+        yield CounterMetricFamily("crop_api_model_evictions", "Model evictions", value=registry["evictions"])
+
+        size = GaugeMetricFamily("crop_api_model_size_bytes", "Estimated memory per model", labels=["model"])
+        hits = CounterMetricFamily("crop_api_model_hits", "Registry lookups served per model", labels=["model"])
+        pinned = GaugeMetricFamily("crop_api_model_pinned", "1 when the model is pinned", labels=["model"])
+        for key, entry in registry["models"].items():
+            size.add_metric([key], entry["size_mb"] * 1e6)
+            hits.add_metric([key], entry["hits"])
+            pinned.add_metric([key], int(entry["pinned"]))
+        yield size
+        yield hits
+        yield pinned
+
+        depth = GaugeMetricFamily("crop_api_batch_queue_depth", "Images waiting in a batching queue", labels=["scheduler"])
+        batches = CounterMetricFamily("crop_api_batches", "Batched forward passes", labels=["scheduler"])
+        images = CounterMetricFamily("crop_api_batch_images", "Images run through batching", labels=["scheduler"])
+        rejected = CounterMetricFamily("crop_api_batch_rejected", "Images rejected by a full queue", labels=["scheduler"])
+        for key, stats in batching_stats().items():
+            depth.add_metric([key], stats["queue_depth"])
+            batches.add_metric([key], stats["batches"])
+            images.add_metric([key], stats["images"])
+            rejected.add_metric([key], stats["rejected"])
+        yield depth
+        yield batches
+        yield images
+        yield rejected
+
+        cache = result_cache.stats()
+        yield GaugeMetricFamily("crop_api_result_cache_entries", "Result cache entries in memory", value=cache["entries"])
+        cache_events = CounterMetricFamily("crop_api_result_cache_events", "Result cache lookups and removals", labels=["event"])
+        for event in ("hits", "disk_hits", "misses", "evictions", "expired"):
+            cache_events.add_metric([event], cache[event])
+        yield cache_events
+
+        if self.admission is not None:
+            yield GaugeMetricFamily("crop_api_predictions_in_flight", "Prediction requests holding an admission slot", value=self.admission.in_flight)
+            yield GaugeMetricFamily("crop_api_predictions_max_in_flight", "Admission limit", value=self.admission.limit)
+            yield CounterMetricFamily("crop_api_predictions_rejected", "Prediction requests rejected with 429", value=self.admission.rejected)
+
+        pool = self.pool()
+        if pool is not None:
+            alive = GaugeMetricFamily("crop_api_worker_processes_alive", "Live inference worker processes", labels=["crop"])
+            pending = GaugeMetricFamily("crop_api_worker_pending", "Requests waiting on inference workers", labels=["crop"])
+            slots = GaugeMetricFamily("crop_api_worker_slots_in_use", "Shared-memory frame slots in use", labels=["crop"])
+            for crop, stats in pool.stats()["crops"].items():
+                alive.add_metric([crop], stats["alive"])
+                pending.add_metric([crop], stats["pending"])
+                slots.add_metric([crop], stats["slots_in_use"])
+            yield alive
+            yield pending
+            yield slots
+
+
+_collectors = []
+
+
+def register_collector(collector):
+    _collectors.append(collector)
+    REGISTRY.register(collector)
+
+
+def metrics_payload() -> tuple[bytes, str]:
+    """
+    Exposition text for /metrics. With PROMETHEUS_MULTIPROC_DIR set (e.g.
+    under serve.py) histograms are merged across worker processes; the
+    scrape-time state is that of whichever worker answered.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for collector in _collectors:
+            registry.register(collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
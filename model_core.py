@@ -1,12 +1,32 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import queue
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
 import cv2
 import numpy as np
-from ultralytics import YOLO
+
+from metrics import observe_result_speed, timed_stage
+from profiling import profiler
+
+# torch and ultralytics take seconds to import, so they are imported on
+# first use (model load, export, forward pass) rather than here; the API
+# can then answer liveness probes while the inference stack loads.
+if TYPE_CHECKING:
+    from ultralytics import YOLO
 
 # -------------------------------------------------
 # MODEL REGISTRY (loaded on demand)
 # -------------------------------------------------
 
-MODEL_DIR = "./models"
+MODEL_DIR = os.getenv("MODEL_DIR", "./models")
 
 SUPPORTED_CROPS = {
     "chilli",
@@ -16,23 +36,694 @@ SUPPORTED_CROPS = {
     "turmeric",
 }
 
-_loaded_models = {}
+MAX_RESIDENT_MODELS = int(os.getenv("MAX_RESIDENT_MODELS", "0"))
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
 
 
-def get_model(crop: str) -> YOLO:
+def _model_size_bytes(model: "YOLO", path: str) -> int:
+    """
+    Resident size estimate: tensor bytes for PyTorch models, artifact size
+    on disk for exported ones (their runtime is created lazily).
+    """
+    import torch
+
+    if isinstance(model.model, torch.nn.Module):
+        tensors = list(model.model.parameters()) + list(model.model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+
+    try:
+        if os.path.isdir(path):
+            return sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(path)
+                for name in names
+            )
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class ModelRegistry:
+    """
+    Thread-safe LRU cache of loaded models.
+
+    Loads are single-flight: concurrent first requests for the same model
+    wait on one load instead of each reading the weights. Least recently
+    used models are evicted once more than `max_models` are resident or
+    their estimated size exceeds `memory_budget_mb` (0 disables a limit).
+    Pinned models are never evicted.
+    """
+
+    def __init__(
+        self,
+        max_models: int = MAX_RESIDENT_MODELS,
+        memory_budget_mb: float = MODEL_MEMORY_BUDGET_MB,
+    ):
+        self.max_models = max_models
+        self.memory_budget = memory_budget_mb * 1e6
+
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}  # key -> [lock, callers using it]
+        self._pinned = set()
+        self._loading = set()
+        self._loads = 0
+        self._evictions = 0
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._models
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._models)
+
+    def keys(self) -> list[str]:
+        with self._lock:
+            return list(self._models)
+
+    def _hit(self, key: str):
+        entry = self._models.get(key)
+        if entry is not None:
+            self._models.move_to_end(key)
+            entry["hits"] += 1
+            return entry["model"]
+        return None
+
+    def get(self, key: str, loader, path: str, pin: bool = False) -> "YOLO":
+        """
+        Resident model for `key`, calling `loader()` if needed. The pin is
+        applied only once the model is resident, so a failed load leaves
+        nothing pinned.
+        """
+        with self._lock:
+            model = self._hit(key)
+            if model is not None:
+                if pin:
+                    self._pinned.add(key)
+                return model
+            load_lock = self._load_locks.setdefault(key, [threading.Lock(), 0])
+            load_lock[1] += 1
+
+        try:
+            with load_lock[0]:
+                return self._load(key, loader, path, pin)
+        finally:
+            with self._lock:
+                load_lock[1] -= 1
+                if load_lock[1] == 0 and self._load_locks.get(key) is load_lock:
+                    del self._load_locks[key]
+
+    def _load(self, key: str, loader, path: str, pin: bool) -> "YOLO":
+        # Called holding the key's load lock; another caller may have
+        # finished the load while this one waited for it
+        with self._lock:
+            model = self._hit(key)
+            if model is not None:
+                if pin:
+                    self._pinned.add(key)
+                return model
+            self._loading.add(key)
+
+        try:
+            start = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - start
+        finally:
+            with self._lock:
+                self._loading.discard(key)
+        size = _model_size_bytes(model, path)
+
+        with self._lock:
+            self._models[key] = {
+                "model": model,
+                "path": path,
+                "size_bytes": size,
+                "load_seconds": load_seconds,
+                "loaded_at": time.time(),
+                "hits": 0,
+            }
+            self._loads += 1
+            if pin:
+                self._pinned.add(key)
+            self._evict(keep=key)
+
+        return model
+
+    def _resident_bytes(self) -> int:
+        return sum(entry["size_bytes"] for entry in self._models.values())
+
+    def _over_limit(self) -> bool:
+        return (
+            (self.max_models and len(self._models) > self.max_models)
+            or (self.memory_budget and self._resident_bytes() > self.memory_budget)
+        )
+
+    def _evict(self, keep: str):
+        while self._over_limit():
+            victim = next(
+                (k for k in self._models if k != keep and k not in self._pinned),
+                None,
+            )
+            if victim is None:
+                break
+            del self._models[victim]
+            self._evictions += 1
+
+    def state(self, key: str) -> str:
+        """
+        "loaded", "loading" or "not_loaded".
+        """
+        with self._lock:
+            if key in self._models:
+                return "loaded"
+            return "loading" if key in self._loading else "not_loaded"
+
+    def evict(self, key: str) -> bool:
+        with self._lock:
+            self._pinned.discard(key)
+            if self._models.pop(key, None) is None:
+                return False
+            self._evictions += 1
+            return True
+
+    def pin(self, key: str):
+        with self._lock:
+            self._pinned.add(key)
+
+    def unpin(self, key: str):
+        with self._lock:
+            self._pinned.discard(key)
+            self._evict(keep=None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "resident_models": len(self._models),
+                "resident_mb": round(self._resident_bytes() / 1e6, 2),
+                "max_models": self.max_models or None,
+                "memory_budget_mb": self.memory_budget / 1e6 or None,
+                "loads": self._loads,
+                "evictions": self._evictions,
+                "models": {
+                    key: {
+                        "size_mb": round(entry["size_bytes"] / 1e6, 2),
+                        "load_seconds": round(entry["load_seconds"], 3),
+                        "loaded_at": entry["loaded_at"],
+                        "hits": entry["hits"],
+                        "pinned": key in self._pinned,
+                    }
+                    for key, entry in self._models.items()
+                },
+            }
+
+
+model_registry = ModelRegistry()
+
+
+def model_key(crop: str, backend: str, precision: str = "fp32") -> str:
+    if precision == "fp32":
+        return f"{crop}:{backend}"
+    return f"{crop}:{backend}:{precision}"
+
+
+def get_model(
+    crop: str,
+    backend: str | None = None,
+    precision: str | None = None,
+    pin: bool = False,
+) -> "YOLO":
     """
     Loads and caches YOLO models.
+
+    With `pin=True` the model is kept resident regardless of the
+    registry's eviction limits.
     """
     crop = crop.lower()
+    backend = resolve_backend(backend)
+    precision = resolve_precision(crop, backend, precision)
 
     if crop not in SUPPORTED_CROPS:
         raise ValueError(f"Unsupported crop: {crop}")
 
-    if crop not in _loaded_models:
-        model_path = f"{MODEL_DIR}/{crop}.pt"
-        _loaded_models[crop] = YOLO(model_path)
+    key = model_key(crop, backend, precision)
+    model_path = artifact_path(crop, backend, precision)
+
+    def load():
+        from ultralytics import YOLO
+
+        path = export_model(crop, backend, precision)
+        task = None if backend == "torch" else _export_task(path)
+        return YOLO(path, task=task)
+
+    return model_registry.get(key, load, model_path, pin=pin)
+
+
+# -------------------------------------------------
+# MODEL BACKENDS
+# -------------------------------------------------
+
+# torch    → eager PyTorch on ./models/{crop}.pt, or on the prepared
+#            ./models/{crop}.prepared.pt when it is up to date
+# onnx     → ONNX Runtime on ./models/{crop}.onnx
+# openvino → OpenVINO on ./models/{crop}_openvino_model/
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "torch").lower()
+
+BACKEND_ARTIFACTS = {
+    "torch": "{dir}/{crop}.pt",
+    "onnx": "{dir}/{crop}.onnx",
+    "openvino": "{dir}/{crop}_openvino_model",
+}
+
+SUPPORTED_BACKENDS = set(BACKEND_ARTIFACTS)
+
+PREPARED_ARTIFACT = "{dir}/{crop}.prepared.pt"
+
+# Reduced-precision variants are ONNX Runtime models built by
+# quantization.py as ./models/{crop}.{precision}.onnx. The precision is
+# chosen per crop, e.g. MODEL_PRECISION="tomato=int8-static,chilli=fp16",
+# and only applies to the onnx backend.
+SUPPORTED_PRECISIONS = {"fp32", "fp16", "int8-dynamic", "int8-static"}
+
+PRECISION_ARTIFACT = "{dir}/{crop}.{precision}.onnx"
+
+
+def _parse_precisions(value: str) -> dict:
+    precisions = {}
+    for entry in filter(None, (e.strip() for e in value.split(","))):
+        crop, _, precision = entry.partition("=")
+        precisions[crop.strip().lower()] = precision.strip().lower()
+    return precisions
+
+
+MODEL_PRECISION = _parse_precisions(os.getenv("MODEL_PRECISION", ""))
+
+_export_lock = threading.Lock()
 
-    return _loaded_models[crop]
+
+def resolve_backend(backend: str | None = None) -> str:
+    backend = (backend or MODEL_BACKEND).lower()
+    if backend not in SUPPORTED_BACKENDS:
+        raise ValueError(
+            f"Unsupported backend: {backend}. "
+            f"Choose from {sorted(SUPPORTED_BACKENDS)}"
+        )
+    return backend
+
+
+def resolve_precision(
+    crop: str,
+    backend: str,
+    precision: str | None = None,
+) -> str:
+    if precision is None:
+        precision = MODEL_PRECISION.get(crop, "fp32") if backend == "onnx" else "fp32"
+    precision = precision.lower()
+
+    if precision not in SUPPORTED_PRECISIONS:
+        raise ValueError(
+            f"Unsupported precision: {precision}. "
+            f"Choose from {sorted(SUPPORTED_PRECISIONS)}"
+        )
+    if precision != "fp32" and backend != "onnx":
+        raise ValueError(f"Precision {precision} requires the onnx backend")
+
+    return precision
+
+
+def artifact_path(crop: str, backend: str, precision: str = "fp32") -> str:
+    if precision != "fp32":
+        return PRECISION_ARTIFACT.format(dir=MODEL_DIR, crop=crop, precision=precision)
+    return BACKEND_ARTIFACTS[backend].format(dir=MODEL_DIR, crop=crop)
+
+
+def _is_fresh(artifact: str, weights: str) -> bool:
+    return (
+        os.path.exists(artifact)
+        and os.path.getmtime(artifact) >= os.path.getmtime(weights)
+    )
+
+
+def _export_task(path: str) -> str | None:
+    """
+    Task (detect / classify) that ultralytics recorded in an exported
+    artifact's metadata, so it loads with the right result type without
+    parsing the .pt weights again. None lets ultralytics guess.
+    """
+    try:
+        if os.path.isdir(path):
+            import yaml
+
+            with open(os.path.join(path, "metadata.yaml")) as f:
+                return yaml.safe_load(f).get("task")
+
+        import onnx
+
+        model = onnx.load(path, load_external_data=False)
+        return {prop.key: prop.value for prop in model.metadata_props}.get("task")
+    except Exception:
+        # Missing or unreadable metadata
+        return None
+
+
+def export_model(
+    crop: str,
+    backend: str | None = None,
+    precision: str = "fp32",
+) -> str:
+    """
+    Returns the artifact path for a crop on a backend, exporting it from
+    the .pt weights on first use or when the weights are newer.
+
+    Reduced-precision variants are never built here, since static INT8
+    needs calibration images; run quantization.py first.
+    """
+    crop = crop.lower()
+    backend = resolve_backend(backend)
+    weights = artifact_path(crop, "torch")
+
+    if backend == "torch":
+        prepared = PREPARED_ARTIFACT.format(dir=MODEL_DIR, crop=crop)
+        return prepared if _is_fresh(prepared, weights) else weights
+
+    if precision != "fp32":
+        artifact = artifact_path(crop, backend, precision)
+        if not os.path.exists(artifact):
+            raise ValueError(
+                f"Missing {precision} model for {crop}: {artifact}. "
+                f"Build it with: python quantization.py --crops {crop} "
+                f"--precisions {precision}"
+            )
+        return artifact
+
+    artifact = artifact_path(crop, backend)
+
+    with _export_lock:
+        if not _is_fresh(artifact, weights):
+            from ultralytics import YOLO
+
+            # dynamic=True keeps the batch axis open for micro-batching
+            artifact = str(YOLO(weights).export(format=backend, dynamic=True))
+
+    return artifact
+
+
+def prepare_model(crop: str) -> str:
+    """
+    Writes {crop}.prepared.pt: the .pt weights as an fp32 model with
+    Conv+BatchNorm already fused and training state (EMA, optimizer)
+    dropped, so loading does neither. The torch backend uses it while it
+    is newer than the weights; build it with export_models.py.
+    """
+    import torch
+    from ultralytics import YOLO
+
+    crop = crop.lower()
+    weights = artifact_path(crop, "torch")
+    prepared = PREPARED_ARTIFACT.format(dir=MODEL_DIR, crop=crop)
+
+    model = YOLO(weights).model.float().fuse(verbose=False).eval()
+    for param in model.parameters():
+        param.requires_grad_(False)
+
+    checkpoint = torch.load(weights, map_location="cpu", weights_only=False)
+    checkpoint = {k: v for k, v in checkpoint.items() if k not in ("ema", "optimizer", "updates")}
+    checkpoint["model"] = model
+
+    partial = prepared + ".partial"
+    torch.save(checkpoint, partial)
+    os.replace(partial, prepared)
+    return prepared
+
+
+# -------------------------------------------------
+# INFERENCE EXECUTOR
+# -------------------------------------------------
+
+INFERENCE_WORKERS = max(1, int(os.getenv("INFERENCE_WORKERS", "2")))
+TORCH_THREADS = max(1, int(os.getenv(
+    "TORCH_THREADS",
+    str((os.cpu_count() or 1) // INFERENCE_WORKERS),
+)))
+
+_inference_executor = None
+_inference_executor_lock = threading.Lock()
+
+
+def get_inference_executor() -> ThreadPoolExecutor:
+    """
+    Returns the shared pool that runs every forward pass.
+
+    torch intra-op threads are capped so that INFERENCE_WORKERS concurrent
+    forward passes together use about one thread per core.
+    """
+    global _inference_executor
+
+    with _inference_executor_lock:
+        if _inference_executor is None:
+            import torch
+
+            torch.set_num_threads(TORCH_THREADS)
+            _inference_executor = ThreadPoolExecutor(
+                max_workers=INFERENCE_WORKERS,
+                thread_name_prefix="inference",
+            )
+        return _inference_executor
+
+
+# -------------------------------------------------
+# MICRO-BATCHING SCHEDULER
+# -------------------------------------------------
+
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+BATCH_QUEUE_DEPTH = int(os.getenv("BATCH_QUEUE_DEPTH", "256"))
+
+
+class QueueFullError(RuntimeError):
+    """
+    Raised when a crop's batching queue is at capacity.
+    """
+
+
+class BatchScheduler:
+    """
+    Collects concurrent requests for one crop and runs them as a single
+    batched forward pass.
+
+    A request that finds the scheduler idle with nothing queued behind
+    it is dispatched at once. Otherwise the batch is dispatched as soon
+    as it holds `max_batch_size` images or the oldest request has waited
+    `max_wait_ms`, whichever comes first. Requests that arrive while a
+    forward pass runs queue up and form the next batch.
+    """
+
+    def __init__(
+        self,
+        crop: str,
+        backend: str = MODEL_BACKEND,
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait_ms: float = BATCH_MAX_WAIT_MS,
+        max_queue_depth: int = BATCH_QUEUE_DEPTH,
+    ):
+        self.crop = crop
+        self.backend = backend
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_queue_depth = max_queue_depth
+
+        self._queue = queue.Queue(maxsize=max_queue_depth)
+        self._stats_lock = threading.Lock()
+        self._histogram = Counter()
+        self._images = 0
+        self._rejected = 0
+
+        self._thread = threading.Thread(
+            target=self._loop,
+            name=f"batcher-{crop}-{backend}",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def submit(self, image) -> Future:
+        """
+        Queues one image and returns a Future resolving to its raw result.
+        """
+        future = Future()
+        try:
+            self._queue.put_nowait((image, future))
+        except queue.Full:
+            with self._stats_lock:
+                self._rejected += 1
+            raise QueueFullError(
+                f"Inference queue for {self.crop} is full "
+                f"({self.max_queue_depth} pending)"
+            )
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        if len(batch) >= self.max_batch_size:
+            return batch
+
+        # Waiting only pays off under concurrent load; a lone request
+        # (e.g. a recorder frame or a quiet API) must not sit out the window.
+        try:
+            batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            return batch
+
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+
+            # Drop callers that gave up while waiting in the queue
+            batch = [
+                (image, future) for image, future in batch
+                if future.set_running_or_notify_cancel()
+            ]
+            if batch:
+                self._run(batch)
+
+    def _forward(self, images):
+        model = get_model(self.crop, self.backend)
+        with profiler.forward(f"{self.crop}-{self.backend}"):
+            return model(images, verbose=False)
+
+    def _run(self, batch):
+        images = [image for image, _ in batch]
+
+        # The forward pass runs on the shared inference pool; this thread
+        # waits for it so a crop's model is never called concurrently.
+        try:
+            results = get_inference_executor().submit(self._forward, images).result()
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._stats_lock:
+            self._histogram[len(batch)] += 1
+            self._images += len(batch)
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            batches = sum(self._histogram.values())
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "max_queue_depth": self.max_queue_depth,
+                "queue_depth": self._queue.qsize(),
+                "batches": batches,
+                "images": self._images,
+                "rejected": self._rejected,
+                "mean_batch_size": self._images / batches if batches else 0.0,
+                "batch_size_histogram": {
+                    str(size): count
+                    for size, count in sorted(self._histogram.items())
+                },
+            }
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+# Out-of-process inference (see inference_workers.py); when installed it
+# serves its crops in place of the in-process schedulers.
+_remote_pool = None
+
+
+def set_remote_pool(pool):
+    """
+    Routes inference for the crops `pool` serves to it; None reverts to
+    in-process schedulers.
+    """
+    global _remote_pool
+    _remote_pool = pool
+
+
+def get_scheduler(crop: str, backend: str | None = None, local: bool = False):
+    """
+    Returns the batching scheduler for a crop and backend, starting it on
+    first use. Anything with submit(image) -> Future qualifies; `local`
+    forces the in-process scheduler, whose results are YOLO objects.
+    """
+    crop = crop.lower()
+    backend = resolve_backend(backend)
+
+    if crop not in SUPPORTED_CROPS:
+        raise ValueError(f"Unsupported crop: {crop}")
+
+    pool = _remote_pool
+    if not local and pool is not None and pool.serves(crop, backend):
+        return pool.submitter(crop)
+
+    key = model_key(crop, backend)
+    with _schedulers_lock:
+        if key not in _schedulers:
+            _schedulers[key] = BatchScheduler(crop, backend)
+        return _schedulers[key]
+
+
+def batching_stats() -> dict:
+    with _schedulers_lock:
+        schedulers = dict(_schedulers)
+    return {key: s.stats() for key, s in sorted(schedulers.items())}
+
+
+def model_states(backend: str | None = None) -> dict:
+    """
+    Load state per crop: "loaded", "loading", "not_loaded", or "worker"
+    for crops served by out-of-process workers.
+    """
+    backend = resolve_backend(backend)
+    states = {}
+    for crop in sorted(SUPPORTED_CROPS):
+        if _remote_pool is not None and _remote_pool.serves(crop, backend):
+            states[crop] = "worker"
+        else:
+            key = model_key(crop, backend, resolve_precision(crop, backend))
+            states[crop] = model_registry.state(key)
+    return states
+
+
+def describe_model(model) -> dict:
+    """
+    The model facts request planning needs: its task and input size.
+    """
+    imgsz = model.overrides.get("imgsz", 640)
+    return {
+        "task": model.task,
+        "imgsz": max(imgsz) if isinstance(imgsz, (list, tuple)) else int(imgsz),
+    }
+
+
+def model_info(crop: str, backend: str | None = None) -> dict:
+    """
+    describe_model() for the model serving a crop. Crops served by
+    out-of-process workers are answered from what the workers reported,
+    so their models are never loaded here.
+    """
+    pool = _remote_pool
+    if pool is not None and pool.serves(crop.lower(), resolve_backend(backend)):
+        return pool.model_info(crop.lower())
+    return describe_model(get_model(crop, backend))
 
 
 # -------------------------------------------------
@@ -46,14 +737,398 @@ def load_image(path: str):
     return img
 
 
+# -------------------------------------------------
+# RESULT CACHE (CONTENT-ADDRESSED)
+# -------------------------------------------------
+
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "4096"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "3600"))
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "")
+
+
+def model_version(crop: str, backend: str | None = None) -> str:
+    """
+    Identifies the exact model artifact that would serve a crop, so cached
+    results are invalidated when weights are replaced or re-exported.
+    """
+    crop = crop.lower()
+    backend = resolve_backend(backend)
+    precision = resolve_precision(crop, backend)
+
+    try:
+        stat = os.stat(artifact_path(crop, backend, precision))
+        stamp = f"{stat.st_mtime_ns}-{stat.st_size}"
+    except OSError:
+        stamp = "missing"
+
+    return f"{backend}-{precision}-{stamp}"
+
+
+def image_cache_key(
+    crop: str,
+    data: bytes,
+    backend: str | None = None,
+    variant: str = "",
+) -> str:
+    """
+    Cache key for the encoded image bytes of one upload. `variant` tells
+    apart results computed differently from the same bytes (e.g. tiled).
+    """
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    return _cache_key(crop, digest, backend, variant)
+
+
+def image_cache_keys(crops, data: bytes, backend: str | None = None) -> dict:
+    """
+    Cache keys for one upload under several crops, hashing it only once.
+    """
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    return {crop: _cache_key(crop, digest, backend) for crop in crops}
+
+
+def _cache_key(crop: str, digest: str, backend: str | None, variant: str = "") -> str:
+    crop = crop.lower()
+    key = f"{crop}:{model_version(crop, backend)}:{digest}"
+    return f"{key}:{variant}" if variant else key
+
+
+class ResultCache:
+    """
+    LRU + TTL cache of raw (unfiltered) detections.
+
+    Entries are raw detections rather than API outputs, so one cached
+    forward pass serves requests with any threshold. With `disk_dir` set,
+    entries are also written there as JSON and survive restarts.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        ttl: float = RESULT_CACHE_TTL,
+        disk_dir: str = RESULT_CACHE_DIR,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key: str) -> str:
+        name = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        return os.path.join(self.disk_dir, f"{name}.json")
+
+    def _read_disk(self, key: str) -> tuple[dict | None, bool]:
+        """
+        Returns (raw or None, whether an expired file was removed). Runs
+        outside the lock; the caller does the counting.
+        """
+        path = self._disk_path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None, True
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None, False
+
+        return (entry["raw"] if entry.get("key") == key else None), False
+
+    def _write_disk(self, key: str, raw: dict):
+        path = self._disk_path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            serialisable = {
+                "names": raw["names"],
+                "boxes": np.asarray(raw["boxes"]).tolist(),
+                "probs": None if raw["probs"] is None else np.asarray(raw["probs"]).tolist(),
+            }
+            with open(tmp, "w") as f:
+                json.dump({"key": key, "raw": serialisable}, f)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def get(self, key: str):
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, raw = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return raw
+                del self._entries[key]
+                self._counters["expired"] += 1
+
+        raw, disk_expired = self._read_disk(key) if self.disk_dir else (None, False)
+
+        with self._lock:
+            if disk_expired:
+                self._counters["disk_expired"] += 1
+            if raw is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["disk_hits"] += 1
+            self._store(key, raw, now)
+            return raw
+
+    def put(self, key: str, raw: dict):
+        with self._lock:
+            self._store(key, raw, time.monotonic())
+
+        if self.disk_dir:
+            self._write_disk(key, raw)
+
+    def _store(self, key: str, raw: dict, now: float):
+        self._entries[key] = (now, raw)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["disk_hits"] + self._counters["misses"]
+            hits = self._counters["hits"] + self._counters["disk_hits"]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "disk_dir": self.disk_dir or None,
+                "hits": self._counters["hits"],
+                "disk_hits": self._counters["disk_hits"],
+                "misses": self._counters["misses"],
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self._counters["evictions"],
+                "expired": self._counters["expired"] + self._counters["disk_expired"],
+            }
+
+
+result_cache = ResultCache()
+
+
 # -------------------------------------------------
 # INFERENCE ENGINE (DETECTION + CLASSIFICATION)
 # -------------------------------------------------
 
+_EMPTY_BOXES = np.zeros((0, 6), dtype=np.float32)
+
+# Below this many classes a plain loop over the probabilities beats
+# building index arrays (the crop classifiers have 6-11 classes)
+VECTORISE_MIN_CLASSES = 200
+
+_names_memo = {}
+
+
+def _memo_by_identity(obj, build):
+    """
+    Caches a value derived from a long-lived object (a model's names dict),
+    so it is built once per model rather than once per request.
+    """
+    cached = _names_memo.get((id(obj), build))
+    if cached is not None and cached[0] is obj:
+        return cached[1]
+
+    if len(_names_memo) > 64:
+        _names_memo.clear()
+
+    value = build(obj)
+    _names_memo[(id(obj), build)] = (obj, value)
+    return value
+
+
+def _names_list(names: dict) -> list[str]:
+    return [names[i] for i in range(len(names))]
+
+
+def _names_array(names: list[str]) -> np.ndarray:
+    return np.asarray(names, dtype=object)
+
+
+def raw_detections(result) -> dict:
+    """
+    Converts a YOLO result into plain, unfiltered detections:
+    {
+      "names": ["class_0", ...],
+      "boxes": float32 array (N, 6) of [x1, y1, x2, y2, conf, cls],
+      "probs": float32 array (C,) or None
+    }
+
+    Each tensor is copied to the host once, instead of per box.
+    """
+    names = _memo_by_identity(result.names, _names_list)
+    raw = {"names": names, "boxes": _EMPTY_BOXES, "probs": None}
+
+    # ----------- DETECTION MODELS -----------
+    if hasattr(result, "boxes") and result.boxes is not None:
+        boxes = result.boxes.cpu().numpy()
+        raw["boxes"] = np.column_stack(
+            (boxes.xyxy, boxes.conf, boxes.cls)
+        ).astype(np.float32, copy=False)
+
+    # ----------- CLASSIFICATION MODELS -----------
+    if hasattr(result, "probs") and result.probs is not None:
+        raw["probs"] = result.probs.data.cpu().numpy().astype(np.float32, copy=False)
+
+    return raw
+
+
+def filter_detections(crop: str, raw: dict, threshold: float) -> dict:
+    """
+    Applies the confidence threshold to raw detections and returns the
+    unified output format.
+
+    Box thresholding and class-name lookup are whole-array operations;
+    Python only touches the boxes that survive, to build the JSON.
+    Classification scores go through a plain loop unless the model has
+    VECTORISE_MIN_CLASSES classes or more.
+    """
+    output = {
+        "crop": crop,
+        "boxes": [],
+        "classification": [],
+    }
+
+    # A float64 threshold keeps NumPy from rounding it to float32, so the
+    # cut-off matches comparing each confidence as a Python float
+    cutoff = np.float64(threshold)
+    if len(raw["boxes"]):
+        boxes = np.asarray(raw["boxes"], dtype=np.float32).reshape(-1, 6)
+        kept = boxes[boxes[:, 4] >= cutoff]
+        if len(kept):
+            names = _memo_by_identity(raw["names"], _names_array)
+            output["boxes"] = [
+                {"class": cls_name, "confidence": conf, "bbox": bbox}
+                for cls_name, conf, bbox in zip(
+                    names[kept[:, 5].astype(np.intp)].tolist(),
+                    kept[:, 4].tolist(),
+                    kept[:, :4].tolist(),
+                )
+            ]
+
+    if raw["probs"] is not None:
+        probs = np.asarray(raw["probs"], dtype=np.float32)
+        if len(probs) < VECTORISE_MIN_CLASSES:
+            output["classification"] = [
+                {"class": cls_name, "confidence": conf}
+                for cls_name, conf in zip(raw["names"], probs.tolist())
+                if conf >= threshold
+            ]
+        else:
+            names = _memo_by_identity(raw["names"], _names_array)
+            idx = np.flatnonzero(probs >= cutoff)
+            output["classification"] = [
+                {"class": cls_name, "confidence": conf}
+                for cls_name, conf in zip(names[idx].tolist(), probs[idx].tolist())
+            ]
+
+    return output
+
+
+def as_raw(result) -> dict:
+    """
+    raw_detections for a YOLO result; out-of-process workers already
+    return that dict.
+    """
+    return result if isinstance(result, dict) else raw_detections(result)
+
+
+def extract_output(crop: str, result, threshold: float) -> dict:
+    """
+    Converts a raw YOLO result into the unified output format.
+    """
+    return filter_detections(crop, raw_detections(result), threshold)
+
+
+def cached_output(crop: str, cache_key: str, threshold: float) -> dict | None:
+    """
+    Returns the unified output for a cached image, or None on a miss.
+    """
+    raw = result_cache.get(cache_key)
+    if raw is None:
+        return None
+    return filter_detections(crop, raw, threshold)
+
+
+def predict_raw(crop: str, image, backend: str | None = None, local: bool = False):
+    """
+    Runs one forward pass through the batching scheduler and returns the
+    raw YOLO result, from which both JSON output and plots can be built.
+    Out-of-process workers return raw_detections dicts instead, unless
+    `local` is set.
+    """
+    return get_scheduler(crop, backend, local).submit(image).result()
+
+
+async def predict_raw_async(
+    crop: str,
+    image,
+    backend: str | None = None,
+    local: bool = False,
+):
+    """
+    Awaitable variant of predict_raw for async request handlers.
+    """
+    future = get_scheduler(crop, backend, local).submit(image)
+    return await asyncio.wrap_future(future)
+
+
+def scale_raw_boxes(raw: dict, scale: tuple[float, float]) -> dict:
+    """
+    Maps raw box coordinates from a resized image back to the original.
+    """
+    sx, sy = scale
+    if (sx, sy) == (1.0, 1.0) or not len(raw["boxes"]):
+        return raw
+
+    boxes = np.array(raw["boxes"], dtype=np.float32)
+    boxes[:, [0, 2]] *= sx
+    boxes[:, [1, 3]] *= sy
+    return {**raw, "boxes": boxes}
+
+
+def _finish(
+    crop: str,
+    result,
+    threshold: float,
+    cache_key: str | None,
+    scale: tuple[float, float] | None = None,
+    letterboxed: tuple | None = None,
+    backend: str | None = None,
+) -> dict:
+    observe_result_speed(result, crop, backend)
+
+    with timed_stage("postprocess", crop, backend):
+        raw = as_raw(result)
+        if letterboxed is not None:
+            raw = unletterbox_raw_boxes(raw, *letterboxed)
+        if scale is not None:
+            raw = scale_raw_boxes(raw, scale)
+        if cache_key is not None:
+            result_cache.put(cache_key, raw)
+        return filter_detections(crop, raw, threshold)
+
+
 def run_inference(
     crop: str,
     image,
     threshold: float = 0.5,
+    backend: str | None = None,
+    cache_key: str | None = None,
+    scale: tuple[float, float] | None = None,
 ):
     """
     Returns unified inference result.
@@ -64,62 +1139,596 @@ def run_inference(
       "boxes": [...],
       "classification": [...]
     }
+
+    With `cache_key` (see image_cache_key) the raw detections are stored
+    in the result cache. `scale` maps boxes from a reduced-resolution
+    decode back to original image coordinates (see image_io.decode_image).
     """
 
-    model = get_model(crop)
-    result = model(image, verbose=False)[0]
+    result = predict_raw(crop, image, backend)
+    return _finish(crop, result, threshold, cache_key, scale, backend=backend)
 
-    output = {
-        "crop": crop,
-        "boxes": [],
-        "classification": [],
-    }
 
-    # ----------- DETECTION MODELS -----------
-    if hasattr(result, "boxes") and result.boxes is not None:
-        for box in result.boxes:
-            conf = float(box.conf[0])
-            if conf < threshold:
-                continue
+async def run_inference_async(
+    crop: str,
+    image,
+    threshold: float = 0.5,
+    backend: str | None = None,
+    cache_key: str | None = None,
+    scale: tuple[float, float] | None = None,
+):
+    """
+    Awaitable variant of run_inference for async request handlers.
+    """
+    result = await predict_raw_async(crop, image, backend)
+    return _finish(crop, result, threshold, cache_key, scale, backend=backend)
 
-            cls_id = int(box.cls[0])
-            x1, y1, x2, y2 = map(float, box.xyxy[0])
 
-            output["boxes"].append({
-                "class": result.names[cls_id],
-                "confidence": conf,
-                "bbox": [x1, y1, x2, y2],
-            })
+def _submit_all(crop: str, images: list, backend: str | None = None) -> list[Future]:
+    scheduler = get_scheduler(crop, backend)
 
-    # ----------- CLASSIFICATION MODELS -----------
-    if hasattr(result, "probs") and result.probs is not None:
-        probs = result.probs.data.tolist()
-        for i, p in enumerate(probs):
-            if p < threshold:
+    futures = []
+    try:
+        for image in images:
+            futures.append(scheduler.submit(image))
+    except QueueFullError:
+        for future in futures:
+            future.cancel()
+        raise
+
+    return futures
+
+
+def run_inference_batch(
+    crop: str,
+    images: list,
+    threshold: float = 0.5,
+    backend: str | None = None,
+    cache_keys: list[str] | None = None,
+    scales: list[tuple[float, float]] | None = None,
+) -> list[dict]:
+    """
+    Runs many images for one crop through the batching scheduler together.
+
+    All images are queued before waiting on any of them so they share
+    forward passes. Returns one output dict per image, in input order.
+    """
+    futures = _submit_all(crop, images, backend)
+    cache_keys = cache_keys or [None] * len(images)
+    scales = scales or [None] * len(images)
+
+    return [
+        _finish(crop, future.result(), threshold, key, scale, backend=backend)
+        for future, key, scale in zip(futures, cache_keys, scales)
+    ]
+
+
+async def run_inference_batch_async(
+    crop: str,
+    images: list,
+    threshold: float = 0.5,
+    backend: str | None = None,
+    cache_keys: list[str] | None = None,
+    scales: list[tuple[float, float]] | None = None,
+) -> list[dict]:
+    """
+    Awaitable variant of run_inference_batch for async request handlers.
+    """
+    futures = _submit_all(crop, images, backend)
+    results = await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+    cache_keys = cache_keys or [None] * len(images)
+    scales = scales or [None] * len(images)
+
+    return [
+        _finish(crop, result, threshold, key, scale, backend=backend)
+        for result, key, scale in zip(results, cache_keys, scales)
+    ]
+
+
+# -------------------------------------------------
+# TILED INFERENCE (HIGH-RESOLUTION IMAGES)
+# -------------------------------------------------
+
+# Drone / DSLR frames are cut into overlapping tiles so small lesions
+# are not lost in the downscale to the model input size.
+TILE_SIZE = int(os.getenv("TILE_SIZE", "640"))
+TILE_OVERLAP = float(os.getenv("TILE_OVERLAP", "0.2"))
+TILE_MAX_TILES = int(os.getenv("TILE_MAX_TILES", "32"))
+TILE_NMS_IOU = float(os.getenv("TILE_NMS_IOU", "0.5"))
+
+
+def _tile_starts(length: int, tile: int, overlap: float) -> list[int]:
+    if length <= tile:
+        return [0]
+
+    stride = max(1, int(tile * (1.0 - overlap)))
+    count = math.ceil((length - tile) / stride) + 1
+    return np.linspace(0, length - tile, count).round().astype(int).tolist()
+
+
+def tile_grid(
+    width: int,
+    height: int,
+    tile_size: int = TILE_SIZE,
+    overlap: float = TILE_OVERLAP,
+    max_tiles: int = TILE_MAX_TILES,
+) -> list[tuple[int, int, int, int]]:
+    """
+    Splits an image into overlapping (x1, y1, x2, y2) tiles that cover it,
+    the last row / column flush with the image edge.
+
+    When more than `max_tiles` would be needed the tile size grows until
+    the grid fits, so cost stays bounded on very large images.
+    """
+    if tile_size < 1:
+        raise ValueError(f"Invalid tile size: {tile_size}")
+    if not 0.0 <= overlap < 1.0:
+        raise ValueError(f"Invalid tile overlap: {overlap}")
+    if max_tiles < 1:
+        raise ValueError(f"Invalid tile budget: {max_tiles}")
+
+    tile = tile_size
+    while True:
+        xs = _tile_starts(width, tile, overlap)
+        ys = _tile_starts(height, tile, overlap)
+        count = len(xs) * len(ys)
+        if count <= max_tiles:
+            break
+        tile = max(tile + 1, math.ceil(tile * math.sqrt(count / max_tiles)))
+
+    tw, th = min(tile, width), min(tile, height)
+    return [(x, y, x + tw, y + th) for y in ys for x in xs]
+
+
+def nms_boxes(boxes: np.ndarray, iou_threshold: float = TILE_NMS_IOU) -> np.ndarray:
+    """
+    Class-aware greedy NMS over (N, 6) [x1, y1, x2, y2, conf, cls] rows.
+    Returns the kept rows, highest confidence first.
+    """
+    if len(boxes) < 2:
+        return boxes
+
+    # Shifting each class into its own coordinate range keeps boxes of
+    # different classes from suppressing each other in a single pass.
+    xyxy = boxes[:, :4].astype(np.float64)
+    xyxy += boxes[:, 5:6] * (xyxy.max() + 1.0)
+    areas = (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])
+
+    order = np.argsort(-boxes[:, 4], kind="stable")
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        iw = np.minimum(xyxy[i, 2], xyxy[rest, 2]) - np.maximum(xyxy[i, 0], xyxy[rest, 0])
+        ih = np.minimum(xyxy[i, 3], xyxy[rest, 3]) - np.maximum(xyxy[i, 1], xyxy[rest, 1])
+        inter = np.clip(iw, 0, None) * np.clip(ih, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+
+        order = rest[iou <= iou_threshold]
+
+    return boxes[keep]
+
+
+def merge_tile_detections(
+    results: list,
+    tiles: list[tuple[int, int, int, int]],
+    iou_threshold: float = TILE_NMS_IOU,
+) -> dict:
+    """
+    Shifts each tile's raw boxes back to full-image coordinates and merges
+    the duplicates found in overlapping tiles with class-aware NMS.
+    """
+    raws = [as_raw(result) for result in results]
+
+    shifted = []
+    for raw, (x1, y1, _, _) in zip(raws, tiles):
+        if len(raw["boxes"]):
+            offset = np.array([x1, y1, x1, y1, 0, 0], dtype=np.float32)
+            shifted.append(raw["boxes"] + offset)
+
+    boxes = np.concatenate(shifted) if shifted else _EMPTY_BOXES
+    return {"names": raws[0]["names"], "boxes": nms_boxes(boxes, iou_threshold), "probs": None}
+
+
+def _plan_tiles(
+    crop: str,
+    image,
+    tile_size,
+    overlap,
+    max_tiles,
+    backend: str | None = None,
+) -> list[tuple[int, int, int, int]]:
+    """
+    Tiles for one image, plus the full frame so lesions larger than a
+    tile are still seen whole; the full frame counts against
+    `max_tiles`. Classification models are not tiled.
+    """
+    h, w = image.shape[:2]
+    if model_info(crop, backend)["task"] != "detect":
+        return [(0, 0, w, h)]
+
+    budget = TILE_MAX_TILES if max_tiles is None else max_tiles
+    tiles = tile_grid(
+        w,
+        h,
+        TILE_SIZE if tile_size is None else tile_size,
+        TILE_OVERLAP if overlap is None else overlap,
+        budget - 1 if budget > 1 else budget,
+    )
+    if len(tiles) > 1:
+        tiles.append((0, 0, w, h))
+    return tiles
+
+
+def _finish_tiled(
+    crop: str,
+    results: list,
+    tiles: list[tuple[int, int, int, int]],
+    threshold: float,
+    cache_key: str | None,
+    backend: str | None = None,
+) -> dict:
+    if len(tiles) == 1:
+        return _finish(crop, results[0], threshold, cache_key, backend=backend)
+
+    for result in results:
+        observe_result_speed(result, crop, backend)
+
+    with timed_stage("postprocess", crop, backend):
+        raw = merge_tile_detections(results, tiles)
+        if cache_key is not None:
+            result_cache.put(cache_key, raw)
+        return filter_detections(crop, raw, threshold)
+
+
+def run_inference_tiled(
+    crop: str,
+    image,
+    threshold: float = 0.5,
+    backend: str | None = None,
+    cache_key: str | None = None,
+    tile_size: int | None = None,
+    overlap: float | None = None,
+    max_tiles: int | None = None,
+) -> dict:
+    """
+    Sliced inference for high-resolution images.
+
+    All tiles are queued on the batching scheduler together, so they go
+    through the model in batches of up to BATCH_MAX_SIZE rather than one
+    forward pass each. Tile settings default to TILE_SIZE, TILE_OVERLAP
+    and TILE_MAX_TILES. `image` should be decoded at full resolution.
+    """
+    crop = crop.lower()
+    tiles = _plan_tiles(crop, image, tile_size, overlap, max_tiles, backend)
+    futures = _submit_all(crop, [image[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles], backend)
+    return _finish_tiled(crop, [f.result() for f in futures], tiles, threshold, cache_key, backend)
+
+
+async def run_inference_tiled_async(
+    crop: str,
+    image,
+    threshold: float = 0.5,
+    backend: str | None = None,
+    cache_key: str | None = None,
+    tile_size: int | None = None,
+    overlap: float | None = None,
+    max_tiles: int | None = None,
+) -> dict:
+    """
+    Awaitable variant of run_inference_tiled for async request handlers.
+    """
+    crop = crop.lower()
+    tiles = await asyncio.to_thread(_plan_tiles, crop, image, tile_size, overlap, max_tiles, backend)
+    futures = _submit_all(crop, [image[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles], backend)
+    results = await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+    return _finish_tiled(crop, results, tiles, threshold, cache_key, backend)
+
+
+# -------------------------------------------------
+# MULTI-CROP INFERENCE (ONE UPLOAD, SEVERAL MODELS)
+# -------------------------------------------------
+
+def letterbox(image, size: int = 640):
+    """
+    Resizes and pads an image to a `size` x `size` model input, the way
+    ultralytics does for detection. Returns (canvas, gain, (left, top)).
+
+    Detection models given the canvas skip their own resize, so one
+    letterbox is shared by every crop model with the same input size.
+    """
+    h, w = image.shape[:2]
+    gain = min(size / h, size / w)
+    nh, nw = round(h * gain), round(w * gain)
+    top, left = (size - nh) // 2, (size - nw) // 2
+
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    canvas[top:top + nh, left:left + nw] = cv2.resize(
+        image, (nw, nh), interpolation=cv2.INTER_LINEAR,
+    )
+    return canvas, gain, (left, top)
+
+
+def unletterbox_raw_boxes(
+    raw: dict,
+    gain: float,
+    pad: tuple[int, int],
+    shape: tuple[int, int],
+) -> dict:
+    """
+    Maps raw boxes from a letterboxed canvas back to the (h, w) image.
+    """
+    if not len(raw["boxes"]):
+        return raw
+
+    left, top = pad
+    h, w = shape
+    boxes = np.array(raw["boxes"], dtype=np.float32)
+    boxes[:, [0, 2]] = np.clip((boxes[:, [0, 2]] - left) / gain, 0, w)
+    boxes[:, [1, 3]] = np.clip((boxes[:, [1, 3]] - top) / gain, 0, h)
+    return {**raw, "boxes": boxes}
+
+
+def model_input_size(crop: str, backend: str | None = None) -> int:
+    return model_info(crop, backend)["imgsz"]
+
+
+def _plan_inputs(crops: list[str], image, backend: str | None = None) -> dict:
+    """
+    Picks each crop's model input: a shared letterbox canvas (one per
+    input size) for detection models, the decoded image otherwise.
+    Returns {crop: (input, letterboxed)}.
+    """
+    canvases = {}
+    inputs = {}
+    for crop in crops:
+        info = model_info(crop, backend)
+        if info["task"] != "detect":
+            inputs[crop] = (image, None)
+            continue
+
+        size = info["imgsz"]
+        if size not in canvases:
+            canvas, gain, pad = letterbox(image, size)
+            canvases[size] = (canvas, (gain, pad, image.shape[:2]))
+        inputs[crop] = canvases[size]
+
+    return inputs
+
+
+def top_confidence(output: dict) -> float:
+    """
+    Highest box or class confidence in a unified output dict.
+    """
+    return max(
+        [box["confidence"] for box in output["boxes"]]
+        + [item["confidence"] for item in output["classification"]],
+        default=0.0,
+    )
+
+
+async def run_inference_multi_async(
+    crops: list[str],
+    image,
+    threshold: float = 0.5,
+    backend: str | None = None,
+    cache_keys: dict | None = None,
+    scale: tuple[float, float] | None = None,
+    early_exit: float | None = None,
+    max_parallel: int = INFERENCE_WORKERS,
+) -> dict:
+    """
+    Runs one decoded image through several crop models concurrently.
+
+    Cached crops are answered first. Without `early_exit` every remaining
+    crop is queued at once and the models run in parallel on the
+    inference pool. With `early_exit`, crops run in order, at most
+    `max_parallel` at a time, and no more are started once one of them
+    reaches that confidence.
+
+    Returns {"results": {crop: output}, "skipped": [crops not run]}.
+    """
+    crops = [crop.lower() for crop in crops]
+    cache_keys = cache_keys or {}
+
+    results = {}
+    for crop in crops:
+        if crop in cache_keys:
+            output = cached_output(crop, cache_keys[crop], threshold)
+            if output is not None:
+                results[crop] = output
+
+    def reached(output: dict) -> bool:
+        return early_exit is not None and top_confidence(output) >= early_exit
+
+    pending = [crop for crop in crops if crop not in results]
+    if any(reached(output) for output in results.values()):
+        return {"results": results, "skipped": pending}
+
+    inputs = await asyncio.to_thread(_plan_inputs, pending, image, backend)
+    window = len(pending) if early_exit is None else max(1, max_parallel)
+
+    running = {}
+    stop = False
+    try:
+        while pending or running:
+            while pending and len(running) < window and not stop:
+                crop = pending.pop(0)
+                future = get_scheduler(crop, backend).submit(inputs[crop][0])
+                running[asyncio.wrap_future(future)] = crop
+
+            if not running:
+                break
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                crop = running.pop(task)
+                output = _finish(
+                    crop, task.result(), threshold, cache_keys.get(crop),
+                    scale, inputs[crop][1], backend,
+                )
+                results[crop] = output
+                stop = stop or reached(output)
+    finally:
+        for task in running:
+            task.cancel()
+
+    skipped = [crop for crop in crops if crop not in results]
+    return {"results": {crop: results[crop] for crop in crops if crop in results}, "skipped": skipped}
+
+
+# -------------------------------------------------
+# BACKEND PARITY CHECK
+# -------------------------------------------------
+
+def _box_iou(a, b) -> float:
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (
+        (a[2] - a[0]) * (a[3] - a[1])
+        + (b[2] - b[0]) * (b[3] - b[1])
+        - inter
+    )
+    return inter / union if union > 0 else 0.0
+
+
+def compare_outputs(
+    reference: dict,
+    candidate: dict,
+    iou_min: float = 0.9,
+    conf_tolerance: float = 0.05,
+) -> dict:
+    """
+    Compares two run_inference outputs for the same image.
+
+    Boxes are matched greedily by class and IoU; classification is compared
+    on its top-1 class and per-class probabilities.
+    """
+    unmatched = list(candidate["boxes"])
+    matched = 0
+    max_conf_delta = 0.0
+    min_iou = 1.0
+
+    for ref_box in sorted(reference["boxes"], key=lambda b: -b["confidence"]):
+        best, best_iou = None, 0.0
+        for cand_box in unmatched:
+            if cand_box["class"] != ref_box["class"]:
                 continue
+            iou = _box_iou(ref_box["bbox"], cand_box["bbox"])
+            if iou > best_iou:
+                best, best_iou = cand_box, iou
 
-            output["classification"].append({
-                "class": result.names[i],
-                "confidence": float(p),
-            })
+        if best is None or best_iou < iou_min:
+            continue
 
-    return output
+        unmatched.remove(best)
+        matched += 1
+        min_iou = min(min_iou, best_iou)
+        max_conf_delta = max(
+            max_conf_delta,
+            abs(best["confidence"] - ref_box["confidence"]),
+        )
+
+    ref_probs = {c["class"]: c["confidence"] for c in reference["classification"]}
+    cand_probs = {c["class"]: c["confidence"] for c in candidate["classification"]}
+    max_prob_delta = max(
+        (abs(ref_probs.get(k, 0.0) - cand_probs.get(k, 0.0))
+         for k in ref_probs.keys() | cand_probs.keys()),
+        default=0.0,
+    )
+    top1_match = (
+        max(ref_probs, key=ref_probs.get, default=None)
+        == max(cand_probs, key=cand_probs.get, default=None)
+    )
+
+    boxes_match = matched == len(reference["boxes"]) == len(candidate["boxes"])
+
+    return {
+        "boxes_reference": len(reference["boxes"]),
+        "boxes_candidate": len(candidate["boxes"]),
+        "boxes_matched": matched,
+        "min_iou": min_iou if matched else None,
+        "max_conf_delta": max_conf_delta,
+        "top1_match": top1_match,
+        "max_prob_delta": max_prob_delta,
+        "ok": (
+            boxes_match
+            and max_conf_delta <= conf_tolerance
+            and top1_match
+            and max_prob_delta <= conf_tolerance
+        ),
+    }
+
+
+def check_parity(
+    crop: str,
+    image,
+    backend: str,
+    threshold: float = 0.25,
+    iou_min: float = 0.9,
+    conf_tolerance: float = 0.05,
+) -> dict:
+    """
+    Runs the same image through PyTorch and another backend and reports
+    whether their outputs agree.
+    """
+    reference = run_inference(crop, image, threshold, backend="torch")
+    candidate = run_inference(crop, image, threshold, backend=backend)
+
+    report = compare_outputs(reference, candidate, iou_min, conf_tolerance)
+    report.update({"crop": crop, "backend": resolve_backend(backend)})
+    return report
 
 
 # -------------------------------------------------
 # OPTIONAL: ANNOTATED IMAGE (FOR UI)
 # -------------------------------------------------
 
+def plot_result(result, threshold: float = 0.0):
+    """
+    Draws a raw result, hiding boxes below the confidence threshold.
+    """
+    if result.boxes is not None:
+        result = result[result.boxes.conf >= threshold]
+    return result.plot()
+
+
 def run_inference_with_plot(
     crop: str,
     image,
     threshold: float = 0.5,
+    backend: str | None = None,
+    cache_key: str | None = None,
+    scale: tuple[float, float] | None = None,
+):
+    """
+    Returns (annotated BGR image, unified output) from a single forward pass.
+    """
+    result = predict_raw(crop, image, backend, local=True)
+    annotated_image = plot_result(result, threshold)
+
+    data = _finish(crop, result, threshold, cache_key, scale, backend=backend)
+    return annotated_image, data
+
+
+async def run_inference_with_plot_async(
+    crop: str,
+    image,
+    threshold: float = 0.5,
+    backend: str | None = None,
+    cache_key: str | None = None,
+    scale: tuple[float, float] | None = None,
 ):
-    model = get_model(crop)
-    result = model(image, verbose=False)[0]
-    annotated_image = result.plot()
+    """
+    Awaitable variant of run_inference_with_plot for async request handlers.
+    """
+    result = await predict_raw_async(crop, image, backend, local=True)
+    annotated_image = await asyncio.to_thread(plot_result, result, threshold)
 
-    data = run_inference(crop, image, threshold)
+    data = _finish(crop, result, threshold, cache_key, scale, backend=backend)
     return annotated_image, data
 
 
@@ -0,0 +1,199 @@
+"""
+Startup preload: loads the chosen crop models in the background and warms
+each one with dummy forward passes at its input size.
+
+The policy comes from environment variables, optionally on top of a JSON
+file named by PRELOAD_CONFIG:
+
+    {"crops": ["tomato", "chilli"], "concurrency": 2, "warmup_runs": 2,
+     "pin": true, "gate_readiness": true}
+
+Explicitly set environment variables override the file. The first
+forward pass of a model builds ultralytics' predictor (fusing layers
+and importing torchvision) and the first few size the allocator's
+pools, so a replica is only fast once those have run; with
+gate_readiness, /readyz stays 503 until they have.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+PRELOAD_CONFIG = os.getenv("PRELOAD_CONFIG", "")
+
+# Environment variable -> (policy key, parser)
+_ENV_POLICY = {
+    "PRELOAD_CROPS": ("crops", str),
+    "PRELOAD_CONCURRENCY": ("concurrency", int),
+    "PRELOAD_WARMUP_RUNS": ("warmup_runs", int),
+    "PRELOAD_PIN": ("pin", lambda v: v.lower() in {"1", "true", "yes"}),
+    "PRELOAD_GATE_READINESS": ("gate_readiness", lambda v: v.lower() in {"1", "true", "yes"}),
+}
+
+DEFAULT_POLICY = {
+    "crops": "none",
+    "concurrency": 2,
+    "warmup_runs": 2,
+    "pin": True,
+    "gate_readiness": True,
+}
+
+
+def parse_preload(value) -> list[str]:
+    """
+    "all", "none", "tomato,chilli" or a list of crops -> list of crops.
+    """
+    from model_core import SUPPORTED_CROPS
+
+    if isinstance(value, str):
+        if value.strip().lower() == "all":
+            return sorted(SUPPORTED_CROPS)
+        if value.strip().lower() in {"", "none"}:
+            return []
+        value = value.split(",")
+
+    crops = list(dict.fromkeys(c.strip().lower() for c in value if c.strip()))
+    unknown = [crop for crop in crops if crop not in SUPPORTED_CROPS]
+    if unknown:
+        raise ValueError(f"Unsupported preload crops: {unknown}")
+    return crops
+
+
+def load_policy(path: str = PRELOAD_CONFIG) -> dict:
+    policy = dict(DEFAULT_POLICY)
+    if path:
+        with open(path) as f:
+            policy.update(json.load(f))
+
+    for name, (key, parse) in _ENV_POLICY.items():
+        if name in os.environ:
+            policy[key] = parse(os.environ[name])
+
+    policy["crops"] = parse_preload(policy["crops"])
+    policy["concurrency"] = max(1, int(policy["concurrency"]))
+    policy["warmup_runs"] = max(0, int(policy["warmup_runs"]))
+    return policy
+
+
+# -------------------------------------------------
+# WARMUP
+# -------------------------------------------------
+
+def warm_model(crop: str, runs: int = 2, pin: bool = False) -> dict:
+    """
+    Loads a crop's model and runs `runs` dummy frames of its input size
+    through the batching scheduler, i.e. the same path, threads and
+    predictor as real requests. Returns the time spent on each part, or
+    {"worker": True} for crops whose out-of-process workers warm their
+    own model.
+    """
+    from model_core import get_model, model_input_size, model_states, predict_raw
+
+    if model_states()[crop] == "worker":
+        return {"worker": True}
+
+    start = time.perf_counter()
+    get_model(crop, pin=pin)
+    load_seconds = time.perf_counter() - start
+
+    size = model_input_size(crop)
+    frame = np.zeros((size, size, 3), dtype=np.uint8)
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        predict_raw(crop, frame)
+    warm_seconds = time.perf_counter() - start
+
+    return {
+        "load_seconds": round(load_seconds, 3),
+        "warmup_seconds": round(warm_seconds, 3),
+    }
+
+
+class Preloader:
+    """
+    Runs warm_model for every crop of a policy on a small thread pool,
+    in the background, and tracks per-crop progress.
+    """
+
+    def __init__(self, policy: dict):
+        self.policy = policy
+        self.started_at = None
+        self.finished_at = None
+
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._crops = {crop: {"state": "pending"} for crop in policy["crops"]}
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def start(self):
+        self.started_at = time.time()
+        if not self._crops:
+            self.finished_at = self.started_at
+            self._done.set()
+            return
+
+        threading.Thread(target=self._run, name="preload", daemon=True).start()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._done.wait(timeout)
+
+    def _set(self, crop: str, **fields):
+        with self._lock:
+            self._crops[crop].update(fields)
+
+    def _warm(self, crop: str):
+        from model_core import model_states
+
+        # Out-of-process workers load and warm their own models
+        if model_states()[crop] == "worker":
+            self._set(crop, state="worker")
+            return
+
+        self._set(crop, state="loading")
+        try:
+            timings = warm_model(crop, self.policy["warmup_runs"], self.policy["pin"])
+        except Exception as e:
+            self._set(crop, state="failed", error=f"{type(e).__name__}: {e}")
+        else:
+            self._set(crop, state="ready", **timings)
+
+    def _run(self):
+        try:
+            with ThreadPoolExecutor(
+                max_workers=self.policy["concurrency"],
+                thread_name_prefix="preload",
+            ) as pool:
+                list(pool.map(self._warm, self._crops))
+        finally:
+            self.finished_at = time.time()
+            self._done.set()
+
+    def ready(self) -> bool:
+        """
+        True once preloading has finished, or at once if readiness is not
+        gated on it. Failed crops do not hold readiness back; they load on
+        their first request instead.
+        """
+        return self.done or not self.policy["gate_readiness"]
+
+    def stats(self) -> dict:
+        with self._lock:
+            crops = {crop: dict(state) for crop, state in self._crops.items()}
+
+        finished = sum(1 for s in crops.values() if s["state"] in {"ready", "failed", "worker"})
+        end = self.finished_at or time.time()
+        return {
+            "policy": self.policy,
+            "done": self.done,
+            "progress": f"{finished}/{len(crops)}",
+            "seconds": round(end - self.started_at, 3) if self.started_at else None,
+            "crops": crops,
+        }
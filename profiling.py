@@ -0,0 +1,348 @@
+"""
+Opt-in sampling profiler for live traffic.
+
+A session samples every thread's Python stack (sys._current_frames) on a
+background thread and writes the counts as folded stacks, the input
+format of flamegraph.pl, speedscope and inferno:
+
+    profiles/<time>-<pid>.folded
+
+A session covers either a time window or a random `fraction` of
+/predict requests; in the latter case stacks are only sampled while a
+selected request is in flight. With `torch_trace`, forward passes run
+during the session are also recorded with torch.profiler, as Chrome
+traces plus folded operator stacks:
+
+    profiles/<time>-<pid>-forward-<n>-<crop>.json / .folded
+
+Sessions are started from the environment (PROFILE_SECONDS /
+PROFILE_FRACTION) or through the /admin/profile endpoints. With no
+session running, the request and forward-pass hooks are a single
+attribute check.
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+PROFILE_MAX_TRACES = int(os.getenv("PROFILE_MAX_TRACES", "20"))
+
+# Start a session when the app starts
+PROFILE_SECONDS = float(os.getenv("PROFILE_SECONDS", "0"))
+PROFILE_FRACTION = float(os.getenv("PROFILE_FRACTION", "0"))
+PROFILE_TORCH = os.getenv("PROFILE_TORCH", "0").lower() in {"1", "true", "yes"}
+
+# The admin endpoints are disabled (404) unless this is set
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+
+_NULL = nullcontext()
+
+
+# -------------------------------------------------
+# STACK SAMPLER
+# -------------------------------------------------
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def fold_stack(frame, thread_name: str) -> str:
+    """
+    One stack as "thread;outer;...;inner", root first.
+    """
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """
+    Counts the Python stacks of all other threads every `interval`
+    seconds while `gate()` returns True.
+    """
+
+    def __init__(self, interval: float, gate=None):
+        self.interval = interval
+        self.gate = gate or (lambda: True)
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if not self.gate():
+                continue
+
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self.stacks[fold_stack(frame, names.get(ident, str(ident)))] += 1
+            self.samples += 1
+
+    def write(self, path: str):
+        write_folded(self.stacks, path)
+
+
+def fold_torch_events(events) -> Counter:
+    """
+    torch.profiler events as folded operator stacks, weighted by self
+    CPU time in microseconds.
+    """
+    stacks = Counter()
+    for event in events:
+        weight = int(event.self_cpu_time_total)
+        if weight <= 0:
+            continue
+
+        names = []
+        node = event
+        while node is not None:
+            names.append(node.name)
+            node = node.cpu_parent
+        stacks[";".join(reversed(names))] += weight
+    return stacks
+
+
+def write_folded(stacks: Counter, path: str):
+    with open(path, "w") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+# -------------------------------------------------
+# SESSIONS
+# -------------------------------------------------
+
+class Profiler:
+    """
+    At most one profiling session per process.
+    """
+
+    def __init__(self, output_dir: str = PROFILE_DIR, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.output_dir = output_dir
+        self.interval = interval_ms / 1000.0
+        self.active = False
+
+        self._lock = threading.Lock()
+        self._session = None
+        self._sampler = None
+        self._timer = None
+        self._selected = 0
+        self._traces = 0
+        self._tracing = False  # torch.profiler allows one recording at a time
+        self._last = None
+
+    def start(
+        self,
+        seconds: float | None = None,
+        fraction: float = 1.0,
+        torch_trace: bool = False,
+        max_traces: int = PROFILE_MAX_TRACES,
+    ) -> dict:
+        """
+        Starts a session; it ends after `seconds`, or at stop() if None.
+        Raises RuntimeError if one is already running.
+        """
+        if seconds is not None and seconds <= 0:
+            raise ValueError("seconds must be positive")
+        if not 0.0 < fraction <= 1.0:
+            raise ValueError("fraction must be in (0, 1]")
+
+        with self._lock:
+            if self.active:
+                raise RuntimeError("A profiling session is already running")
+
+            os.makedirs(self.output_dir, exist_ok=True)
+            self._session = {
+                "id": f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}",
+                "started_at": time.time(),
+                "seconds": seconds,
+                "fraction": fraction,
+                "torch_trace": torch_trace,
+                "max_traces": max_traces,
+                "requests": 0,
+                "sampled_requests": 0,
+                "files": [],
+            }
+            self._selected = 0
+            self._traces = 0
+
+            # A time window samples everything; a fraction only while a
+            # selected request is in flight.
+            gate = None if fraction >= 1.0 else (lambda: self._selected > 0)
+            self._sampler = StackSampler(self.interval, gate)
+            self._sampler.start()
+
+            if seconds is not None:
+                self._timer = threading.Timer(seconds, self.stop)
+                self._timer.daemon = True
+                self._timer.start()
+
+            self.active = True
+            return self.status()
+
+    def stop(self) -> dict | None:
+        """
+        Ends the session and writes its folded stacks. Returns the session
+        summary, or None if none was running.
+        """
+        with self._lock:
+            if not self.active:
+                return None
+            self.active = False
+
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            sampler, self._sampler = self._sampler, None
+            session, self._session = self._session, None
+
+        sampler.stop()
+        path = os.path.join(self.output_dir, f"{session['id']}.folded")
+        sampler.write(path)
+
+        session["files"].insert(0, path)
+        session["samples"] = sampler.samples
+        session["duration_s"] = round(time.time() - session["started_at"], 3)
+        self._last = session
+        return session
+
+    def status(self) -> dict:
+        session = self._session
+        return {
+            "active": self.active,
+            "output_dir": self.output_dir,
+            "session": dict(session) if session is not None else None,
+            "last_session": self._last,
+        }
+
+    # -- hooks ------------------------------------------------------------
+
+    @contextmanager
+    def _sampled_request(self):
+        with self._lock:
+            self._selected += 1
+            if self._session is not None:
+                self._session["sampled_requests"] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._selected -= 1
+
+    def request(self):
+        """
+        Context manager around one /predict request; picks the request
+        for sampling with the session's fraction.
+        """
+        session = self._session
+        if not self.active or session is None:
+            return _NULL
+
+        session["requests"] += 1
+        if session["fraction"] < 1.0 and random.random() >= session["fraction"]:
+            return _NULL
+        return self._sampled_request()
+
+    def forward(self, label: str):
+        """
+        Context manager around one forward pass; records it with
+        torch.profiler when the session asks for traces. Forward passes
+        that start while another is being recorded are not traced.
+        """
+        session = self._session
+        if not self.active or session is None or not session["torch_trace"]:
+            return _NULL
+        if session["fraction"] < 1.0 and self._selected == 0:
+            return _NULL
+
+        with self._lock:
+            if self._tracing or self._traces >= session["max_traces"]:
+                return _NULL
+            self._tracing = True
+            self._traces += 1
+            index = self._traces
+
+        return self._torch_trace(session, index, label)
+
+    @contextmanager
+    def _torch_trace(self, session: dict, index: int, label: str):
+        import torch
+        from torch.profiler import ProfilerActivity, profile
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+
+        try:
+            with profile(activities=activities) as prof:
+                yield
+        finally:
+            with self._lock:
+                self._tracing = False
+
+        base = os.path.join(self.output_dir, f"{session['id']}-forward-{index}-{label}")
+        prof.export_chrome_trace(f"{base}.json")
+        write_folded(fold_torch_events(prof.events()), f"{base}.folded")
+        session["files"].extend([f"{base}.json", f"{base}.folded"])
+
+
+profiler = Profiler()
+
+
+def start_from_env() -> dict | None:
+    """
+    Starts the session configured by PROFILE_SECONDS / PROFILE_FRACTION,
+    if any.
+    """
+    if PROFILE_SECONDS <= 0 and PROFILE_FRACTION <= 0:
+        return None
+
+    return profiler.start(
+        seconds=PROFILE_SECONDS or None,
+        fraction=PROFILE_FRACTION or 1.0,
+        torch_trace=PROFILE_TORCH,
+    )
+
+
+# -------------------------------------------------
+# MIDDLEWARE
+# -------------------------------------------------
+
+class ProfilingMiddleware:
+    """
+    Offers each /predict request to the running profiling session.
+    """
+
+    def __init__(self, app, prefix: str = "/predict"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if not profiler.active or scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        with profiler.request():
+            await self.app(scope, receive, send)
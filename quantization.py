@@ -0,0 +1,359 @@
+"""
+Builds reduced-precision ONNX variants of the crop models and reports
+latency, memory and agreement against the FP32 PyTorch model.
+
+Usage:
+    python quantization.py
+    python quantization.py --crops tomato --precisions int8-static --calibration calib --evaluation test
+
+int8-static needs calibration images. When --calibration and --evaluation
+name the same folder, its images are split between the two (alternating,
+by file name) so the agreement numbers are not measured on the images
+the quantizer was tuned on. Variants are rebuilt only with --force, so pass
+it after changing the calibration images.
+
+Variants are written next to the weights as ./models/{crop}.{precision}.onnx
+and served by setting MODEL_BACKEND=onnx and e.g.
+MODEL_PRECISION="tomato=int8-static,chilli=fp16".
+"""
+
+import argparse
+import ast
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+import onnx
+import psutil
+from onnxruntime import InferenceSession
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    QuantFormat,
+    QuantType,
+    quant_pre_process,
+    quantize_dynamic,
+    quantize_static,
+)
+from onnxruntime.transformers.float16 import convert_float_to_float16
+
+from model_core import (
+    SUPPORTED_CROPS,
+    SUPPORTED_PRECISIONS,
+    artifact_path,
+    compare_outputs,
+    export_model,
+    extract_output,
+    get_model,
+    load_image,
+    model_key,
+    model_registry,
+)
+
+QUANTIZED_PRECISIONS = sorted(SUPPORTED_PRECISIONS - {"fp32"})
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def list_images(folder: str) -> list[str]:
+    return sorted(
+        os.path.join(folder, name)
+        for name in os.listdir(folder)
+        if name.lower().endswith(IMAGE_SUFFIXES)
+    )
+
+
+def split_images(calibration_dir: str, evaluation_dir: str) -> tuple[list[str], list[str], bool]:
+    """
+    Returns (calibration paths, evaluation paths, held_out). Distinct
+    folders are used as they are; a shared folder is split alternately,
+    unless it holds a single image, which then has to serve both
+    (held_out False).
+    """
+    calibration = list_images(calibration_dir)
+    if os.path.abspath(calibration_dir) != os.path.abspath(evaluation_dir):
+        evaluation = list_images(evaluation_dir)
+        return calibration, evaluation, not set(calibration) & set(evaluation)
+
+    if len(calibration) < 2:
+        return calibration, calibration, False
+    return calibration[0::2], calibration[1::2], True
+
+
+# -------------------------------------------------
+# CALIBRATION DATA
+# -------------------------------------------------
+
+def _preprocess(image, imgsz: tuple[int, int], task: str) -> np.ndarray:
+    """
+    Approximates the ultralytics input pipeline: letterbox for detection,
+    short-side resize + centre crop for classification.
+    """
+    h, w = image.shape[:2]
+    th, tw = imgsz
+
+    if task == "classify":
+        scale = max(th / h, tw / w)
+        resized = cv2.resize(image, (round(w * scale), round(h * scale)))
+        top = (resized.shape[0] - th) // 2
+        left = (resized.shape[1] - tw) // 2
+        canvas = resized[top:top + th, left:left + tw]
+    else:
+        scale = min(th / h, tw / w)
+        nh, nw = round(h * scale), round(w * scale)
+        canvas = np.full((th, tw, 3), 114, dtype=np.uint8)
+        top, left = (th - nh) // 2, (tw - nw) // 2
+        canvas[top:top + nh, left:left + nw] = cv2.resize(image, (nw, nh))
+
+    rgb = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB)
+    return np.ascontiguousarray(rgb.transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+class ImageFolderReader(CalibrationDataReader):
+    """
+    Feeds a folder of images to onnxruntime's static quantization.
+    """
+
+    def __init__(self, model_path: str, image_paths: list[str]):
+        session = InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        self.input_name = session.get_inputs()[0].name
+
+        metadata = session.get_modelmeta().custom_metadata_map
+        imgsz = ast.literal_eval(metadata.get("imgsz", "[640, 640]"))
+        self.imgsz = tuple(imgsz) if isinstance(imgsz, (list, tuple)) else (imgsz, imgsz)
+        self.task = metadata.get("task", "detect")
+
+        self._paths = iter(image_paths)
+
+    def get_next(self):
+        path = next(self._paths, None)
+        if path is None:
+            return None
+        return {self.input_name: _preprocess(load_image(path), self.imgsz, self.task)}
+
+
+# -------------------------------------------------
+# QUANTIZATION
+# -------------------------------------------------
+
+def _copy_metadata(source_path: str, target_path: str):
+    """
+    ultralytics reads names / stride / imgsz from the ONNX metadata, which
+    the quantizers do not carry over.
+    """
+    source = onnx.load(source_path)
+    target = onnx.load(target_path)
+
+    del target.metadata_props[:]
+    for prop in source.metadata_props:
+        target.metadata_props.add(key=prop.key, value=prop.value)
+
+    onnx.save(target, target_path)
+
+
+def quantize_model(
+    crop: str,
+    precision: str,
+    calibration: str | list[str] = "test",
+    force: bool = False,
+) -> str:
+    """
+    Builds one reduced-precision variant from the crop's FP32 ONNX export.
+    `calibration` is a folder or a list of image paths (int8-static only).
+    """
+    crop = crop.lower()
+    if precision not in QUANTIZED_PRECISIONS:
+        raise ValueError(f"Unsupported precision: {precision}")
+
+    source = export_model(crop, "onnx")
+    target = artifact_path(crop, "onnx", precision)
+
+    if os.path.exists(target) and not force and os.path.getmtime(target) >= os.path.getmtime(source):
+        return target
+
+    if precision == "fp16":
+        model = convert_float_to_float16(onnx.load(source), keep_io_types=True)
+        onnx.save(model, target)
+
+    elif precision == "int8-dynamic":
+        quantize_dynamic(source, target, weight_type=QuantType.QInt8)
+
+    elif precision == "int8-static":
+        images = list_images(calibration) if isinstance(calibration, str) else calibration
+        if not images:
+            raise ValueError(f"No calibration images in {calibration}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            prepared = os.path.join(tmp, "prepared.onnx")
+            quant_pre_process(source, prepared, skip_symbolic_shape=True)
+            quantize_static(
+                prepared,
+                target,
+                ImageFolderReader(source, images),
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+                per_channel=True,
+            )
+
+    _copy_metadata(source, target)
+    return target
+
+
+# -------------------------------------------------
+# REPORT
+# -------------------------------------------------
+
+def _rss_mb() -> float:
+    return psutil.Process().memory_info().rss / 1e6
+
+
+def measure_variant(
+    crop: str,
+    backend: str,
+    precision: str,
+    images: list,
+    reference: list[dict] | None,
+    threshold: float,
+    runs: int,
+) -> tuple[dict, list[dict]]:
+    """
+    Loads one variant, times it over `images` and compares its outputs
+    with `reference` (None when measuring the reference itself).
+    """
+    model_registry.evict(model_key(crop, backend, precision))
+    gc.collect()
+
+    rss_before = _rss_mb()
+    model = get_model(crop, backend, precision)
+    model(images[0], verbose=False)  # first call initialises the runtime
+    rss_after = _rss_mb()
+
+    latencies = []
+    outputs = []
+    for image in images:
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = model(image, verbose=False)[0]
+            latencies.append((time.perf_counter() - start) * 1000.0)
+        outputs.append(extract_output(crop, result, threshold))
+
+    artifact = export_model(crop, backend, precision)
+    row = {
+        "crop": crop,
+        "backend": backend,
+        "precision": precision,
+        "artifact": artifact,
+        "size_mb": round(_artifact_size(artifact) / 1e6, 2),
+        "load_rss_mb": round(rss_after - rss_before, 1),
+        "latency_ms_p50": round(statistics.median(latencies), 2),
+        "latency_ms_mean": round(statistics.fmean(latencies), 2),
+    }
+
+    if reference is not None:
+        reports = [compare_outputs(ref, out) for ref, out in zip(reference, outputs)]
+        ref_boxes = sum(r["boxes_reference"] for r in reports)
+        row.update({
+            "agreement": round(sum(r["ok"] for r in reports) / len(reports), 3),
+            "box_recall": round(sum(r["boxes_matched"] for r in reports) / ref_boxes, 3) if ref_boxes else None,
+            "top1_agreement": round(sum(r["top1_match"] for r in reports) / len(reports), 3),
+            "max_conf_delta": round(max(r["max_conf_delta"] for r in reports), 4),
+        })
+
+    return row, outputs
+
+
+def _artifact_size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(path)
+            for name in names
+        )
+    return os.path.getsize(path)
+
+
+def write_markdown(rows: list[dict], path: str, note: str = ""):
+    columns = [
+        "crop", "backend", "precision", "size_mb", "load_rss_mb",
+        "latency_ms_p50", "speedup", "agreement", "box_recall", "top1_agreement",
+    ]
+    lines = [
+        "| " + " | ".join(columns) + " |",
+        "|" + "---|" * len(columns),
+    ]
+    for row in rows:
+        lines.append("| " + " | ".join(
+            "" if row.get(c) is None else str(row.get(c, "")) for c in columns
+        ) + " |")
+
+    if note:
+        lines += ["", note]
+
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--crops", nargs="*", default=sorted(SUPPORTED_CROPS))
+    parser.add_argument("--precisions", nargs="*", default=QUANTIZED_PRECISIONS, choices=QUANTIZED_PRECISIONS)
+    parser.add_argument("--calibration", default="test", help="Folder of int8-static calibration images")
+    parser.add_argument("--evaluation", default="test", help="Folder of images to measure on")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per image")
+    parser.add_argument("--report", default="quantization_report", help="Report path without extension")
+    parser.add_argument("--force", action="store_true", help="Rebuild existing variants")
+    args = parser.parse_args(argv)
+
+    calibration, evaluation, held_out = split_images(args.calibration, args.evaluation)
+    images = [load_image(p) for p in evaluation]
+    if not images:
+        print(f"No images in {args.evaluation}", file=sys.stderr)
+        return 1
+
+    note = (
+        f"Measured on {len(evaluation)} evaluation images; int8-static was "
+        f"calibrated on {len(calibration)} other images."
+        if held_out else
+        "Warning: int8-static was calibrated on the same images it is "
+        "measured on, so its agreement numbers are biased upward."
+    )
+    print(note)
+
+    rows = []
+    for crop in args.crops:
+        for precision in args.precisions:
+            path = quantize_model(crop, precision, calibration, args.force)
+            print(f"{crop} {precision}: {path}")
+
+        baseline, reference = measure_variant(
+            crop, "torch", "fp32", images, None, args.threshold, args.runs,
+        )
+        baseline["speedup"] = 1.0
+        rows.append(baseline)
+
+        for precision in ["fp32"] + args.precisions:
+            row, _ = measure_variant(
+                crop, "onnx", precision, images, reference, args.threshold, args.runs,
+            )
+            row["speedup"] = round(baseline["latency_ms_p50"] / row["latency_ms_p50"], 2)
+            row["evaluation_images"] = len(evaluation)
+            row["calibration_held_out"] = held_out
+            rows.append(row)
+            print(json.dumps(row))
+
+    with open(f"{args.report}.json", "w") as f:
+        json.dump(rows, f, indent=2)
+    write_markdown(rows, f"{args.report}.md", note)
+    print(f"Report written to {args.report}.json / {args.report}.md")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,457 @@
+"""
+Headless field-recorder engine.
+
+Reads frames from a camera index, a video file or a stream URL, runs
+them through model_core, and logs diseased detections with the GPS fix.
+It runs the capture / gate / inference pipeline from
+recorder_pipeline.py. The PyQt6 window (main_.py) is a thin client that
+adds a render stage; with no display it runs on its own:
+
+    python recorder.py --crop tomato --source 0
+    python recorder.py --crop chilli --source field.mp4 --target-fps 5 --report run.json
+    python recorder.py --crop rose --source rtsp://127.0.0.1:8554/cam --gate diff
+
+A video file is read at its own frame rate, or at --target-fps, as if it
+were a live camera. Frames that inference cannot keep up with are
+dropped the same way, so a recorded video gives the same numbers offline
+as the field would.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from detection_log import DetectionLog, open_sinks
+from gps import NO_FIX, GpsReceiver, open_source
+from recorder_pipeline import ChangeGate, LatestQueue, LatestValue, Stage, StageStats, format_stats
+
+RECORDER_SOURCE = os.getenv("RECORDER_SOURCE", "0")
+RECORDER_TARGET_FPS = float(os.getenv("RECORDER_TARGET_FPS", "0"))
+
+# Depth of the capture -> render / capture -> inference queues. Older frames
+# are dropped when a stage falls behind, so 1 keeps latency lowest.
+PIPELINE_QUEUE_SIZE = int(os.getenv("RECORDER_QUEUE_SIZE", "1"))
+
+# Adaptive inference: "off" runs the model on every frame it can get,
+# "diff" / "hash" only on frames that changed (see ChangeGate), reusing
+# the last detections for the rest.
+GATE_MODE = os.getenv("RECORDER_GATE", "off")
+GATE_THRESHOLD = float(os.getenv("RECORDER_GATE_THRESHOLD", "0")) or None
+GATE_MAX_STALENESS = float(os.getenv("RECORDER_MAX_STALENESS", "2.0"))
+GATE_EVERY_N = int(os.getenv("RECORDER_EVERY_N", "30"))
+
+HEALTHY_DEFS = {'tomato': ['healthy'], 'cotton': ['Healthy Leaf'],
+                'rose': ['Healthy', 'rose'], 'chilli': ['Healthy Chilies', 'Healthy Leaves'],
+                'turmeric': ['healthy_leaf']}
+
+# Seconds between two logged detections
+SAVE_COOLDOWN = 2.0
+
+
+def make_gate(adaptive: bool, mode: str = GATE_MODE) -> ChangeGate:
+    mode = (mode if mode != "off" else "diff") if adaptive else "off"
+    return ChangeGate(mode, GATE_THRESHOLD, GATE_MAX_STALENESS, GATE_EVERY_N)
+
+
+# -------------------------------------------------
+# SOURCES
+# -------------------------------------------------
+
+def is_live(source: str) -> bool:
+    """
+    Camera indexes and stream URLs are live; anything else is a file.
+    """
+    return source.isdigit() or "://" in source
+
+
+def open_capture(source: str) -> cv2.VideoCapture:
+    cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video source {source!r}")
+    if is_live(source):
+        # Keep the driver from buffering frames we would only read late
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+# -------------------------------------------------
+# DETECTIONS
+# -------------------------------------------------
+
+def detected_diseases(output: dict) -> list[str]:
+    """
+    Distinct class names in a model_core output (boxes and
+    classification), which is already thresholded.
+    """
+    names = [box["class"] for box in output["boxes"]]
+    names += [item["class"] for item in output["classification"]]
+    return list(dict.fromkeys(names))
+
+
+def draw_output(frame, output: dict):
+    """
+    Draws a model_core output on a copy of `frame`: boxes with labels for
+    detection models, the top classes in the corner for classifiers.
+    """
+    annotated = frame.copy()
+    for box in output["boxes"]:
+        x1, y1, x2, y2 = (int(v) for v in box["bbox"])
+        label = f"{box['class']} {box['confidence']:.2f}"
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 200, 0), 2)
+        cv2.putText(annotated, label, (x1, max(y1 - 6, 12)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 200, 0), 1, cv2.LINE_AA)
+
+    ranked = sorted(output["classification"], key=lambda item: item["confidence"], reverse=True)
+    for i, item in enumerate(ranked[:5]):
+        label = f"{item['class']} {item['confidence']:.2f}"
+        cv2.putText(annotated, label, (10, 25 + 22 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 200, 0), 2, cv2.LINE_AA)
+    return annotated
+
+
+# -------------------------------------------------
+# ENGINE
+# -------------------------------------------------
+
+class RecorderEngine:
+    """
+    One recording session.
+
+    The engine runs capture, an optional change gate and inference on its
+    own threads. With `display=True` it also feeds every captured frame
+    to `display_queue`, for a client that draws them with annotate() and
+    reports its timing in `render_stats`. Without a display, no frame is
+    ever converted or drawn.
+
+    `target_fps` caps the rate frames enter the pipeline. A live source
+    is still read at full rate so the newest frame is always the one
+    used. A video file is paced at `target_fps`, or at its own frame rate
+    if that is 0.
+    """
+
+    def __init__(
+        self,
+        crop: str,
+        source: str = RECORDER_SOURCE,
+        threshold: float = 0.5,
+        backend: str | None = None,
+        gate: ChangeGate | None = None,
+        detection_log: DetectionLog | None = None,
+        gps: GpsReceiver | None = None,
+        target_fps: float = RECORDER_TARGET_FPS,
+        display: bool = False,
+    ):
+        self.crop = crop.lower()
+        self.source = str(source)
+        self.threshold = threshold
+        self.backend = backend
+        self.gate = gate or ChangeGate("off")
+        self.detection_log = detection_log
+        self.gps = gps
+        self.target_fps = target_fps
+        self.display = display
+
+        self.healthy_keys = HEALTHY_DEFS.get(self.crop, ['healthy'])
+        self.save_cooldown = SAVE_COOLDOWN
+        self.last_save_time = 0
+        self.logged = 0
+
+        self.cap = None
+        self.live = is_live(self.source)
+        self.frame_interval = 0.0
+        self.frame_index = 0
+        self.started_at = None
+        self.finished_at = None
+
+        self.display_queue = LatestQueue(PIPELINE_QUEUE_SIZE) if display else None
+        self.gate_queue = LatestQueue(PIPELINE_QUEUE_SIZE)
+        self.infer_queue = LatestQueue(PIPELINE_QUEUE_SIZE)
+        self.latest = LatestValue()
+        self.render_stats = StageStats("render")
+        self.stages = []
+
+        self._next_frame_at = 0.0
+        self._stopping = threading.Event()
+
+    # -- lifecycle -----------------------------------------------------
+
+    def load(self) -> dict:
+        """
+        Loads the crop's model and runs one dummy frame through it, so the
+        first camera frame does not pay for building the predictor.
+        """
+        from model_core import get_model, model_input_size, run_inference
+
+        start = time.perf_counter()
+        get_model(self.crop, self.backend)
+        load_seconds = time.perf_counter() - start
+
+        size = model_input_size(self.crop, self.backend)
+        start = time.perf_counter()
+        run_inference(self.crop, np.zeros((size, size, 3), dtype=np.uint8), self.threshold, self.backend)
+        return {
+            "load_seconds": round(load_seconds, 3),
+            "warmup_seconds": round(time.perf_counter() - start, 3),
+        }
+
+    def start(self):
+        self.cap = open_capture(self.source)
+
+        fps = self.target_fps
+        if not fps and not self.live:
+            fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_interval = 1.0 / fps if fps > 0 else 0.0
+
+        sinks = [self.display_queue] if self.display else []
+        if self.gate.mode == "off":
+            self.stages = [
+                Stage("capture", self.capture, sinks=sinks + [self.infer_queue]),
+            ]
+        else:
+            self.stages = [
+                Stage("capture", self.capture, sinks=sinks + [self.gate_queue]),
+                Stage("gate", self.gate_frame, source=self.gate_queue, sinks=[self.infer_queue]),
+            ]
+        self.stages.append(Stage("infer", self.infer, source=self.infer_queue))
+
+        self.started_at = time.perf_counter()
+        self._next_frame_at = self.started_at
+        for stage in self.stages:
+            stage.start()
+
+    @property
+    def running(self) -> bool:
+        return any(stage.is_alive() for stage in self.stages)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Waits for the pipeline to finish (end of a video file). Returns
+        False if it is still running after `timeout`.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for stage in self.stages:
+            stage.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return not self.running
+
+    def stop(self):
+        self._stopping.set()
+        for stage in self.stages:
+            stage.stop()
+        for stage in self.stages:
+            stage.join()
+        if self.display_queue is not None:
+            self.display_queue.close()
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        if self.finished_at is None:
+            self.finished_at = time.perf_counter()
+
+    # -- stages --------------------------------------------------------
+
+    def _due(self) -> bool:
+        """
+        True if the next frame may enter the pipeline under target_fps.
+        """
+        if not self.frame_interval:
+            return True
+
+        now = time.perf_counter()
+        if now < self._next_frame_at:
+            return False
+        # Do not burst to catch up after a stall
+        self._next_frame_at = max(self._next_frame_at + self.frame_interval, now)
+        return True
+
+    def capture(self):
+        while not self._stopping.is_set():
+            if self.live:
+                # Grab every frame so the buffer never goes stale, but only
+                # decode the ones that are due
+                if not self.cap.grab():
+                    if self.source.isdigit():
+                        time.sleep(0.01)
+                        continue
+                    break
+                if not self._due():
+                    continue
+                ret, frame = self.cap.retrieve()
+            else:
+                delay = self._next_frame_at - time.perf_counter()
+                if self.frame_interval and delay > 0:
+                    time.sleep(delay)
+                self._due()
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+
+            if ret:
+                self.frame_index += 1
+                return {"frame": frame, "index": self.frame_index, "t": time.perf_counter()}
+
+        self.finished_at = time.perf_counter()
+        return None
+
+    def gate_frame(self, packet):
+        if self.gate.check(packet["frame"], packet["t"]) is None:
+            return None
+        return packet
+
+    def infer(self, packet):
+        from model_core import run_inference
+
+        output = run_inference(self.crop, packet["frame"], self.threshold, self.backend)
+        diseases = detected_diseases(output)
+        self.latest.set({"output": output, "diseases": diseases, "index": packet["index"]})
+        self.log_detections(diseases)
+
+    def gps_fix(self) -> dict:
+        return self.gps.fix() if self.gps else NO_FIX
+
+    def log_detections(self, diseases):
+        current_time = time.time()
+        if not diseases or current_time - self.last_save_time <= self.save_cooldown:
+            return
+
+        for disease in diseases:
+            if disease not in self.healthy_keys:
+                fix = self.gps_fix()
+                if self.detection_log is not None:
+                    # Queued only; the log's writer thread does the disk I/O
+                    self.detection_log.log(self.crop, disease, fix["satellites"], fix["lat"], fix["lon"])
+                self.last_save_time = current_time
+                self.logged += 1
+                print(f"Logged: {disease}")
+
+    def annotate(self, packet):
+        """
+        The packet's frame with the newest detections drawn on it.
+        """
+        latest = self.latest.get()
+        return draw_output(packet["frame"], latest["output"]) if latest else packet["frame"]
+
+    # -- reporting -----------------------------------------------------
+
+    def stats(self) -> list[dict]:
+        stats = []
+        for stage in self.stages:
+            snapshot = stage.snapshot()
+            if stage.name == "gate":
+                snapshot["skipped"] = self.gate.stats()["skipped"]
+            stats.append(snapshot)
+        if self.display:
+            stats.append(self.render_stats.snapshot(self.display_queue.dropped))
+        return stats
+
+    def summary(self) -> dict:
+        """
+        Totals for the whole session.
+        """
+        end = self.finished_at or time.perf_counter()
+        seconds = end - self.started_at if self.started_at else 0.0
+        counts = {stage.name: stage.stats.count for stage in self.stages}
+        return {
+            "crop": self.crop,
+            "source": self.source,
+            "target_fps": round(1.0 / self.frame_interval, 2) if self.frame_interval else None,
+            "seconds": round(seconds, 3),
+            "frames": self.frame_index,
+            "inferences": counts.get("infer", 0),
+            "capture_fps": round(self.frame_index / seconds, 2) if seconds else 0.0,
+            "inference_fps": round(counts.get("infer", 0) / seconds, 2) if seconds else 0.0,
+            "dropped_before_inference": self.infer_queue.dropped,
+            "gate": self.gate.stats(),
+            "logged": self.logged,
+            "errors": {stage.name: repr(stage.error) for stage in self.stages if stage.error},
+        }
+
+
+# -------------------------------------------------
+# COMMAND LINE
+# -------------------------------------------------
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--crop", required=True)
+    parser.add_argument("--source", default=RECORDER_SOURCE, help="Camera index, video file or stream URL")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--backend", default=None)
+    parser.add_argument("--target-fps", type=float, default=RECORDER_TARGET_FPS,
+                        help="Frames per second fed to the pipeline; 0 = camera / file rate")
+    parser.add_argument("--gate", choices=["off", "diff", "hash"], default=GATE_MODE)
+    parser.add_argument("--log", default=None, help="Detection log sinks (default: DETECTION_LOG)")
+    parser.add_argument("--no-log", action="store_true", help="Do not write a detection log")
+    parser.add_argument("--gps-port", default=None, help="Serial port of the GPS receiver")
+    parser.add_argument("--gps-replay", default=None, help="Recorded NMEA log to replay as the GPS")
+    parser.add_argument("--duration", type=float, default=0, help="Stop after this many seconds")
+    parser.add_argument("--stats-interval", type=float, default=5.0)
+    parser.add_argument("--report", help="Write a JSON session report here")
+    args = parser.parse_args(argv)
+
+    detection_log = None if args.no_log else DetectionLog(open_sinks(args.log) if args.log else open_sinks())
+    gps = None
+    engine = None
+    stages = []
+
+    # Everything after the log is opened runs under the finally, so a
+    # model that fails to load still stops the GPS thread and flushes
+    # and closes the log
+    try:
+        if args.gps_replay or args.gps_port:
+            gps = GpsReceiver(open_source(not args.gps_port, args.gps_port, args.gps_replay))
+            gps.start()
+
+        engine = RecorderEngine(
+            args.crop,
+            source=args.source,
+            threshold=args.threshold,
+            backend=args.backend,
+            gate=make_gate(args.gate != "off", args.gate),
+            detection_log=detection_log,
+            gps=gps,
+            target_fps=args.target_fps,
+        )
+        load = engine.load()
+        print(f"Model ready: {json.dumps(load)}", file=sys.stderr)
+
+        engine.start()
+        deadline = time.monotonic() + args.duration if args.duration else None
+        while True:
+            timeout = args.stats_interval
+            if deadline is not None:
+                timeout = min(timeout, max(0.0, deadline - time.monotonic()))
+            done = engine.wait(timeout)
+            stages = engine.stats()
+            if done or (deadline is not None and time.monotonic() >= deadline):
+                break
+            print(format_stats(stages), file=sys.stderr)
+    except KeyboardInterrupt:
+        if engine is None or engine.started_at is None:
+            raise
+        stages = engine.stats()
+    finally:
+        if engine is not None:
+            engine.stop()
+        if gps is not None:
+            gps.stop()
+        if detection_log is not None:
+            detection_log.close()
+
+    report = {"load": load, **engine.summary(), "stages": stages}
+    if detection_log is not None:
+        report["detection_log"] = detection_log.stats()
+
+    text = json.dumps(report, indent=2)
+    if args.report:
+        with open(args.report, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
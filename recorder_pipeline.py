@@ -0,0 +1,364 @@
+"""
+Building blocks for the field recorder's frame pipeline (recorder.py).
+
+Capture, inference and render run as separate stages joined by small
+bounded queues. A full queue drops its oldest item rather than blocking
+the producer ("latest frame wins"), so a slow stage never stalls a fast
+one and never works through a backlog of stale frames:
+
+    capture ──> [display queue] ──> render    (camera rate)
+            └─> [infer queue]   ──> inference (as fast as the CPU allows)
+
+Each stage records its own throughput and per-item latency in a
+StageStats. A ChangeGate can sit in front of inference and pass on only
+frames that differ from the last one inferred; the renderer keeps
+drawing the last detections in the meantime.
+"""
+
+import threading
+import time
+from collections import Counter, deque
+
+import cv2
+import numpy as np
+
+
+# -------------------------------------------------
+# QUEUES
+# -------------------------------------------------
+
+class LatestQueue:
+    """
+    Bounded queue whose put() never blocks: when full, the oldest item is
+    dropped (and counted) to make room. get() returns None on timeout or
+    once the queue is closed and empty.
+    """
+
+    def __init__(self, maxsize: int = 1):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.dropped = 0
+
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item):
+        with self._cond:
+            if self._closed:
+                return
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout: float | None = None):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                return None
+            return self._items.popleft() if self._items else None
+
+    def close(self):
+        """
+        Wakes every waiting get(); later puts are ignored.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class LatestValue:
+    """
+    Holds the most recent value a stage produced, for readers that want
+    "whatever is newest" rather than every item (e.g. the renderer
+    overlaying the last detections on each camera frame).
+    """
+
+    def __init__(self, value=None):
+        self._value = value
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        with self._lock:
+            self._value = value
+
+    def get(self):
+        with self._lock:
+            return self._value
+
+
+# -------------------------------------------------
+# STATS
+# -------------------------------------------------
+
+class StageStats:
+    """
+    Sliding-window throughput and latency of one stage. record() is called
+    once per item with the time the stage spent on it.
+    """
+
+    def __init__(self, name: str, window: float = 2.0):
+        self.name = name
+        self.window = window
+        self.count = 0
+
+        self._samples = deque()  # (finished_at, seconds)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, now: float | None = None):
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            self.count += 1
+            self._samples.append((now, seconds))
+            self._trim(now)
+
+    def _trim(self, now: float):
+        while self._samples and now - self._samples[0][0] > self.window:
+            self._samples.popleft()
+
+    def snapshot(self, dropped: int | None = None) -> dict:
+        now = time.perf_counter()
+        with self._lock:
+            self._trim(now)
+            samples = list(self._samples)
+
+        if samples:
+            span = max(now - samples[0][0], 1e-6)
+            fps = len(samples) / min(span, self.window) if len(samples) > 1 else 0.0
+            latencies = sorted(seconds for _, seconds in samples)
+            latency_ms = sum(latencies) / len(latencies) * 1000.0
+            p95_ms = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000.0
+        else:
+            fps = latency_ms = p95_ms = 0.0
+
+        snapshot = {
+            "stage": self.name,
+            "fps": round(fps, 1),
+            "latency_ms": round(latency_ms, 1),
+            "p95_ms": round(p95_ms, 1),
+            "count": self.count,
+        }
+        if dropped is not None:
+            snapshot["dropped"] = dropped
+        return snapshot
+
+
+def format_stats(stats: list[dict]) -> str:
+    """
+    One line per stage, e.g. "infer    4.2 fps  231 ms  (12 dropped)".
+    """
+    lines = []
+    for s in stats:
+        line = f"{s['stage']:<8}{s['fps']:>5.1f} fps {s['latency_ms']:>5.0f} ms"
+        if s.get("dropped"):
+            line += f"  ({s['dropped']} dropped)"
+        if "skipped" in s:
+            line += f"  ({s['skipped']:.0%} skipped)"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+# -------------------------------------------------
+# STAGES
+# -------------------------------------------------
+
+class Stage(threading.Thread):
+    """
+    Daemon thread that takes items from `source`, runs `work(item)` on
+    each and passes non-None results to every queue in `sinks`. With no
+    source, `work()` is called in a loop and produces items on its own
+    (e.g. reading the camera).
+
+    The stage stops when stop() is called, when its source is closed, or
+    when a source-less `work()` returns None; on the way out it closes
+    its sinks so downstream stages stop too.
+    """
+
+    def __init__(self, name: str, work, source: LatestQueue | None = None, sinks=(), poll: float = 0.1):
+        super().__init__(name=name, daemon=True)
+        self.work = work
+        self.source = source
+        self.sinks = list(sinks)
+        self.poll = poll
+        self.stats = StageStats(name)
+        self.error = None
+
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        if self.source is not None:
+            self.source.close()
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                if self.source is None:
+                    start = time.perf_counter()
+                    output = self.work()
+                    if output is None:
+                        break
+                else:
+                    item = self.source.get(self.poll)
+                    if item is None:
+                        if self.source.closed:
+                            break
+                        continue
+                    start = time.perf_counter()
+                    output = self.work(item)
+
+                self.stats.record(time.perf_counter() - start)
+                if output is not None:
+                    for sink in self.sinks:
+                        sink.put(output)
+        except Exception as e:
+            self.error = e
+            print(f"Stage {self.name} failed: {type(e).__name__}: {e}")
+        finally:
+            for sink in self.sinks:
+                sink.close()
+
+    def snapshot(self) -> dict:
+        return self.stats.snapshot(self.source.dropped if self.source is not None else None)
+
+
+# -------------------------------------------------
+# CHANGE GATING
+# -------------------------------------------------
+
+GATE_MODES = ("off", "diff", "hash")
+
+# Default change thresholds: fraction of the 64x48 thumbnail's pixels
+# whose grey level moved by more than DIFF_PIXEL_DELTA for "diff",
+# differing bits of a 64-bit dHash for "hash". A 1 cm spot on a leaf
+# filling a 640x480 frame is about 1% of the thumbnail.
+DEFAULT_GATE_THRESHOLDS = {"diff": 0.005, "hash": 6}
+
+DIFF_SIZE = (64, 48)
+DIFF_PIXEL_DELTA = 15
+HASH_SIZE = 8
+
+
+def thumbnail(frame: np.ndarray, size: tuple[int, int]) -> np.ndarray:
+    """
+    Greyscale, area-averaged thumbnail; averaging also smooths out sensor
+    noise that would otherwise read as change.
+    """
+    grey = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    return cv2.resize(grey, size, interpolation=cv2.INTER_AREA)
+
+
+def frame_difference(a: np.ndarray, b: np.ndarray, delta: int = DIFF_PIXEL_DELTA) -> float:
+    """
+    Fraction of thumbnail pixels that changed by more than `delta` grey
+    levels. Unlike a mean difference, a small new spot still counts in
+    full, while sensor noise (already averaged down by the thumbnail)
+    stays below `delta`.
+    """
+    return float(np.count_nonzero(cv2.absdiff(a, b) > delta)) / a.size
+
+
+def dhash(frame: np.ndarray, size: int = HASH_SIZE) -> np.ndarray:
+    """
+    Difference hash: size*size bits, each saying whether a pixel of a
+    (size+1) x size thumbnail is brighter than its right neighbour.
+    """
+    small = thumbnail(frame, (size + 1, size))
+    return small[:, 1:] > small[:, :-1]
+
+
+def hamming(a: np.ndarray, b: np.ndarray) -> int:
+    return int(np.count_nonzero(a != b))
+
+
+class ChangeGate:
+    """
+    Decides per frame whether a new inference is needed. A frame passes
+    when it differs from the last passed frame by more than `threshold`,
+    when the last inference is older than `max_staleness` seconds, or
+    when `every_n` frames have been held back in a row. Everything else
+    is skipped and the previous detections are reused.
+
+    mode "off" passes every frame.
+    """
+
+    def __init__(
+        self,
+        mode: str = "diff",
+        threshold: float | None = None,
+        max_staleness: float = 2.0,
+        every_n: int = 30,
+    ):
+        if mode not in GATE_MODES:
+            raise ValueError(f"Unsupported gate mode {mode!r}; expected one of {GATE_MODES}")
+        self.mode = mode
+        self.threshold = DEFAULT_GATE_THRESHOLDS.get(mode, 0) if threshold is None else threshold
+        self.max_staleness = max_staleness
+        self.every_n = max(1, every_n)
+
+        self.reasons = Counter()
+        self._reference = None
+        self._passed_at = None
+        self._held = 0
+
+    def _signature(self, frame: np.ndarray):
+        return dhash(frame) if self.mode == "hash" else thumbnail(frame, DIFF_SIZE)
+
+    def _distance(self, a, b) -> float:
+        return hamming(a, b) if self.mode == "hash" else frame_difference(a, b)
+
+    def check(self, frame: np.ndarray, now: float | None = None) -> str | None:
+        """
+        Returns why the frame should be inferred ("first", "change",
+        "stale", "nth", "always"), or None to skip it.
+        """
+        now = time.perf_counter() if now is None else now
+        if self.mode == "off":
+            reason = "always"
+        else:
+            signature = self._signature(frame)
+            if self._reference is None:
+                reason = "first"
+            elif self._distance(signature, self._reference) > self.threshold:
+                reason = "change"
+            elif now - self._passed_at >= self.max_staleness:
+                reason = "stale"
+            elif self._held + 1 >= self.every_n:
+                reason = "nth"
+            else:
+                reason = None
+
+            if reason is not None:
+                self._reference = signature
+
+        if reason is None:
+            self._held += 1
+            self.reasons["skipped"] += 1
+            return None
+
+        self._passed_at = now
+        self._held = 0
+        self.reasons[reason] += 1
+        return reason
+
+    def reset(self):
+        self._reference = None
+        self._passed_at = None
+        self._held = 0
+
+    def stats(self) -> dict:
+        total = sum(self.reasons.values())
+        return {
+            "mode": self.mode,
+            "skipped": self.reasons["skipped"] / total if total else 0.0,
+            "reasons": dict(self.reasons),
+        }
@@ -0,0 +1,196 @@
+"""
+Pre-fork server: loads the crop models once in a parent process, then
+forks uvicorn workers that share the weight pages copy-on-write.
+
+Usage:
+    python serve.py
+    python serve.py --workers 16 --port 8000
+    WEB_WORKERS=16 PRELOAD_CROPS=tomato,chilli python serve.py
+
+`uvicorn main:app --workers N` spawns fresh interpreters, so every worker
+loads its own copy of every model. Here the parent loads, fuses and warms
+each model before forking, and the workers only ever read those pages.
+
+Each worker runs INFERENCE_WORKERS=1 forward pass at a time with
+TORCH_THREADS = cores // workers, so N workers together use about one
+thread per core. Both can still be set explicitly.
+"""
+
+import argparse
+import gc
+import os
+import signal
+import sys
+import time
+import traceback
+
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", str(os.cpu_count() or 1)))
+PRELOAD_CROPS = os.getenv("PRELOAD_CROPS", "all")
+
+
+def configure_threads(workers: int):
+    """
+    Sets per-worker thread defaults; must run before model_core is imported.
+    """
+    os.environ.setdefault("INFERENCE_WORKERS", "1")
+    os.environ.setdefault(
+        "TORCH_THREADS",
+        str(max(1, (os.cpu_count() or 1) // max(1, workers))),
+    )
+
+
+# -------------------------------------------------
+# PARENT: LOAD MODELS BEFORE FORK
+# -------------------------------------------------
+
+def preload_models(crops: list[str]) -> list[str]:
+    """
+    Loads, pins and warms the torch models in the parent.
+
+    The warm-up forward pass builds ultralytics' predictor, which keeps
+    its own fused copy of the weights; doing it here means that copy is
+    shared too instead of being made once per worker. It runs with a
+    single torch thread so no OpenMP pool exists at fork time.
+    """
+    import numpy as np
+    import torch
+
+    from model_core import get_model, resolve_backend
+
+    # ONNX Runtime / OpenVINO sessions own native thread pools that do
+    # not survive fork; those backends load in each worker instead.
+    if resolve_backend() != "torch":
+        print(f"[serve] {resolve_backend()} backend: models load per worker", file=sys.stderr)
+        return []
+
+    torch.set_num_threads(1)
+    dummy = np.zeros((64, 64, 3), dtype=np.uint8)
+
+    loaded = []
+    for crop in crops:
+        model = get_model(crop, pin=True)
+        model(dummy, verbose=False)
+        loaded.append(crop)
+
+    return loaded
+
+
+# -------------------------------------------------
+# WORKERS
+# -------------------------------------------------
+
+def run_worker(app, sock, args):
+    import uvicorn
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    gc.enable()
+
+    config = uvicorn.Config(
+        app,
+        log_level=args.log_level,
+        timeout_keep_alive=args.timeout_keep_alive,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn_worker(app, sock, args) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(app, sock, args)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def supervise(app, sock, args):
+    """
+    Forks the workers and replaces any that die until SIGINT / SIGTERM.
+    """
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    # Freeze everything loaded so far so the workers' garbage collector
+    # never writes to (and so copies) the parent's object pages.
+    gc.disable()
+    gc.freeze()
+
+    workers = set()
+    for _ in range(args.workers):
+        workers.add(spawn_worker(app, sock, args))
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    print(f"[serve] {len(workers)} workers on {args.host}:{args.port}", file=sys.stderr)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+
+        workers.discard(pid)
+        if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+            from prometheus_client import multiprocess
+
+            multiprocess.mark_process_dead(pid)
+        if not stopping:
+            print(f"[serve] worker {pid} exited ({status}), restarting", file=sys.stderr)
+            time.sleep(1)
+            workers.add(spawn_worker(app, sock, args))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=WEB_WORKERS)
+    parser.add_argument(
+        "--preload",
+        default=PRELOAD_CROPS,
+        help="Comma-separated crops to load before forking, 'all' or 'none'",
+    )
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--timeout-keep-alive", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    configure_threads(args.workers)
+
+    # Each worker then runs its own warm-up forward passes (see preload.py)
+    # before reporting ready, so its thread pools exist as well.
+    os.environ["PRELOAD_CROPS"] = args.preload
+
+    import uvicorn
+
+    from main import app
+    from preload import parse_preload
+
+    loaded = preload_models(parse_preload(args.preload))
+    print(f"[serve] preloaded: {', '.join(loaded) or 'none'}", file=sys.stderr)
+
+    sock = uvicorn.Config(app, host=args.host, port=args.port).bind_socket()
+    try:
+        supervise(app, sock, args)
+    finally:
+        sock.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+class FakeModel:
+    """
+    Stands in for a loaded YOLO model: just its task and input size.
+    """
+
+    def __init__(self, task: str, imgsz: int = 640):
+        self.task = task
+        self.overrides = {"imgsz": imgsz}
+
+
+class FakeRegistry:
+    """
+    Serves `models` from model_core.get_model and records each (crop,
+    backend) it is asked for in `calls`.
+    """
+
+    def __init__(self, models: dict):
+        self.models = models
+        self.calls = []
+
+    def get_model(self, crop, backend=None, precision=None, pin=False):
+        self.calls.append((crop, backend))
+        return self.models[crop]
+
+
+@pytest.fixture
+def registry_models(monkeypatch):
+    """
+    Fake model registry; any direct YOLO construction (a second parse of
+    the weights) fails the test.
+    """
+    import ultralytics
+
+    import model_core
+
+    registry = FakeRegistry({
+        "tomato": FakeModel("detect", 640),
+        "chilli": FakeModel("detect", 640),
+        "cotton": FakeModel("detect", 320),
+        "rose": FakeModel("classify"),
+    })
+
+    def no_yolo(*args, **kwargs):
+        raise AssertionError("weights parsed outside the model registry")
+
+    monkeypatch.setattr(model_core, "get_model", registry.get_model)
+    monkeypatch.setattr(ultralytics, "YOLO", no_yolo)
+    return registry
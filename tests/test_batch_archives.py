@@ -0,0 +1,96 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+import main
+
+
+def zip_upload(members: dict, name: str = "images.zip") -> UploadFile:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for member, data in members.items():
+            archive.writestr(member, data)
+    buffer.seek(0)
+    return UploadFile(buffer, filename=name)
+
+
+def tar_upload(members: dict, name: str = "images.tar.gz") -> UploadFile:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for member, data in members.items():
+            info = tarfile.TarInfo(member)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    buffer.seek(0)
+    return UploadFile(buffer, filename=name)
+
+
+@pytest.fixture
+def no_extraction(monkeypatch):
+    """
+    Fails the test if any archive member is read.
+    """
+    def refuse(*args, **kwargs):
+        raise AssertionError("member extracted before the limits were checked")
+
+    monkeypatch.setattr(zipfile.ZipFile, "read", refuse)
+    monkeypatch.setattr(tarfile.TarFile, "extractfile", refuse)
+
+
+def test_members_are_read_sorted_and_filtered():
+    upload = zip_upload({"b.jpg": b"B", "a.png": b"A", "notes.txt": b"x"})
+    items = main.collect_batch_items([upload])
+    assert items == [{"filename": "a.png", "data": b"A"}, {"filename": "b.jpg", "data": b"B"}]
+
+
+def test_oversized_member_is_reported_not_extracted(monkeypatch):
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 4)
+    upload = tar_upload({"big.jpg": b"0123456789", "small.jpg": b"ok"})
+    items = main.collect_batch_items([upload])
+    assert "error" in items[0] and items[1]["data"] == b"ok"
+
+
+@pytest.mark.parametrize("make_upload", [zip_upload, tar_upload])
+def test_image_count_rejected_before_extraction(monkeypatch, no_extraction, make_upload):
+    monkeypatch.setattr(main, "BATCH_MAX_IMAGES", 5)
+    upload = make_upload({f"{i:03}.jpg": b"\0" * 1024 for i in range(10)})
+    with pytest.raises(HTTPException) as error:
+        main.collect_batch_items([upload])
+    assert error.value.status_code == 413
+
+
+@pytest.mark.parametrize("make_upload", [zip_upload, tar_upload])
+def test_uncompressed_total_rejected_before_extraction(monkeypatch, no_extraction, make_upload):
+    monkeypatch.setattr(main, "MAX_ARCHIVE_BYTES", 3 * 1024 * 1024)
+    # Zeros compress to almost nothing, but expand to 4 MB
+    upload = make_upload({f"{i}.jpg": b"\0" * (1024 * 1024) for i in range(4)})
+    with pytest.raises(HTTPException) as error:
+        main.collect_batch_items([upload])
+    assert error.value.status_code == 413
+
+
+def test_absurd_member_count_rejected(monkeypatch, no_extraction):
+    monkeypatch.setattr(main, "MAX_ARCHIVE_MEMBERS", 50)
+    upload = zip_upload({f"{i}.txt": b"" for i in range(60)})
+    with pytest.raises(HTTPException) as error:
+        main.collect_batch_items([upload])
+    assert error.value.status_code == 413
+
+
+def test_budget_spans_plain_files_and_archives(monkeypatch, no_extraction):
+    monkeypatch.setattr(main, "BATCH_MAX_IMAGES", 3)
+    plain = [UploadFile(io.BytesIO(b"x"), filename=f"{i}.jpg") for i in range(2)]
+    upload = zip_upload({"a.jpg": b"a", "b.jpg": b"b"})
+    with pytest.raises(HTTPException) as error:
+        main.collect_batch_items(plain + [upload])
+    assert error.value.status_code == 413
+
+
+def test_invalid_archive_is_400():
+    upload = UploadFile(io.BytesIO(b"not an archive at all"), filename="broken.tar")
+    with pytest.raises(HTTPException) as error:
+        main.collect_batch_items([upload])
+    assert error.value.status_code == 400
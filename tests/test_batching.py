@@ -0,0 +1,91 @@
+import threading
+import time
+
+from model_core import BatchScheduler
+
+
+class FakeScheduler(BatchScheduler):
+    """
+    Scheduler whose forward pass echoes its inputs and records batch sizes;
+    `gate` holds the forward pass until it is set.
+    """
+
+    def __init__(self, **kwargs):
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()
+        super().__init__("tomato", "torch", **kwargs)
+
+    def _forward(self, images):
+        self.entered.set()
+        self.gate.wait(5)
+        self.batches.append(len(images))
+        return list(images)
+
+
+def test_lone_request_is_not_delayed():
+    scheduler = FakeScheduler(max_wait_ms=500)
+    # The first call also creates the shared inference pool (and imports torch)
+    scheduler.submit("warm").result(timeout=30)
+
+    start = time.monotonic()
+    assert scheduler.submit("a").result(timeout=5) == "a"
+    assert time.monotonic() - start < 0.25
+    assert scheduler.batches == [1, 1]
+
+
+def test_queued_requests_are_batched():
+    scheduler = FakeScheduler(max_wait_ms=50, max_batch_size=8)
+
+    # Hold the first forward pass so the next requests queue behind it
+    scheduler.gate.clear()
+    first = scheduler.submit(0)
+    assert scheduler.entered.wait(5)
+    futures = [scheduler.submit(i) for i in range(1, 6)]
+    scheduler.gate.set()
+
+    assert first.result(timeout=5) == 0
+    assert [f.result(timeout=5) for f in futures] == [1, 2, 3, 4, 5]
+    assert scheduler.batches == [1, 5]
+    assert scheduler.stats()["batch_size_histogram"] == {"1": 1, "5": 1}
+
+
+def test_batches_never_exceed_max_batch_size():
+    scheduler = FakeScheduler(max_wait_ms=50, max_batch_size=1)
+
+    scheduler.gate.clear()
+    first = scheduler.submit(0)
+    assert scheduler.entered.wait(5)
+    futures = [scheduler.submit(i) for i in range(1, 5)]
+    scheduler.gate.set()
+
+    assert [f.result(timeout=5) for f in [first] + futures] == [0, 1, 2, 3, 4]
+    assert scheduler.batches == [1, 1, 1, 1, 1]
+
+
+def test_requests_within_the_window_join_the_batch():
+    scheduler = FakeScheduler(max_wait_ms=300, max_batch_size=8)
+
+    scheduler.gate.clear()
+    scheduler.submit("warm")
+    assert scheduler.entered.wait(5)
+    # Two queued requests open the window; a third arriving inside it joins
+    futures = [scheduler.submit("a"), scheduler.submit("b")]
+    scheduler.gate.set()
+    time.sleep(0.05)
+    futures.append(scheduler.submit("c"))
+
+    assert [f.result(timeout=5) for f in futures] == ["a", "b", "c"]
+    assert scheduler.batches == [1, 3]
+
+
+def test_batch_is_capped_at_max_size():
+    scheduler = FakeScheduler(max_wait_ms=50, max_batch_size=2)
+    scheduler.gate.clear()
+    scheduler.submit(0)
+    assert scheduler.entered.wait(5)
+    futures = [scheduler.submit(i) for i in range(4)]
+    scheduler.gate.set()
+    [f.result(timeout=5) for f in futures]
+    assert scheduler.batches == [1, 2, 2]
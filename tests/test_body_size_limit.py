@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from main import BodySizeLimitMiddleware
+
+
+async def call(middleware, content_length: bytes) -> list:
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"content-length", content_length)]}
+    await middleware(scope, receive, send)
+    return sent
+
+
+async def app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+@pytest.mark.parametrize("value, status", [
+    (b"10", 200),
+    (b"2048", 413),
+    (b"abc", 400),
+    (b"-1", 400),
+])
+def test_content_length_header(value, status):
+    sent = asyncio.run(call(BodySizeLimitMiddleware(app, max_bytes=1024), value))
+
+    assert sent[0]["status"] == status
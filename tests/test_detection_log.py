@@ -0,0 +1,162 @@
+import csv
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from detection_log import FIELDS, DetectionLog, open_sinks
+
+
+class RecordingSink:
+    path = "recording"
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.writes = []
+        self.syncs = 0
+        self.closed = False
+        self.wrote = threading.Event()
+
+    def write(self, rows):
+        if self.fail:
+            raise OSError("disk full")
+        self.writes.append((time.monotonic(), list(rows)))
+        self.wrote.set()
+
+    def sync(self):
+        self.syncs += 1
+
+    def close(self):
+        self.closed = True
+
+
+def row(i: int) -> dict:
+    return {
+        "timestamp": f"2026-10-17 10:00:{i:02d}",
+        "crop": "tomato",
+        "disease": f"disease_{i}",
+        "satellites": 7,
+        "lat": 16.5 + i / 1000,
+        "long": 80.5,
+    }
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_full_batches_are_written_without_waiting():
+    sink = RecordingSink()
+    log = DetectionLog([sink], batch_size=5, flush_interval=60, fsync_interval=60)
+    for i in range(10):
+        log.append(row(i))
+
+    wait_for(lambda: log.written == 10)
+    assert [len(rows) for _, rows in sink.writes] == [5, 5]
+    log.close()
+    assert sink.closed
+    assert sink.syncs == 1
+
+
+def test_partial_batch_is_written_after_the_flush_interval():
+    sink = RecordingSink()
+    log = DetectionLog([sink], batch_size=100, flush_interval=0.3, fsync_interval=60)
+    start = time.monotonic()
+    for i in range(3):
+        log.append(row(i))
+
+    assert sink.wrote.wait(5)
+    written_at, rows = sink.writes[0]
+    assert 0.25 <= written_at - start < 2.0
+    assert [r["disease"] for r in rows] == ["disease_0", "disease_1", "disease_2"]
+    log.close()
+
+
+def test_close_writes_and_syncs_what_is_left():
+    sink = RecordingSink()
+    log = DetectionLog([sink], batch_size=100, flush_interval=60, fsync_interval=60)
+    for i in range(3):
+        log.append(row(i))
+    log.close()
+
+    assert log.stats()["written"] == 3
+    assert sink.syncs == 1
+
+
+def test_failed_writes_are_not_counted_as_written():
+    good, bad = RecordingSink(), RecordingSink(fail=True)
+    log = DetectionLog([good, bad], batch_size=2, flush_interval=60, fsync_interval=60)
+    for i in range(4):
+        log.append(row(i))
+    log.close()
+
+    stats = log.stats()
+    assert stats["written"] == 0
+    assert stats["failed"] == 4
+    assert stats["errors"] == 2
+    assert sum(len(rows) for _, rows in good.writes) == 4
+
+
+def test_full_queue_drops_rows():
+    gate = threading.Event()
+
+    class SlowSink(RecordingSink):
+        def write(self, rows):
+            gate.wait(5)
+            super().write(rows)
+
+    log = DetectionLog([SlowSink()], batch_size=1, flush_interval=60, fsync_interval=60, maxsize=2)
+    for i in range(10):
+        log.append(row(i))
+    gate.set()
+    log.close()
+
+    stats = log.stats()
+    assert stats["dropped"] > 0
+    assert stats["appended"] + stats["dropped"] == 10
+    assert stats["written"] == stats["appended"]
+
+
+def test_csv_and_sqlite_round_trip(tmp_path):
+    csv_path = tmp_path / "log.csv"
+    db_path = tmp_path / "log.db"
+    log = DetectionLog(open_sinks(f"{csv_path},{db_path}"), batch_size=2, flush_interval=60, fsync_interval=60)
+    rows = [row(i) for i in range(5)]
+    for r in rows:
+        log.append(r)
+    log.close()
+    assert log.stats()["written"] == 5
+
+    with open(csv_path, newline="") as f:
+        reader = csv.reader(f)
+        assert tuple(next(reader)) == FIELDS
+        assert [tuple(r) for r in reader] == [tuple(str(r[field]) for field in FIELDS) for r in rows]
+
+    conn = sqlite3.connect(db_path)
+    try:
+        stored = conn.execute(f"SELECT {', '.join(FIELDS)} FROM detections ORDER BY id").fetchall()
+    finally:
+        conn.close()
+    assert stored == [tuple(r[field] for field in FIELDS) for r in rows]
+
+
+def test_csv_header_is_written_once(tmp_path):
+    path = tmp_path / "log.csv"
+    for i in range(2):
+        log = DetectionLog(open_sinks(str(path)), batch_size=10, flush_interval=60, fsync_interval=60)
+        log.log("tomato", "healthy", 7, 16.5, 80.5, timestamp=f"2026-10-17 10:00:0{i}")
+        log.close()
+
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert lines[0] == ",".join(FIELDS)
+    assert len(lines) == 3
+
+
+def test_unknown_extension_is_rejected():
+    with pytest.raises(ValueError):
+        open_sinks("log.txt")
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+import torch
+from ultralytics.engine.results import Results
+
+import model_core
+from model_core import extract_output
+
+
+def legacy_output(crop: str, result, threshold: float) -> dict:
+    """
+    The per-box / per-class loop extract_output replaced.
+    """
+    output = {"crop": crop, "boxes": [], "classification": []}
+
+    if hasattr(result, "boxes") and result.boxes is not None:
+        for box in result.boxes:
+            conf = float(box.conf[0])
+            if conf < threshold:
+                continue
+            cls_id = int(box.cls[0])
+            x1, y1, x2, y2 = map(float, box.xyxy[0])
+            output["boxes"].append({
+                "class": result.names[cls_id],
+                "confidence": conf,
+                "bbox": [x1, y1, x2, y2],
+            })
+
+    if hasattr(result, "probs") and result.probs is not None:
+        for i, p in enumerate(result.probs.data.tolist()):
+            if p < threshold:
+                continue
+            output["classification"].append({"class": result.names[i], "confidence": float(p)})
+
+    return output
+
+
+IMAGE = np.zeros((480, 640, 3), dtype=np.uint8)
+
+
+def names(count: int) -> dict:
+    return {i: f"class_{i}" for i in range(count)}
+
+
+def detection_result(count: int, classes: int = 11, seed: int = 0) -> Results:
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, 600, (count, 2))
+    boxes = np.column_stack((
+        xy, xy + rng.uniform(5, 40, (count, 2)),
+        rng.uniform(0, 1, count),
+        rng.integers(0, classes, count),
+    ))
+    return Results(IMAGE, "a.jpg", names(classes), boxes=torch.tensor(boxes, dtype=torch.float32))
+
+
+def classification_result(classes: int, seed: int = 0) -> Results:
+    probs = torch.softmax(torch.tensor(np.random.default_rng(seed).normal(size=classes) * 3), 0)
+    return Results(IMAGE, "a.jpg", names(classes), probs=probs.float())
+
+
+@pytest.mark.parametrize("count", [0, 1, 37, 300])
+@pytest.mark.parametrize("threshold", [0.0, 0.25, 0.5, 1.0])
+def test_detection_matches_legacy_loop(count, threshold):
+    result = detection_result(count)
+    assert extract_output("tomato", result, threshold) == legacy_output("tomato", result, threshold)
+
+
+@pytest.mark.parametrize("classes", [2, 6, 11, model_core.VECTORISE_MIN_CLASSES, 1000])
+@pytest.mark.parametrize("threshold", [0.0, 0.01, 0.1, 0.5])
+def test_classification_matches_legacy_loop(classes, threshold):
+    result = classification_result(classes)
+    assert extract_output("tomato", result, threshold) == legacy_output("tomato", result, threshold)
+
+
+def test_threshold_equal_to_a_confidence_is_kept_on_both_paths():
+    for classes in (6, model_core.VECTORISE_MIN_CLASSES):
+        result = classification_result(classes)
+        threshold = float(result.probs.data[0])
+        # Just above the float32 value; NumPy would round it back down
+        above = np.nextafter(threshold, 1.0)
+        assert extract_output("tomato", result, threshold) == legacy_output("tomato", result, threshold)
+        assert extract_output("tomato", result, above) == legacy_output("tomato", result, above)
+
+        boxes = detection_result(20)
+        threshold = float(boxes.boxes.conf[3])
+        above = np.nextafter(threshold, 1.0)
+        assert extract_output("tomato", boxes, above) == legacy_output("tomato", boxes, above)
@@ -0,0 +1,149 @@
+import os
+
+import pytest
+
+from gps import GpsReceiver, NmeaParser, ReplaySource, nmea_checksum_ok, parse_line
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_DRIVE = os.path.join(ROOT, "benchmarks", "traces", "sample_drive.nmea")
+
+GGA = "$GNGGA,053002.00,1629.7556,N,08029.7788,E,1,07,0.9,21.4,M,-88.0,M,,*6C"
+RMC = "$GNRMC,053002.00,A,1629.7556,N,08029.7788,E,1.2,45.0,170626,,,A*7C"
+
+
+def with_checksum(body: str) -> str:
+    value = 0
+    for char in body:
+        value ^= ord(char)
+    return f"${body}*{value:02X}"
+
+
+def test_gga_fix():
+    update = parse_line(GGA)
+
+    assert update["valid"]
+    assert update["time"] == "05:30:02"
+    assert update["satellites"] == 7
+    assert update["lat"] == pytest.approx(16 + 29.7556 / 60)
+    assert update["lon"] == pytest.approx(80 + 29.7788 / 60)
+
+
+def test_rmc_fix():
+    update = parse_line(RMC)
+
+    assert update["valid"]
+    assert update["lat"] == pytest.approx(16.495927, abs=1e-6)
+    assert update["lon"] == pytest.approx(80.496313, abs=1e-6)
+    assert "satellites" not in update
+
+
+def test_southern_and_western_hemispheres_are_negative():
+    update = parse_line(with_checksum("GPGGA,120000.00,3352.1234,S,15112.5678,W,1,05,1.0,10.0,M,,M,,"))
+
+    assert update["lat"] == pytest.approx(-(33 + 52.1234 / 60))
+    assert update["lon"] == pytest.approx(-(151 + 12.5678 / 60))
+
+
+def test_bad_checksum_is_rejected():
+    assert not nmea_checksum_ok(GGA[:-2] + "00")
+    assert parse_line(GGA[:-2] + "00") is None
+    assert parse_line(GGA.replace("1629.7556", "1629.7557")) is None
+
+
+def test_sentence_without_checksum_is_accepted():
+    assert parse_line(GGA.partition("*")[0])["valid"]
+
+
+@pytest.mark.parametrize("line", [
+    "$GNGGA,053000.00,1629.7544,N,08029.7774,E,0,07,0.9,21.4,M,-88.0,M,,*6F",
+    "$GNRMC,053000.00,V,1629.7544,N,08029.7774,E,1.2,45.0,170626,,,A*69",
+    with_checksum("GPGGA,053000.00,,,,,0,00,99.9,,M,,M,,"),
+    with_checksum("GPRMC,053000.00,V,,,,,,,170626,,,N"),
+])
+def test_no_fix_is_reported_without_a_position(line):
+    update = parse_line(line)
+
+    assert update["valid"] is False
+    assert "lat" not in update and "lon" not in update
+
+
+def test_other_and_truncated_sentences_are_ignored():
+    assert parse_line(with_checksum("GPGSV,3,1,11,01,45,120,38")) is None
+    assert parse_line(with_checksum("GPGGA,053000.00,1629.7544,N")) is None
+    assert parse_line("garbage") is None
+
+
+@pytest.mark.parametrize("line", [
+    "LAT:16.495906,LON:80.496290,SAT:7",
+    "LAT: 16.495906, LON: 80.496290, SAT: 7.0",
+    "GPS LAT:16.495906,GPS LON:80.496290,GPS SAT:7",
+])
+def test_legacy_format(line):
+    update = parse_line(line)
+
+    assert update == {"lat": 16.495906, "lon": 80.496290, "satellites": 7, "valid": True}
+
+
+def test_legacy_line_without_a_position_is_rejected():
+    assert parse_line("LAT:,LON:80.49,SAT:7") is None
+    assert parse_line("SAT:7") is None
+
+
+def test_parser_joins_lines_split_across_reads():
+    parser = NmeaParser()
+    data = f"{GGA}\r\n{RMC}\r\n".encode()
+
+    updates = parser.feed(data[:20]) + parser.feed(data[20:70]) + parser.feed(data[70:])
+
+    assert [u["valid"] for u in updates] == [True, True]
+    assert parser.lines == 2
+    assert parser.rejected == 0
+
+
+def test_parser_counts_rejected_lines_and_drops_overlong_ones():
+    parser = NmeaParser()
+    assert parser.feed(b"x" * 5000) == []
+    assert parser.feed(f"noise\n{GGA}\n".encode())[0]["valid"]
+    assert parser.rejected == 1
+
+
+def test_replay_source_plays_the_sample_drive():
+    source = ReplaySource(SAMPLE_DRIVE, speed=0, loop=False)
+    parser = NmeaParser()
+    updates = []
+    while (data := source.read()) is not None:
+        updates.extend(parser.feed(data))
+
+    fixes = [u for u in updates if u["valid"]]
+    assert parser.rejected == parser.lines - len(updates)  # the GSV lines
+    assert len(updates) == 120
+    assert not any(u["valid"] for u in updates[:4])  # no fix for the first 2 s
+    assert fixes[0]["time"] == "05:30:02"
+    assert fixes[-1]["time"] == "05:30:59"
+    assert fixes[-1]["lat"] > fixes[0]["lat"] and fixes[-1]["lon"] > fixes[0]["lon"]
+
+
+def test_replay_source_is_paced_by_sentence_times():
+    source = ReplaySource(SAMPLE_DRIVE, speed=1000, loop=False)
+    waits = []
+    source._closed.wait = lambda timeout: waits.append(timeout) or False
+
+    while source.read() is not None:
+        pass
+
+    # One wait per new second, scaled by the speed
+    assert len(waits) == 59
+    assert all(w == pytest.approx(0.001) for w in waits)
+
+
+def test_receiver_publishes_the_latest_fix():
+    receiver = GpsReceiver(ReplaySource(SAMPLE_DRIVE, speed=0, loop=False))
+    receiver.start()
+    receiver._thread.join(5)
+
+    fix = receiver.fix()
+    assert fix["valid"]
+    assert fix["time"] == "05:30:59"
+    assert fix["satellites"] == 9
+    assert receiver.stats()["error"] is None
+    receiver.stop()
@@ -0,0 +1,262 @@
+import queue
+import threading
+import time
+
+import numpy as np
+import pytest
+import torch
+
+import inference_workers
+import model_core
+from inference_workers import InferencePool, worker_main
+
+
+class FakeProcess:
+    _pids = iter(range(1000, 2000))
+
+    def __init__(self):
+        self.pid = next(self._pids)
+        self.alive = True
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+    def join(self, timeout=None):
+        pass
+
+    def terminate(self):
+        self.alive = False
+
+
+def fake_start(worker):
+    worker.taken = worker.channel.pool.context.Value("q", 0, lock=False)
+    worker.acknowledged = 0
+    worker.process = FakeProcess()
+
+
+class Counter:
+    value = 0
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """
+    Pool with one tomato channel whose two workers are FakeProcesses,
+    each with a real shared `taken` counter.
+    """
+    monkeypatch.setattr(inference_workers._Worker, "start", fake_start)
+    pool = InferencePool(["tomato"], processes=2, backend="torch", slots=4, slot_bytes=1024, max_batch=4)
+    for worker in pool.channels["tomato"].workers:
+        worker.start()
+    yield pool
+    for channel in pool.channels.values():
+        channel.ring.close()
+
+
+def submit(channel, count: int) -> list:
+    return [channel.submit(np.zeros((8, 8, 3), dtype=np.uint8)) for _ in range(count)]
+
+
+def test_requests_go_to_the_least_busy_worker(pool):
+    channel = pool.channels["tomato"]
+    submit(channel, 5)
+
+    first, second = channel.workers
+    assert [len(first.sent), len(second.sent)] == [3, 2]
+
+
+def test_dead_worker_fails_only_what_it_took(pool):
+    channel = pool.channels["tomato"]
+    first, second = channel.workers
+    futures = submit(channel, 6)  # first gets 0, 2, 4; second 1, 3, 5
+    queued_id, queued = first.sent[2]
+    old_queue = first.requests
+    first.taken.value = 2
+    second.taken.value = 2
+    dead = first.process
+
+    dead.alive = False
+    pool._check_workers()
+
+    for future in (futures[0], futures[2]):
+        with pytest.raises(RuntimeError, match=f"worker {dead.pid}"):
+            future.result(timeout=0)
+    assert not any(future.done() for future in futures[1::2] + [futures[4]])
+    # The replacement gets a new queue holding just request 4
+    assert channel.restarts == 1
+    assert first.process is not dead and first.alive
+    assert [rid for rid, _ in first.sent] == [queued_id]
+    assert first.requests is not old_queue
+    assert first.requests.get(timeout=5)[0] == queued[0] == queued_id
+    assert pool.stats()["crops"]["tomato"]["pending"] == 4
+    # 4 slots: requests 0-3 took one each, 4 and 5 went inline. The
+    # failed requests' slots are free again; the queued ones keep theirs
+    assert channel.ring.in_use() == 2
+
+
+def test_results_already_delivered_are_not_failed(pool):
+    channel = pool.channels["tomato"]
+    first = channel.workers[0]
+    futures = submit(channel, 4)  # first gets 0 and 2
+    first.taken.value = 2
+
+    assert pool._handle(("result", first.sent[0][0], None, None, {}))
+    assert first.acknowledged == 1
+
+    first.process.alive = False
+    pool._check_workers()
+
+    assert futures[0].result(timeout=0)["speed"] == {}
+    with pytest.raises(RuntimeError):
+        futures[2].result(timeout=0)
+    assert not futures[1].done() and not futures[3].done()
+
+
+def test_workers_are_checked_while_results_keep_arriving(pool, monkeypatch):
+    monkeypatch.setattr(inference_workers, "WORKER_CHECK_INTERVAL", 0.05)
+    checks = []
+
+    class BusyResults:
+        """
+        Never empty: a result (for an unknown request) on every read.
+        """
+
+        def get(self, timeout=None):
+            if len(checks) >= 3:
+                return ("stop",)
+            return ("result", -1, None, None, {})
+
+    def check():
+        checks.append(time.monotonic())
+
+    pool.results = BusyResults()
+    monkeypatch.setattr(pool, "_check_workers", check)
+    reader = threading.Thread(target=pool._read_results, daemon=True)
+    reader.start()
+    reader.join(10)
+
+    assert not reader.is_alive()
+    assert len(checks) == 3
+
+
+class FakeOutput:
+    boxes = None
+    probs = None
+    speed = {"inference": 1.0}
+
+    def __init__(self):
+        self.names = {0: "healthy"}
+
+
+class FakeModel:
+    names = {0: "healthy"}
+    task = "detect"
+    overrides = {"imgsz": [480, 640]}
+
+    def __init__(self, taken):
+        self.taken = taken
+        self.seen = []
+
+    def __call__(self, frames, verbose=False):
+        # What the parent would read if the worker died mid-batch
+        self.seen.append(self.taken.value)
+        return [FakeOutput() for _ in (frames if isinstance(frames, list) else [frames])]
+
+
+def test_worker_counts_every_request_it_takes(monkeypatch):
+    taken = Counter()
+    model = FakeModel(taken)
+    monkeypatch.setattr(model_core, "get_model", lambda *args, **kwargs: model)
+
+    ring = inference_workers.SharedRing(2, 1024)
+    requests, results = queue.Queue(), queue.Queue()
+    frame = np.zeros((8, 8, 3), dtype=np.uint8)
+    for request_id in (7, 8, 9):
+        requests.put((request_id, None, frame.shape, frame.dtype.str, frame))
+    requests.put(None)
+
+    try:
+        worker_main("tomato", "torch", ring.name, 2, 1024, requests, results, torch.get_num_threads(), 2, taken)
+    finally:
+        ring.close()
+
+    # Warm-up, then two batches
+    assert model.seen == [0, 2, 3]
+    messages = [results.get_nowait() for _ in range(results.qsize())]
+    assert [message[0] for message in messages] == ["ready", "result", "result", "result"]
+    assert messages[0][-1] == {"task": "detect", "imgsz": 640}
+
+
+def test_pool_reports_what_its_workers_loaded(pool):
+    pool._handle(("ready", "tomato", 1000, ["healthy"], {"task": "detect", "imgsz": 640}))
+
+    assert pool.channels["tomato"].names == ["healthy"]
+    assert pool.model_info("Tomato") == {"task": "detect", "imgsz": 640}
+
+
+def test_start_times_out_and_closes_the_pool(monkeypatch):
+    # Workers that never report ready
+    monkeypatch.setattr(inference_workers._Worker, "start", fake_start)
+    pool = InferencePool(["tomato"], processes=1, backend="torch", slots=2, slot_bytes=1024)
+    raised = []
+
+    def start():
+        try:
+            pool.start(timeout=0.2)
+        except TimeoutError as e:
+            raised.append(e)
+
+    thread = threading.Thread(target=start, daemon=True)
+    thread.start()
+    thread.join(15)
+
+    assert not thread.is_alive(), "start() deadlocked"
+    assert raised
+    assert pool._closing
+    assert not pool.serves("tomato", "torch")
+
+
+def test_worker_reports_a_model_that_fails_to_load(monkeypatch):
+    def broken(*args, **kwargs):
+        raise FileNotFoundError("models/tomato.pt")
+
+    monkeypatch.setattr(model_core, "get_model", broken)
+    ring = inference_workers.SharedRing(2, 1024)
+    results = queue.Queue()
+    try:
+        worker_main("tomato", "torch", ring.name, 2, 1024, queue.Queue(), results, torch.get_num_threads(), 2, Counter())
+    finally:
+        ring.close()
+
+    kind, crop, _, error = results.get_nowait()
+    assert (kind, crop) == ("failed", "tomato")
+    assert "FileNotFoundError" in error
+
+
+def test_start_raises_the_load_error_without_waiting(monkeypatch, tmp_path):
+    # Real worker processes with no weights to load
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    pool = InferencePool(["tomato"], processes=1, backend="torch", slots=2, slot_bytes=1024)
+
+    start = time.monotonic()
+    with pytest.raises(RuntimeError, match="tomato failed to start"):
+        pool.start(timeout=120)
+    assert time.monotonic() - start < 60
+    assert pool.stats()["crops"]["tomato"]["restarts"] == 0
+
+
+def test_failed_crop_is_not_respawned_and_its_requests_fail(pool):
+    channel = pool.channels["tomato"]
+    future, = submit(channel, 1)
+
+    channel.error = "FileNotFoundError: models/tomato.pt"
+    for process in channel.processes:
+        process.alive = False
+    pool._check_workers()
+
+    assert channel.processes == []
+    assert channel.restarts == 0
+    with pytest.raises(RuntimeError, match="FileNotFoundError"):
+        future.result(timeout=0)
+    with pytest.raises(RuntimeError, match="FileNotFoundError"):
+        channel.submit(np.zeros((8, 8, 3), dtype=np.uint8))
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+
+import main
+
+
+class FakePool:
+    instances = []
+
+    def __init__(self, crops, processes):
+        self.started = False
+        self.closed = False
+        FakePool.instances.append(self)
+
+    def start(self):
+        self.started = True
+        return self
+
+    def close(self):
+        self.closed = True
+
+
+class FakePreloader:
+    def __init__(self, policy):
+        self.started = False
+
+    def start(self):
+        self.started = True
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    FakePool.instances = []
+    monkeypatch.setattr(main, "INFERENCE_PROCESSES", 1)
+    monkeypatch.setattr(main, "InferencePool", FakePool)
+    monkeypatch.setattr(main, "Preloader", FakePreloader)
+    monkeypatch.setattr(main, "load_policy", lambda: {})
+    monkeypatch.setattr(main, "set_remote_pool", lambda pool: None)
+    monkeypatch.setattr(main, "start_from_env", lambda: None)
+    monkeypatch.setattr(main.profiler, "stop", lambda: None)
+    return FakePool.instances
+
+
+async def run_lifespan(app: FastAPI):
+    async with main.lifespan(app):
+        pass
+
+
+def test_pool_is_closed_on_shutdown(fakes):
+    app = FastAPI()
+    asyncio.run(run_lifespan(app))
+
+    pool, = fakes
+    assert pool.started and pool.closed
+    assert app.state.preloader.started
+
+
+def test_bad_preload_policy_fails_before_workers_start(fakes, monkeypatch):
+    def bad_policy():
+        raise ValueError("Unknown crop in PRELOAD: potato")
+
+    monkeypatch.setattr(main, "load_policy", bad_policy)
+
+    with pytest.raises(ValueError):
+        asyncio.run(run_lifespan(FastAPI()))
+    assert fakes == []
+
+
+def test_pool_is_closed_when_later_startup_fails(fakes, monkeypatch):
+    def broken_profiler():
+        raise ValueError("PROFILE_MODE must be sample or cprofile")
+
+    monkeypatch.setattr(main, "start_from_env", broken_profiler)
+
+    with pytest.raises(ValueError):
+        asyncio.run(run_lifespan(FastAPI()))
+    pool, = fakes
+    assert pool.started and pool.closed
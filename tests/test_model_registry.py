@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+from model_core import ModelRegistry
+
+
+class FakeModel:
+    """
+    Not a torch module, so the registry sizes it by its file on disk.
+    """
+
+    model = None
+
+
+@pytest.fixture
+def weights(tmp_path):
+    def make(name: str, size: int = 1000) -> str:
+        path = tmp_path / name
+        path.write_bytes(b"\0" * size)
+        return str(path)
+
+    return make
+
+
+def test_concurrent_first_requests_share_one_load(weights):
+    registry = ModelRegistry(max_models=0, memory_budget_mb=0)
+    path = weights("tomato.pt")
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.2)
+        return FakeModel()
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(registry.get("tomato", loader, path)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert len(results) == 8
+    assert all(model is results[0] for model in results)
+    assert registry.stats()["loads"] == 1
+    assert registry._load_locks == {}
+
+
+def test_failed_load_is_retried_and_not_pinned(weights):
+    registry = ModelRegistry()
+    path = weights("tomato.pt")
+
+    def broken():
+        raise RuntimeError("corrupt weights")
+
+    with pytest.raises(RuntimeError):
+        registry.get("tomato", broken, path, pin=True)
+    assert registry.state("tomato") == "not_loaded"
+    assert registry._pinned == set()
+    assert registry._load_locks == {}
+
+    model = registry.get("tomato", FakeModel, path, pin=True)
+    assert isinstance(model, FakeModel)
+    assert registry.stats()["models"]["tomato"]["pinned"]
+
+
+def test_capacity_evicts_least_recently_used(weights):
+    registry = ModelRegistry(max_models=2)
+    for crop in ("tomato", "chilli"):
+        registry.get(crop, FakeModel, weights(f"{crop}.pt"))
+    registry.get("tomato", FakeModel, weights("tomato.pt"))  # chilli is now the oldest
+    registry.get("rose", FakeModel, weights("rose.pt"))
+
+    assert registry.keys() == ["tomato", "rose"]
+    assert registry.stats()["evictions"] == 1
+
+
+def test_memory_budget_skips_pinned_models(weights):
+    registry = ModelRegistry(max_models=0, memory_budget_mb=0.0025)  # 2500 bytes
+    registry.get("tomato", FakeModel, weights("tomato.pt"), pin=True)
+    registry.get("chilli", FakeModel, weights("chilli.pt"))
+    registry.get("rose", FakeModel, weights("rose.pt"))
+
+    assert registry.keys() == ["tomato", "rose"]
+
+
+def test_explicit_evict_is_counted(weights):
+    registry = ModelRegistry()
+    registry.get("tomato", FakeModel, weights("tomato.pt"), pin=True)
+
+    assert registry.evict("tomato")
+    assert not registry.evict("tomato")
+    stats = registry.stats()
+    assert stats["evictions"] == 1
+    assert stats["resident_models"] == 0
@@ -0,0 +1,69 @@
+import numpy as np
+import onnx
+from onnx import TensorProto, helper
+
+import model_core
+
+
+def test_plan_inputs_shares_canvases_by_input_size(registry_models):
+    image = np.zeros((480, 800, 3), dtype=np.uint8)
+    inputs = model_core._plan_inputs(["tomato", "chilli", "cotton", "rose"], image)
+
+    assert inputs["tomato"] is inputs["chilli"]
+    assert inputs["tomato"][0].shape == (640, 640, 3)
+    assert inputs["cotton"][0].shape == (320, 320, 3)
+    assert inputs["rose"] == (image, None)
+
+
+class FakePool:
+    def __init__(self, info: dict):
+        self.info = info
+
+    def serves(self, crop, backend):
+        return crop in self.info
+
+    def model_info(self, crop):
+        return self.info[crop]
+
+
+def test_worker_served_crops_are_planned_from_worker_info(registry_models, monkeypatch):
+    pool = FakePool({"tomato": {"task": "detect", "imgsz": 320}, "rose": {"task": "classify", "imgsz": 224}})
+    monkeypatch.setattr(model_core, "_remote_pool", pool)
+    # Loading either model in this process would raise KeyError
+    del registry_models.models["tomato"], registry_models.models["rose"]
+
+    image = np.zeros((480, 800, 3), dtype=np.uint8)
+    inputs = model_core._plan_inputs(["tomato", "rose", "cotton"], image)
+
+    assert inputs["tomato"] is inputs["cotton"]
+    assert inputs["tomato"][0].shape == (320, 320, 3)
+    assert inputs["rose"] == (image, None)
+    assert model_core.model_input_size("tomato") == 320
+
+
+def write_onnx(path, metadata: dict):
+    graph = helper.make_graph(
+        [helper.make_node("Identity", ["x"], ["y"])],
+        "g",
+        [helper.make_tensor_value_info("x", TensorProto.FLOAT, [1])],
+        [helper.make_tensor_value_info("y", TensorProto.FLOAT, [1])],
+    )
+    model = helper.make_model(graph)
+    for key, value in metadata.items():
+        model.metadata_props.add(key=key, value=value)
+    onnx.save(model, str(path))
+
+
+def test_export_task_reads_onnx_metadata(tmp_path):
+    write_onnx(tmp_path / "rose.onnx", {"task": "classify"})
+    write_onnx(tmp_path / "plain.onnx", {})
+
+    assert model_core._export_task(str(tmp_path / "rose.onnx")) == "classify"
+    assert model_core._export_task(str(tmp_path / "plain.onnx")) is None
+    assert model_core._export_task(str(tmp_path / "missing.onnx")) is None
+
+
+def test_export_task_reads_openvino_metadata(tmp_path):
+    (tmp_path / "metadata.yaml").write_text("task: detect\nimgsz: [640, 640]\n")
+
+    assert model_core._export_task(str(tmp_path)) == "detect"
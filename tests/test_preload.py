@@ -0,0 +1,25 @@
+import asyncio
+
+import main
+import model_core
+from preload import warm_model
+
+
+class FakePool:
+    def serves(self, crop, backend):
+        return crop == "tomato"
+
+
+def test_worker_served_crops_are_not_loaded_here(monkeypatch):
+    def get_model(*args, **kwargs):
+        raise AssertionError("worker-served model loaded in the API process")
+
+    monkeypatch.setattr(model_core, "_remote_pool", FakePool())
+    monkeypatch.setattr(model_core, "get_model", get_model)
+
+    assert warm_model("tomato") == {"worker": True}
+
+    response = asyncio.run(main.warmup(crops=["tomato"], pin=False, runs=2))
+    assert response["worker_models"] == ["tomato"]
+    assert response["loaded_models"] == []
+    assert response["errors"] == []
@@ -0,0 +1,36 @@
+import threading
+
+import torch
+
+import profiling
+from profiling import Profiler
+
+
+def test_overlapping_forward_passes_record_one_trace(tmp_path):
+    profiler = Profiler(output_dir=str(tmp_path))
+    profiler.start(torch_trace=True, max_traces=4)
+    inside = threading.Event()
+    release = threading.Event()
+    skipped = []
+
+    def first():
+        with profiler.forward("first"):
+            torch.ones(4).sum()
+            inside.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    assert inside.wait(30)
+    skipped.append(profiler.forward("second"))
+    release.set()
+    thread.join(30)
+
+    # Once the first trace is written the next forward pass is traced again
+    with profiler.forward("third"):
+        torch.ones(4).sum()
+    session = profiler.stop()
+
+    assert skipped == [profiling._NULL]
+    traces = [path for path in session["files"] if path.endswith(".json")]
+    assert [path.rsplit("-", 1)[-1] for path in traces] == ["first.json", "third.json"]
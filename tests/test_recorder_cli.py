@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+import recorder
+from detection_log import DetectionLog
+from gps import GpsReceiver
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_DRIVE = os.path.join(ROOT, "benchmarks", "traces", "sample_drive.nmea")
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """
+    Records every GpsReceiver and DetectionLog the CLI creates.
+    """
+    created = []
+
+    class TrackedReceiver(GpsReceiver):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.stopped = False
+            created.append(self)
+
+        def stop(self, timeout=2.0):
+            self.stopped = True
+            super().stop(timeout)
+
+    class TrackedLog(DetectionLog):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.closed = False
+            created.append(self)
+
+        def close(self, timeout=None):
+            self.closed = True
+            super().close(timeout)
+
+    monkeypatch.setattr(recorder, "GpsReceiver", TrackedReceiver)
+    monkeypatch.setattr(recorder, "DetectionLog", TrackedLog)
+    return created
+
+
+def test_failed_model_load_stops_gps_and_closes_log(opened, monkeypatch, tmp_path):
+    def broken_load(self):
+        raise ValueError("Unsupported crop: potato")
+
+    monkeypatch.setattr(recorder.RecorderEngine, "load", broken_load)
+
+    with pytest.raises(ValueError):
+        recorder.main([
+            "--crop", "potato",
+            "--gps-replay", SAMPLE_DRIVE,
+            "--log", str(tmp_path / "log.csv"),
+        ])
+
+    log, receiver = opened
+    assert receiver.stopped and not receiver._thread.is_alive()
+    assert log.closed and not log._thread.is_alive()
+
+
+def test_failed_capture_open_stops_gps_and_closes_log(opened, monkeypatch, tmp_path):
+    monkeypatch.setattr(recorder.RecorderEngine, "load", lambda self: {})
+
+    with pytest.raises(ValueError):
+        recorder.main([
+            "--crop", "tomato",
+            "--source", str(tmp_path / "missing.mp4"),
+            "--gps-replay", SAMPLE_DRIVE,
+            "--log", str(tmp_path / "log.csv"),
+        ])
+
+    log, receiver = opened
+    assert receiver.stopped
+    assert log.closed
@@ -0,0 +1,107 @@
+import os
+import time
+
+import pytest
+
+import model_core
+from model_core import ResultCache
+
+
+class FakeClock:
+    """
+    Stands in for the time module inside model_core. Wall time starts at
+    the real time so disk files written now have sensible mtimes.
+    """
+
+    def __init__(self):
+        self.offset = 0.0
+        self._wall = time.time()
+
+    def advance(self, seconds: float):
+        self.offset += seconds
+
+    def monotonic(self) -> float:
+        return 1000.0 + self.offset
+
+    def time(self) -> float:
+        return self._wall + self.offset
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(model_core, "time", clock)
+    return clock
+
+
+def raw(label: str) -> dict:
+    return {"names": {0: label}, "boxes": [[0, 0, 1, 1, 0.9, 0]], "probs": None}
+
+
+def test_lru_evicts_least_recently_used(clock):
+    cache = ResultCache(max_entries=2, ttl=60, disk_dir="")
+    cache.put("a", raw("a"))
+    cache.put("b", raw("b"))
+    assert cache.get("a") is not None  # a is now the most recent
+    cache.put("c", raw("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+
+def test_ttl_expires_memory_entries(clock):
+    cache = ResultCache(max_entries=8, ttl=10, disk_dir="")
+    cache.put("a", raw("a"))
+
+    clock.advance(10)
+    assert cache.get("a") is not None
+    clock.advance(0.5)
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats["expired"] == 1
+    assert stats["entries"] == 0
+
+
+def test_disk_tier_survives_a_new_cache(clock, tmp_path):
+    first = ResultCache(max_entries=8, ttl=60, disk_dir=str(tmp_path))
+    first.put("a", raw("a"))
+
+    second = ResultCache(max_entries=8, ttl=60, disk_dir=str(tmp_path))
+    assert second.get("a")["names"] == {"0": "a"}  # JSON keys come back as strings
+    assert second.get("a") is not None
+
+    stats = second.stats()
+    assert stats["disk_hits"] == 1
+    assert stats["hits"] == 1
+    assert stats["entries"] == 1
+
+
+def test_disk_tier_expires_and_removes_old_files(clock, tmp_path):
+    first = ResultCache(max_entries=8, ttl=60, disk_dir=str(tmp_path))
+    first.put("a", raw("a"))
+    path = first._disk_path("a")
+    os.utime(path, (clock.time(), clock.time()))
+
+    clock.advance(61)
+    second = ResultCache(max_entries=8, ttl=60, disk_dir=str(tmp_path))
+    assert second.get("a") is None
+    assert not os.path.exists(path)
+
+    stats = second.stats()
+    assert stats["expired"] == 1
+    assert stats["misses"] == 1
+
+
+def test_disk_tier_ignores_a_hash_collision(clock, tmp_path):
+    cache = ResultCache(max_entries=8, ttl=60, disk_dir=str(tmp_path))
+    cache.put("a", raw("a"))
+    os.replace(cache._disk_path("a"), cache._disk_path("b"))
+
+    assert ResultCache(max_entries=8, ttl=60, disk_dir=str(tmp_path)).get("b") is None
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+import model_core
+
+
+def test_detection_models_are_tiled(registry_models):
+    image = np.zeros((2000, 3000, 3), dtype=np.uint8)
+    tiles = model_core._plan_tiles("tomato", image, 1024, 0.2, 16, "onnx")
+
+    assert len(tiles) > 2
+    assert tiles[-1] == (0, 0, 3000, 2000)
+    assert registry_models.calls == [("tomato", "onnx")]
+
+
+@pytest.mark.parametrize("max_tiles", [1, 2, 5, 16])
+def test_full_frame_counts_against_the_tile_budget(registry_models, max_tiles):
+    image = np.zeros((2000, 3000, 3), dtype=np.uint8)
+    tiles = model_core._plan_tiles("tomato", image, 256, 0.2, max_tiles)
+
+    assert len(tiles) <= max_tiles
+    assert (0, 0, 3000, 2000) in tiles
+
+
+def test_worker_served_crops_are_tiled_without_loading(registry_models, monkeypatch):
+    class FakePool:
+        def serves(self, crop, backend):
+            return True
+
+        def model_info(self, crop):
+            return {"task": "detect", "imgsz": 640}
+
+    monkeypatch.setattr(model_core, "_remote_pool", FakePool())
+    image = np.zeros((2000, 3000, 3), dtype=np.uint8)
+
+    assert len(model_core._plan_tiles("tomato", image, 1024, 0.2, 16)) > 2
+    assert registry_models.calls == []
+
+
+def test_classification_models_see_the_whole_frame(registry_models):
+    image = np.zeros((2000, 3000, 3), dtype=np.uint8)
+
+    assert model_core._plan_tiles("rose", image, 1024, 0.2, 16) == [(0, 0, 3000, 2000)]
+    assert registry_models.calls == [("rose", None)]